@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+NROBS about window, imported the first time Help > About is opened.
+"""
+
+import wx
+import wx.lib.agw.hyperlink as hl
+
+class AboutFrame(wx.Frame):
+    def __init__(self, parent):
+        super().__init__(parent=parent)
+        self.parent = parent
+        self.SetTitle('NROBS - About')
+        self.SetIcon(wx.Icon('./data/icons/app.png',wx.BITMAP_TYPE_PNG))
+        self.panel_main = wx.Panel(self)
+        self.sizer_main = wx.FlexGridSizer(6,1,10,10)
+        self.font = wx.Font(12, wx.FONTFAMILY_MODERN, 0, 90, underline = False, faceName ="Arial Bold")
+        self.logo = wx.Image('./data/icons/app.png', wx.BITMAP_TYPE_PNG)
+        self.logo.Rescale(300,300)
+        self.bitmap_logo = wx.StaticBitmap(self.panel_main,bitmap=self.logo.ConvertToBitmap())
+        self.label_program_name = wx.StaticText(self.panel_main, label="NROBS")
+        self.label_program_name.SetFont(self.font)
+        self.label_byline = wx.StaticText(self.panel_main, label="by Tom Smith")
+        self.label_email = hl.HyperLinkCtrl(self.panel_main, label="tom@tomsmith.media",URL="mailto:tom@tomsmith.media")
+        self.hl_icon_attribution = hl.HyperLinkCtrl(self.panel_main,label="Uicons by Flaticon",URL="https://www.flaticon.com/uicons")
+        self.sizer_main.AddMany([(self.bitmap_logo,1,wx.ALL|wx.CENTER|wx.ALIGN_CENTER),
+                                 (self.label_program_name,1,wx.ALL|wx.CENTER|wx.ALIGN_CENTER),
+                                 (self.label_byline,1,wx.ALL|wx.CENTER|wx.ALIGN_CENTER),
+                                 (self.label_email,1,wx.ALL|wx.CENTER|wx.ALIGN_CENTER),
+                                 (self.hl_icon_attribution,1,wx.ALL|wx.CENTER|wx.ALIGN_CENTER)])
+        
+        self.panel_main.SetSizerAndFit(self.sizer_main)
+        self.SetInitialSize(self.GetBestSize())
+        self.Layout()
+        self.Show()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Cached scene/transition choices for NROBS.
+"""
+
+import threading
+
+class ChoiceCache(object):
+    """Holds a list fetched from OBS until an OBS event invalidates it.
+
+    `fetch` should return a list or raise. get() returns None when the list
+    isn't known (e.g. not connected) so callers can leave cells alone.
+    """
+    def __init__(self, name, fetch):
+        self.name = name
+        self.fetch = fetch
+        self.lock = threading.Lock()
+        self.values = None
+        self.version = 0
+        self.fetches = 0
+
+    def get(self):
+        with self.lock:
+            if self.values is not None:
+                return self.values
+        try:
+            values = list(self.fetch())
+        except Exception as e:
+            print(f"Couldn't load {self.name} list:", e)
+            return None
+        self.fetches += 1
+        self.set(values)
+        return values
+
+    def peek(self):
+        # The list if it's known, never fetches (safe on the UI thread)
+        with self.lock:
+            return self.values
+
+    def set(self, values):
+        # Returns True if the list actually changed
+        with self.lock:
+            values = list(values)
+            changed = values != self.values
+            self.values = values
+            if changed:
+                self.version += 1
+            return changed
+
+    def invalidate(self):
+        with self.lock:
+            self.values = None
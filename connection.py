@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Background OBS connection management for NROBS.
+"""
+
+import threading
+import time
+
+DISCONNECTED = "disconnected"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+RECONNECTING = "reconnecting"
+
+class ConnectionManager(object):
+    """Connects, heartbeats and reconnects on its own thread.
+
+    connect_fn() opens the clients and raises on failure, heartbeat_fn() is
+    a cheap request (GetVersion) whose round trip is reported as the RTT and
+    disconnect_fn() closes whatever is open. on_state(state, rtt_ms, error)
+    is called on every state change and after each heartbeat.
+    """
+    def __init__(self, connect_fn, disconnect_fn, heartbeat_fn, on_state,
+                 heartbeat_interval=2.0, backoff_start=0.5, backoff_max=10.0, heartbeat_failures=2):
+        self.connect_fn = connect_fn
+        self.disconnect_fn = disconnect_fn
+        self.heartbeat_fn = heartbeat_fn
+        self.on_state = on_state
+        self.heartbeat_interval = heartbeat_interval
+        self.backoff_start = backoff_start
+        self.backoff_max = backoff_max
+        self.heartbeat_failures = heartbeat_failures
+        self.state = DISCONNECTED
+        self.rtt = None
+        self.attempts = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running() and not self.stop_event.is_set():
+            return
+        # A loop that's still winding down closes its clients before the
+        # new one opens any, the wait happens on the new thread
+        previous = self.thread
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(self.stop_event, previous), name="NROBS-connection", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Never waits: the loop notices the event, closes its own clients
+        # and exits, however long a connect in flight takes to time out
+        self.stop_event.set()
+        self.set_state(DISCONNECTED)
+
+    def set_state(self, state, error=None):
+        self.state = state
+        if state != CONNECTED:
+            self.rtt = None
+        try:
+            self.on_state(state, self.rtt, error)
+        except Exception as e:
+            print("Couldn't report connection state:", e)
+
+    def run(self, stop_event, previous=None):
+        if previous is not None:
+            previous.join()
+        try:
+            self.loop(stop_event)
+        finally:
+            try:
+                self.disconnect_fn()
+            except Exception as e:
+                print("Couldn't disconnect from OBS:", e)
+
+    def loop(self, stop_event):
+        delay = self.backoff_start
+        state = CONNECTING
+        while not stop_event.is_set():
+            self.set_state(state)
+            self.attempts += 1
+            try:
+                self.connect_fn()
+            except Exception as e:
+                if stop_event.is_set():
+                    break
+                print(f"Couldn't connect to OBS, retrying in {delay:.1f} s:", e)
+                self.set_state(RECONNECTING, e)
+                state = RECONNECTING
+                if stop_event.wait(delay):
+                    break
+                delay = min(delay * 2, self.backoff_max)
+                continue
+            if stop_event.is_set():
+                # Stopped while the connect was still in flight
+                break
+            delay = self.backoff_start
+            self.set_state(CONNECTED)
+            self.heartbeat(stop_event)
+            if stop_event.is_set():
+                break
+            try:
+                self.disconnect_fn()
+            except Exception:
+                pass
+            state = RECONNECTING
+
+    def heartbeat(self, stop_event):
+        failures = 0
+        while not stop_event.wait(self.heartbeat_interval):
+            start = time.perf_counter()
+            try:
+                self.heartbeat_fn()
+            except Exception as e:
+                failures += 1
+                print("OBS heartbeat failed:", e)
+                if failures >= self.heartbeat_failures:
+                    if not stop_event.is_set():
+                        self.set_state(RECONNECTING, e)
+                    return
+                continue
+            failures = 0
+            self.rtt = (time.perf_counter() - start) * 1000
+            if not stop_event.is_set():
+                self.set_state(CONNECTED)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Ordered command dispatch for NROBS.
+"""
+
+import queue
+import threading
+
+class CommandDispatcher(object):
+    """Runs OBS requests and super deliveries on one worker thread, in order.
+
+    Completion callbacks are called as callback(result, error) through
+    `post` (wx.CallAfter in the GUI) so they land back on the UI thread.
+    """
+    def __init__(self, post=None, name="NROBS-dispatch"):
+        self.post = post
+        self.name = name
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2):
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def submit(self, fn, *args, callback=None, **kwargs):
+        self.queue.put((fn, args, kwargs, callback))
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            fn, args, kwargs, callback = job
+            result = None
+            error = None
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                error = e
+                if callback is None:
+                    print(f"Dispatched command {getattr(fn, '__name__', fn)} failed:", e)
+            if callback is not None:
+                try:
+                    if self.post is not None:
+                        self.post(callback, result, error)
+                    else:
+                        callback(result, error)
+                except Exception as e:
+                    print("Couldn't deliver command result:", e)
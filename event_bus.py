@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded hand-off of OBS events from the websocket threads to the UI.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from itertools import count
+
+class EventBus(object):
+    """Typed, bounded, coalescing queue drained on the UI thread.
+
+    post(kind, fn, *args, key=...) queues fn(*args) for the UI thread. A
+    coalesced event replaces whatever is still waiting with the same kind
+    and key, so a burst of volume changes for one input costs one fader
+    update. wake() is called (wx.CallAfter(bus.drain) in the GUI) only when
+    the queue goes from empty to not empty, so at most one drain is ever
+    waiting in wx. When the queue is full the oldest coalescable event is
+    dropped to make room, or the new one if there is none.
+    """
+    def __init__(self, wake=None, maxsize=256):
+        self.wake = wake
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()
+        self.sequence = count()
+        self.posted = Counter()
+        self.coalesced = Counter()
+        self.dropped = Counter()
+        self.dispatched = 0
+        self.max_depth = 0
+        self.last_drain_ms = 0.0
+        self.waiting = False
+
+    def post(self, kind, fn, *args, key=None, coalesce=True):
+        slot = (kind, key) if coalesce else (kind, next(self.sequence))
+        with self.lock:
+            self.posted[kind] += 1
+            if slot in self.pending:
+                self.coalesced[kind] += 1
+                self.pending.move_to_end(slot)
+            elif len(self.pending) >= self.maxsize and not self.evict():
+                self.dropped[kind] += 1
+                return False
+            self.pending[slot] = (fn, args, coalesce)
+            self.max_depth = max(self.max_depth, len(self.pending))
+            wake = not self.waiting
+            self.waiting = True
+        if wake and self.wake is not None:
+            try:
+                self.wake()
+            except Exception as e:
+                print("Couldn't wake the event bus:", e)
+        return True
+
+    def evict(self):
+        # Called with the lock held
+        for slot, (fn, args, coalesce) in self.pending.items():
+            if coalesce:
+                del self.pending[slot]
+                self.dropped[slot[0]] += 1
+                return True
+        return False
+
+    def drain(self):
+        start = time.perf_counter()
+        with self.lock:
+            pending, self.pending = self.pending, OrderedDict()
+            self.waiting = False
+        for (kind, _), (fn, args, _) in pending.items():
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Couldn't handle {kind} event:", e)
+        self.dispatched += len(pending)
+        self.last_drain_ms = (time.perf_counter() - start) * 1000
+        return len(pending)
+
+    def depth(self):
+        with self.lock:
+            return len(self.pending)
+
+    def stats(self):
+        with self.lock:
+            return {'depth': len(self.pending),
+                    'max_depth': self.max_depth,
+                    'posted': sum(self.posted.values()),
+                    'coalesced': sum(self.coalesced.values()),
+                    'dropped': sum(self.dropped.values()),
+                    'dispatched': self.dispatched,
+                    'last_drain_ms': self.last_drain_ms,
+                    'dropped_by_kind': dict(self.dropped)}
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-OBS fan-out for NROBS: hot backup and ISO boxes that follow the rundown.
+"""
+
+import threading
+import time
+from collections import deque
+
+import obsws_python as obs
+
+from connection import ConnectionManager, CONNECTED, DISCONNECTED
+from dispatch import CommandDispatcher
+from latency import percentile
+from obs_batch import send_batch, take_requests, cue_requests
+
+class OBSInstance(object):
+    """One follower OBS with its own connection, heartbeat and worker thread.
+
+    A box that is down or slow only ever holds up its own queue. Takes that
+    are still waiting when a newer one arrives are skipped, the newest take
+    puts the box in the right state on its own.
+    """
+    def __init__(self, name, host, port, password, on_change=None, post=None):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.password = password
+        self.on_change = on_change
+        self.lock = threading.RLock()
+        self.cl = None
+        self.state = DISCONNECTED
+        self.rtt = None
+        self.sequence = 0
+        self.latest_take = 0
+        self.latencies = deque(maxlen=200)
+        self.last_ms = None
+        self.failures = 0
+        self.skipped = 0
+        self.last_error = None
+        self.dispatcher = CommandDispatcher(post=post, name=f"NROBS-{name}")
+        self.manager = ConnectionManager(self.open_client, self.close_client, self.heartbeat, self.on_state)
+
+    @property
+    def connected(self):
+        return self.state == CONNECTED
+
+    def start(self):
+        self.dispatcher.start()
+        self.manager.start()
+
+    def stop(self):
+        self.manager.stop()
+        self.dispatcher.stop()
+
+    def open_client(self):
+        print(f"Connecting to {self.name} at {self.host}:{self.port}")
+        self.cl = obs.ReqClient(host=self.host, port=int(self.port), password=self.password, timeout=3)
+
+    def close_client(self):
+        if self.cl is not None:
+            try:
+                self.cl.disconnect()
+            except Exception as e:
+                print(f"Couldn't disconnect from {self.name}:", e)
+            self.cl = None
+
+    def heartbeat(self):
+        with self.lock:
+            self.cl.send("GetVersion", raw=True)
+
+    def on_state(self, state, rtt, error):
+        self.state = state
+        self.rtt = rtt
+        if error is not None:
+            self.last_error = error
+        self.changed()
+
+    def changed(self):
+        if self.on_change is not None:
+            try:
+                self.on_change()
+            except Exception as e:
+                print("Couldn't report OBS instance state:", e)
+
+    def submit(self, requests, label, callback=None):
+        if not self.connected:
+            self.skipped += 1
+            return False
+        self.sequence += 1
+        if label == "take":
+            self.latest_take = self.sequence
+        self.dispatcher.submit(self.run, self.sequence, requests, label, callback=callback)
+        return True
+
+    def run(self, sequence, requests, label):
+        if sequence < self.latest_take:
+            # A newer take is queued behind this one
+            self.skipped += 1
+            return None
+        try:
+            results, elapsed = send_batch(self.cl, self.lock, requests, halt_on_failure=True)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = e
+            print(f"{self.name} {label} failed:", e)
+            raise
+        finally:
+            self.changed()
+        self.last_ms = elapsed
+        self.latencies.append(elapsed)
+        self.last_error = None
+        print(f"{self.name} {label}: {len(results)}/{len(requests)} requests in {elapsed:.1f} ms")
+        return elapsed
+
+    def take(self, name, transition, callback=None):
+        return self.submit(take_requests(name, transition), "take", callback)
+
+    def cue(self, name, transition, callback=None):
+        return self.submit(cue_requests(name, transition), "cue", callback)
+
+    def stats(self):
+        latencies = list(self.latencies)
+        return {'name': self.name,
+                'state': self.state,
+                'rtt_ms': self.rtt,
+                'last_ms': self.last_ms,
+                'p50_ms': percentile(latencies, 50),
+                'p95_ms': percentile(latencies, 95),
+                'failures': self.failures,
+                'skipped': self.skipped,
+                'error': str(self.last_error) if self.last_error is not None else None}
+
+class FanOut(object):
+    """Sends every take and cue to all follower instances at once."""
+    def __init__(self, instances=None):
+        self.instances = list(instances or [])
+
+    def start(self):
+        for instance in self.instances:
+            instance.start()
+
+    def stop(self):
+        # Every box winds down on its own thread, a dead one can't hold up
+        # the others or the UI
+        for instance in self.instances:
+            threading.Thread(target=instance.stop, name=f"NROBS-{instance.name}-stop", daemon=True).start()
+
+    def any_connected(self):
+        return any(instance.connected for instance in self.instances)
+
+    def take(self, name, transition, callback=None):
+        started = time.perf_counter()
+        sent = [instance.name for instance in self.instances if instance.take(name, transition, callback)]
+        if sent:
+            print(f"Take fanned out to {', '.join(sent)} in {(time.perf_counter() - started) * 1000:.2f} ms")
+        return sent
+
+    def cue(self, name, transition, callback=None):
+        return [instance.name for instance in self.instances if instance.cue(name, transition, callback)]
+
+    def stats(self):
+        return [instance.stats() for instance in self.instances]
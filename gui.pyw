@@ -6,21 +6,51 @@ Created on Tue Jul  8 10:18:43 2025
 @author: TOSmith
 """
 
+from startup import StartupTimer
+boot = StartupTimer()
+
 import wx
 import wx.grid as gridlib
-import wx.lib.agw.hyperlink as hl
-import wx.lib.agw.peakmeter as PM
 from   wx.adv import SplashScreen as SplashScreen
 import obsws_python as obs
 import os
 import json
 import platform
-import requests
-from enum import IntEnum
-from math import log
-import webbrowser
+import threading
+import time
+from collections import deque
 import keyboard
-import html
+from tally import RundownState, TallyStateMachine, PREVIEW, PROGRAM
+from dispatch import CommandDispatcher
+from meters import MeterBank
+from choices import ChoiceCache
+from rundown_store import RowStore, StoryIndex, LABELS, moved_range, move_fields
+from journal import EditJournal
+from preroll import PreRoll
+from connection import ConnectionManager, CONNECTED, CONNECTING, RECONNECTING
+from latency import LatencyRecorder
+from obs_batch import send_batch, take_requests, cue_requests
+from fanout import FanOut, OBSInstance
+from meter_bridge import MeterBridge
+from event_bus import EventBus
+from take_inputs import TakeInputServer, TAKE, BACK, JUMP
+from history import UndoHistory
+from scene_items import SceneItemIndex
+
+boot.mark("imports")
+
+AUDIO_KINDS = ("wasapi_input_capture", "ffmpeg_source")
+
+class LockedReqClient(obs.ReqClient):
+    # The dispatch, heartbeat and UI threads share one socket, so every
+    # request/response pair has to go out under the OBS lock.
+    def __init__(self, lock, **kwargs):
+        self.lock = lock
+        super().__init__(**kwargs)
+
+    def send(self, param, data=None, raw=False):
+        with self.lock:
+            return super().send(param, data, raw)
 
 class OBS(object):
     def __init__(self, parent, host, port, password):
@@ -28,170 +58,390 @@ class OBS(object):
         self.host = host
         self.port = port
         self.password = password
+        self.lock = threading.RLock()
+        self.batch_timings = deque(maxlen=200)
+        self.meters = MeterBank()
+        self.scene_cache = ChoiceCache("scene", self.fetch_scene_list)
+        self.transition_cache = ChoiceCache("transition", self.fetch_transition_list)
+        self.preroll = PreRoll(self)
+        # Pre-rolls wait on OBS's media thread, they get their own worker so
+        # they never sit in front of a take
+        self.preroll_worker = CommandDispatcher(name="NROBS-preroll")
+        self.preroll_worker.start()
+        self.scene_items = SceneItemIndex()
+        self.prefetched_audio = None
+        self.guards = {}
+        self.last_take_ms = None
+        self.state = None
+        self.manager = ConnectionManager(self.open_clients, self.close_clients, self.heartbeat,
+                                         lambda state, rtt, error: wx.CallAfter(self.on_connection_state, state, rtt, error))
+
+    @property
+    def connected(self):
+        return self.state == CONNECTED
     
     def connect(self,event):
+        # Connects (and keeps reconnecting) in the background, the UI is
+        # told through on_connection_state.
+        self.manager.start()
+
+    def disconnect(self):
+        self.manager.stop()
+
+    def open_clients(self):
+        print(f"Connecting to {self.host}:{self.port}")
+        self.cl = LockedReqClient(self.lock,host=self.host,port=int(self.port),password=self.password,timeout=3)
+        self.cl_events = obs.EventClient(host=self.host,port=int(self.port),password=self.password,timeout=3,subs=(obs.Subs.LOW_VOLUME | obs.Subs.INPUTVOLUMEMETERS))
+        self.register(self.on_scene_list_changed)
+        self.register(self.on_scene_transition_ended)
+        self.register([self.on_scene_transition_started,
+                       self.on_current_program_scene_changed,
+                       self.on_current_preview_scene_changed])
+        self.register([self.on_scene_item_created,
+                       self.on_scene_item_removed,
+                       self.on_scene_item_enable_state_changed,
+                       self.on_scene_item_list_reindexed])
+        self.preroll.invalidate()
+        self.register([self.on_scene_created,
+                       self.on_scene_removed,
+                       self.on_scene_name_changed,
+                       self.on_current_scene_transition_changed])
+        # Warm the choice caches here so the UI thread doesn't wait on them
+        self.scene_cache.invalidate()
+        self.transition_cache.invalidate()
+        self.scene_cache.get()
+        self.transition_cache.get()
+        # And the scene item index, the program scene and every scene in the rundown in one batch
+        self.scene_items.clear()
+        grid_panel = getattr(self.parent, 'grid_panel', None)
         try:
-            print(f"Connecting to {self.host}:{self.port}")
-            self.cl = obs.ReqClient(host=self.host,port=int(self.port),password=self.password,timeout=3)
-            self.cl_events = obs.EventClient(host=self.host,port=int(self.port),password=self.password,timeout=3,subs=(obs.Subs.LOW_VOLUME | obs.Subs.INPUTVOLUMEMETERS))
-            self.cl_events.callback.register(self.on_scene_list_changed)
-            self.cl_events.callback.register(self.on_scene_transition_ended)
-            self.parent.grid_panel.set_scene_choices()
-            self.parent.grid_panel.set_transition_choices()
-            has_audio_panel = hasattr(self.parent, 'mic_panel')
-            if has_audio_panel:
-                self.parent.mic_panel.build_faders()
-            else:
-                setattr(self.parent, 'mic_panel', AudioPanel(self.parent))
-                self.parent.sizer.Add(self.parent.mic_panel,0,wx.EXPAND)
-            self.start_event_listeners()
-            self.parent.SetSizerAndFit(self.parent.sizer)
-            self.parent.Layout()
+            self.index_scenes(grid_panel.store.column(2) if grid_panel else [], program=True)
+        except Exception as e:
+            print("Couldn't index scene items:", e)
+        boot.mark("connected")
+        # So is the audio panel's first build, which used to run input by
+        # input on the UI thread after connecting
+        try:
+            inputs = self.get_audio_inputs()
+            self.prefetched_audio = (inputs, self.get_audio_levels(inputs))
         except Exception as e:
-            print("Couldn't connect to OBS:",e)
+            self.prefetched_audio = None
+            print("Couldn't prefetch audio inputs:", e)
+        boot.mark("prefetched")
+
+    def register(self, callbacks):
+        # obsws_python doesn't catch callback errors, one would end its event
+        # thread for the rest of the session while the heartbeat carries on
+        if not isinstance(callbacks, list):
+            callbacks = [callbacks]
+        self.cl_events.callback.register([self.guarded(fn) for fn in callbacks])
+
+    def guarded(self, fn):
+        # One wrapper per handler, so registering again doesn't add another.
+        # obsws_python dispatches on the function's name.
+        name = fn.__name__
+        if name not in self.guards:
+            def callback(data):
+                try:
+                    fn(data)
+                except Exception as e:
+                    print(f"OBS event handler {name} failed:", e)
+            callback.__name__ = name
+            self.guards[name] = callback
+        return self.guards[name]
+
+    def pop_prefetched_audio(self):
+        prefetched, self.prefetched_audio = self.prefetched_audio, None
+        return prefetched
+
+    def close_clients(self):
+        for name in ("cl_events", "cl"):
+            client = getattr(self, name, None)
+            if client is None:
+                continue
+            try:
+                client.disconnect()
+            except Exception as e:
+                print("Couldn't disconnect from OBS:",e)
+
+    def heartbeat(self):
+        self.cl.send("GetVersion", raw=True)
+
+    def on_connection_state(self, state, rtt, error):
+        if not self.parent:
+            return
+        just_connected = state == CONNECTED and self.state != CONNECTED
+        self.state = state
+        self.parent.ribbon_panel.show_connection(state, rtt)
+        if just_connected:
+            try:
+                self.on_connected()
+            except Exception as e:
+                print("Couldn't set up after connecting to OBS:",e)
+        if state != CONNECTING:
+            # First attempt is over either way, don't keep the splash up for a retry
+            self.parent.startup_done()
+
+    def on_connected(self):
+        self.parent.grid_panel.set_scene_choices()
+        self.parent.grid_panel.set_transition_choices()
+        has_audio_panel = hasattr(self.parent, 'mic_panel')
+        if has_audio_panel:
+            self.parent.mic_panel.build_faders()
+        else:
+            setattr(self.parent, 'mic_panel', AudioPanel(self.parent))
+            self.parent.sizer.Add(self.parent.mic_panel,0,wx.EXPAND)
+        self.start_event_listeners()
+        self.parent.SetSizerAndFit(self.parent.sizer)
+        self.parent.Layout()
     
     def start_event_listeners(self):
-            self.cl_events.callback.register(self.on_input_volume_meters)
-            self.cl_events.callback.register(self.on_input_volume_changed)
-            self.cl_events.callback.register(self.on_input_created)
-            self.cl_events.callback.register(self.on_input_removed)
+            self.register(self.on_input_volume_meters)
+            self.register(self.on_input_volume_changed)
+            self.register(self.on_input_created)
+            self.register(self.on_input_removed)
+            self.register(self.on_input_name_changed)
     
+    # Everything below runs on the websocket thread. Anything that touches
+    # the UI goes through the event bus, never straight into wx.
+
     def on_input_created(self,data):
-        wx.CallAfter(self.parent.mic_panel.build_faders)
+        # Only the new strip is built, its level/mute come back in one batch
+        if data.input_kind in AUDIO_KINDS:
+            source = {data.input_uuid: {'global': False,
+                                        'name': data.input_name,
+                                        'UUID': data.input_uuid}}
+            self.parent.dispatcher.submit(self.get_audio_levels, source, callback=self.parent.mic_panel.on_levels_fetched)
         
     def on_input_removed(self,data):
-        wx.CallAfter(self.parent.mic_panel.build_faders)
+        self.meters.release(data.input_name)
+        self.parent.event_bus.post("input_removed", self.parent.mic_panel.remove_strip, data.input_uuid, coalesce=False)
+
+    def on_input_name_changed(self,data):
+        self.scene_items.source_renamed(data.old_input_name, data.input_name)
+        self.meters.release(data.old_input_name)
+        self.parent.event_bus.post("input_renamed", self.parent.mic_panel.rename_strip, data.input_uuid, data.input_name, key=data.input_uuid)
     
     def on_input_volume_meters(self,data):
+        # Only stores the latest levels, AudioPanel's timer paints them
         try:
-            LEVELTYPE = IntEnum(
-                "LEVELTYPE",
-                "VU POSTFADER PREFADER",
-                start=0,
-                )
-            def fget(x):
-                return round(20 * log(x, 10), 1) if x > 0 else -200.0
-
-            for device in data.inputs:
-                name = device["inputName"]
-                if device["inputLevelsMul"]:
-                    left, right = device["inputLevelsMul"]
-                    l = fget(left[LEVELTYPE.POSTFADER])
-                    r = fget(right[LEVELTYPE.POSTFADER])
-                    wx.CallAfter(self.parent.mic_panel.update_vu,name,l,r)
+            self.meters.push(data.inputs)
         except Exception as e:
             print("Problem handling VU meters:", e)
     
     def on_input_volume_changed(self,data):
         try:
-            name = data.input_name
             dB = int(data.input_volume_db)
-            fader = getattr(self.parent.mic_panel,f"{name}_fader")
-            wx.CallAfter(fader.SetValue,dB)
+            self.parent.event_bus.post("volume", self.parent.mic_panel.set_fader, data.input_uuid, dB, key=data.input_uuid)
         except Exception as e:
             print("Error dynamically adjusting fader:",e)
     
     def on_scene_list_changed(self, event):
         print("Scene list changed.")
-        wx.CallAFter(self.parent.grid_panel.set_scene_choices)
+        self.invalidate_scenes()
+
+    def on_scene_created(self, data):
+        self.invalidate_scenes()
+
+    def on_scene_removed(self, data):
+        self.scene_items.scene_removed(data.scene_name)
+        self.invalidate_scenes()
+
+    def on_scene_name_changed(self, data):
+        self.scene_items.scene_renamed(data.old_scene_name, data.scene_name)
+        self.invalidate_scenes()
+
+    def on_current_scene_transition_changed(self, data):
+        # Refetched on the dispatcher, the UI thread only gets the finished list
+        self.transition_cache.invalidate()
+        self.parent.dispatcher.submit(self.transition_cache.get, callback=self.on_transitions_fetched)
+
+    def invalidate_scenes(self):
+        self.scene_cache.invalidate()
+        self.parent.dispatcher.submit(self.scene_cache.get, callback=self.on_scenes_fetched)
+
+    def on_scenes_fetched(self, scenes, error):
+        if scenes is not None:
+            self.parent.grid_panel.set_scene_choices(scenes)
+
+    def on_transitions_fetched(self, transitions, error):
+        if transitions is not None:
+            self.parent.grid_panel.set_transition_choices(transitions)
         
+    def on_scene_transition_started(self, event):
+        self.parent.latency.mark_latest('transition_started')
+        self.parent.grid_panel.tally_machine.transition_started()
+
     def on_scene_transition_ended(self, event):
+        self.parent.latency.mark_latest('transition_ended')
         print("Transition finished.")
-        for row in range(self.parent.grid_panel.grid.GetNumberRows()):
-            color = self.parent.grid_panel.grid.GetCellBackgroundColour(row, 0)
-            if color == wx.Colour(0, 255, 0):  # Green
-                green_row = row
-                break
-        name = self.parent.grid_panel.grid.GetCellValue(green_row,2)
-        transition = self.parent.grid_panel.grid.GetCellValue(green_row,3)
-        if transition == "":
-            print("Transition not set, using cut.")
-            transition = "Cut"
-        if name.strip() != "":
-            self.cl.set_current_preview_scene(name)
-            self.cl.set_current_scene_transition(transition)
-            #has_audio_panel = hasattr(self.parent, 'mic_panel')
-            #if has_audio_panel:
-                #wx.CallAfter(self.parent.mic_panel.build_faders)
-     
-    def get_scene_list(self):
+        self.parent.grid_panel.tally_machine.transition_ended()
+        self.parent.event_bus.post("latency", self.parent.ribbon_panel.show_latency)
+
+    def on_current_program_scene_changed(self, data):
+        self.scene_items.program_changed(data.scene_name)
+        self.parent.grid_panel.tally_machine.program_changed(data.scene_name)
+        # A scene that isn't in the rundown, index it before anyone opens the popup
+        self.request_scene_index([data.scene_name])
+
+    def on_current_preview_scene_changed(self, data):
+        self.parent.grid_panel.tally_machine.preview_changed(data.scene_name)
+
+    def on_scene_item_created(self, data):
+        self.scene_items.created(data.scene_name, data.scene_item_id, data.source_name, data.scene_item_index)
+        self.preroll.invalidate(data.scene_name)
+
+    def on_scene_item_removed(self, data):
+        self.scene_items.removed(data.scene_name, data.scene_item_id)
+        self.preroll.invalidate(data.scene_name)
+
+    def on_scene_item_enable_state_changed(self, data):
+        self.scene_items.enabled_changed(data.scene_name, data.scene_item_id, data.scene_item_enabled)
+
+    def on_scene_item_list_reindexed(self, data):
+        self.scene_items.reindexed(data.scene_name, data.scene_items)
+
+    def batch(self, requests, halt_on_failure=False, execution_type=0, label="batch"):
+        # One obs-websocket v5 RequestBatch (op 8), results come back in order.
+        # execution_type: 0 = SerialRealtime, 1 = SerialFrame, 2 = Parallel
+        results, elapsed = send_batch(self.cl, self.lock, requests, halt_on_failure, execution_type)
+        self.batch_timings.append((label, len(requests), elapsed))
+        print(f"{label}: {len(results)}/{len(requests)} requests in {elapsed:.1f} ms")
+        return results
+
+    def set_preview(self, name):
+        self.parent.grid_panel.tally_machine.expect_preview(name)
+        self.cl.set_current_preview_scene(name)
+        self.preroll_scene(name)
+
+    def preroll_scene(self, name):
+        # Off the take's hot path: runs once the armed row is in preview
+        self.preroll_worker.submit(self.cue_media, name)
+
+    def cue_media(self, name):
         try:
-            resp = self.cl.get_scene_list()
-            scenes = [di.get("sceneName") for di in reversed(resp.scenes)]
-            return scenes
+            readiness = self.preroll.cue_scene(name, self.scene_items.program)
+            if readiness:
+                print(f"Pre-rolled {name}:", readiness)
         except Exception as e:
-            print("Couldn't load scene list:", e)
-            return []
+            print(f"Couldn't pre-roll media in {name}:", e)
+
+    def cue_preview(self, name, transition):
+        self.parent.grid_panel.tally_machine.expect_preview(name)
+        self.batch(cue_requests(name, transition), label="cue")
+        self.preroll_scene(name)
+
+    def take(self, name, transition, take_id=None):
+        self.parent.grid_panel.tally_machine.expect_preview(name)
+        self.parent.latency.mark(take_id, 'sent')
+        # Media cued by the pre-roll is un-paused in the same round trip
+        self.batch(take_requests(name, transition) + self.preroll.take_requests(name),
+                   halt_on_failure=True, label="take")
+        self.parent.latency.mark(take_id, 'acked')
+        self.last_take_ms = self.batch_timings[-1][2]
+     
+    def fetch_scene_list(self):
+        resp = self.cl.get_scene_list()
+        return [di.get("sceneName") for di in reversed(resp.scenes)]
+
+    def fetch_transition_list(self):
+        resp = self.cl.get_scene_transition_list()
+        return [di.get("transitionName") for di in reversed(resp.transitions)]
+
+    def get_scene_list(self):
+        scenes = self.scene_cache.get()
+        return scenes if scenes is not None else []
     
     def get_transition_list(self):
-        try:
-            resp = self.cl.get_scene_transition_list()
-            transitions = resp.transitions
-            transitions = [di.get("transitionName") for di in reversed(transitions)]
-            return transitions
-        except Exception as e:
-            print("Couldn't load transition list:",e)
-            return []
+        transitions = self.transition_cache.get()
+        return transitions if transitions is not None else []
+
+    def index_scenes(self, scenes, program=False):
+        # One batch for every scene not indexed yet (and the program scene's
+        # name if asked), then the program scene itself if that's still missing
+        missing = self.scene_items.missing(scenes)
+        if missing or program:
+            self.scene_items.load(missing, self.batch(self.scene_items.requests(missing, program), label="scene items"), program)
+        missing = self.scene_items.missing([self.scene_items.program])
+        if missing:
+            self.scene_items.load(missing, self.batch(self.scene_items.requests(missing), label="scene items"))
+
+    def request_scene_index(self, scenes, callback=None):
+        # Safe from any thread, does nothing when they're all indexed
+        if self.connected and self.scene_items.missing(scenes):
+            self.parent.dispatcher.submit(self.index_scenes, scenes, callback=callback)
 
     def get_visible_items(self):
-        resp = self.cl.get_current_program_scene()
-        name = resp.scene_name
-        items = self.cl.get_scene_item_list(name).scene_items
-        output = {}
-        for x in items:
-            output[x['sourceName']] = {'id': x['sceneItemId'],
-                                       'enabled': x['sceneItemEnabled']}
-        return output
+        # From the index, no round trip. (scene, items), items is None if
+        # the program scene hasn't been indexed yet
+        scene = self.scene_items.program
+        return scene, self.scene_items.items(scene)
     
-    def toggle_item(self, event, k, v, enabled):
-        preview_scene = self.cl.get_current_preview_scene().scene_name
-        self.cl.set_current_preview_scene(self.cl.get_current_program_scene().scene_name)
-        self.cl.set_scene_item_enabled(self.cl.get_current_program_scene().scene_name,v,enabled)
-        self.cl.trigger_studio_mode_transition()
-        self.cl.set_current_preview_scene(preview_scene)
+    def toggle_item(self, event, scene, item_id, enabled):
+        self.parent.dispatcher.submit(self.apply_item_toggle, scene, item_id, enabled)
         self.parent.grid_panel.grid.SetFocus()
-        
-    def get_ffmpeg_audio(self):
-        result = []
-        inputs = self.cl.get_input_list()
-        for x in inputs.inputs:
-            if x['inputKind'] == "ffmpeg_source":
-                result.append(x)
-        return result
-        
+
+    def apply_item_toggle(self, scene, item_id, enabled):
+        # The item's own show/hide transition plays in program, OBS confirms
+        # with SceneItemEnableStateChanged
+        self.scene_items.enabled_changed(scene, item_id, enabled)
+        self.batch([("SetSceneItemEnabled", {"sceneName": scene,
+                                             "sceneItemId": item_id,
+                                             "sceneItemEnabled": enabled})],
+                   halt_on_failure=True, label="toggle")
+
+    def get_scene_and_transition_lists(self):
+        try:
+            results = self.batch([("GetSceneList", None),
+                                  ("GetSceneTransitionList", None)],
+                                 label="refresh")
+            scenes = [di.get("sceneName") for di in reversed(results[0]["responseData"]["scenes"])]
+            transitions = [di.get("transitionName") for di in reversed(results[1]["responseData"]["transitions"])]
+            return scenes, transitions
+        except Exception as e:
+            print("Couldn't load scene and transition lists:", e)
+            return None, None
         
     def get_audio_inputs(self):
-        audio_inputs = self.cl.get_input_list('wasapi_input_capture').inputs
-        ffmpeg_sources = self.get_ffmpeg_audio()
-        special_sources = self.cl.get_special_inputs()
-        global_sources = special_sources.__dict__
+        # Keyed by inputUuid, one round trip for the input list and specials
+        results = self.batch([("GetInputList", None),
+                              ("GetSpecialInputs", None)],
+                             halt_on_failure=True, label="audio inputs")
+        inputs = results[0]["responseData"]["inputs"]
+        special_sources = results[1]["responseData"]
+        uuids = {x['inputName']: x['inputUuid'] for x in inputs}
         sources_output = {}
-        for key, value in global_sources.items():
-            if key != "attrs" and key[0:2] != "__":
-                sources_output[key] = {'global': True,
-                                       'name': value,
-                                       'UUID': None}
-
-        for x in audio_inputs:
+        for key, value in special_sources.items():
+            if value is not None:
+                uuid = uuids.get(value)
+                sources_output[uuid or key] = {'global': True,
+                                               'name': value,
+                                               'UUID': uuid}
+        for x in inputs:
+            if x['inputKind'] in AUDIO_KINDS:
                 sources_output[x['inputUuid']] = {'global': False,
-                                       'name': x['inputName'],
-                                       'UUID': x['inputUuid']}
-        for x in ffmpeg_sources:
-            sources_output[x['inputUuid']] = {'global': False,
-                                              'name': x['inputName'],
-                                              'UUID': x['inputUuid']}
-        
+                                                  'name': x['inputName'],
+                                                  'UUID': x['inputUuid']}
         return sources_output
         
     def get_audio_levels(self, sources_output: dict):
+        keys = [key for key, value in sources_output.items() if value['name'] is not None]
+        if not keys:
+            return {}
+        batch_requests = []
+        for key in keys:
+            name = sources_output[key]['name']
+            batch_requests.append(("GetInputVolume", {"inputName": name}))
+            batch_requests.append(("GetInputMute", {"inputName": name}))
+        results = self.batch(batch_requests, label="audio levels")
         source_and_level = {}
-        for key, value in sources_output.items():
-            if sources_output[key]['name'] is not None:
-                level = self.cl.get_input_volume(sources_output[key]['name']).input_volume_db
-                muted = self.cl.get_input_mute(sources_output[key]['name']).input_muted
-                source_and_level[sources_output[key]['name']] = {'level': level,
-                                                                 'muted': muted}
-                print(f"{sources_output[key]['name']}: {level} dB")
+        for i, key in enumerate(keys):
+            volume, mute = results[2 * i], results[2 * i + 1]
+            if not (volume["requestStatus"]["result"] and mute["requestStatus"]["result"]):
+                continue
+            source_and_level[key] = {'name': sources_output[key]['name'],
+                                     'level': volume["responseData"]["inputVolumeDb"],
+                                     'muted': mute["responseData"]["inputMuted"]}
         return source_and_level
     
     def adjust_level(self, event, name, fader):
@@ -202,18 +452,79 @@ class OBS(object):
         self.cl.toggle_input_mute(name)
 
 class GUI(wx.Frame):
-    def __init__(self,title,obs_connection,super_endpoint):
+    def __init__(self,title,obs_connection,super_endpoint,autosave=False,primary_name="OBS",followers=None,main_window=False):
         super().__init__(parent=None,title=title)
-        splash = Splash()
-        splash.CenterOnScreen(wx.BOTH)
-        splash.Show(True)
+        self.autosave = autosave
+        # Only the main window listens on ports and the drop folder, windows
+        # from "New" would clash with it
+        self.main_window = main_window
+        self.primary_name = primary_name
+        self.followers = followers or []
+        self.splash = Splash(timeout=10000)
+        self.splash.CenterOnScreen(wx.BOTH)
+        self.splash.Show(True)
+        boot.mark("splash")
         self.Bind(wx.EVT_CLOSE,self.on_close)
+        self.active = False
+        self.Bind(wx.EVT_ACTIVATE,self.on_activate)
         self.SetIcon(wx.Icon("./data/icons/app.png",wx.BITMAP_TYPE_PNG))
         self.super_endpoint = super_endpoint
         self.obs_connection = obs_connection
+        self.event_bus = EventBus(wake=lambda: wx.CallAfter(self.event_bus.drain))
+        self.dispatcher = CommandDispatcher(post=wx.CallAfter)
+        self.dispatcher.start()
+        self.latency = LatencyRecorder()
         self.obs_conn = OBS(self,obs_connection[0],obs_connection[1],obs_connection[2])
+        # Backup/ISO boxes only follow takes and cues, tally comes from the primary
+        self.fanout = FanOut([OBSInstance(x['name'], x['host'], x['port'], x['password'],
+                                          on_change=lambda: self.event_bus.post("instances", lambda: self.ribbon_panel.show_instances()),
+                                          post=wx.CallAfter)
+                              for x in self.followers])
+        self.fanout.start()
+        self.supers = None
+        self.set_super_endpoint(super_endpoint)
+        self.super_server = None
+        server_settings = load_super_server_settings()
+        if server_settings['enabled'] and main_window:
+            try:
+                from super_server import SuperServer
+                self.super_server = SuperServer(server_settings['host'], server_settings['port'])
+                self.super_server.start()
+            except Exception as e:
+                print("Couldn't start the super server:",e)
+                self.super_server = None
+        input_settings = load_take_input_settings()
+        if not main_window:
+            # Keyboard takes only
+            input_settings.update(udp_port=None, http_port=None, midi_port=None)
+        self.take_inputs = TakeInputServer(lambda *command: wx.CallAfter(self.grid_panel.on_input_command, *command),
+                                           input_settings['host'], input_settings['udp_port'], input_settings['http_port'],
+                                           input_settings['debounce_ms'], input_settings['ack_timeout'],
+                                           input_settings['midi_port'], input_settings['midi_notes'])
+        self.remote = None
+        remote_settings = load_remote_api_settings()
+        if remote_settings['enabled'] and main_window:
+            try:
+                from remote_api import RemoteServer
+                # Remote commands get the same debounce and take gating as button boxes
+                self.remote = RemoteServer(remote_settings['host'], remote_settings['port'],
+                                           on_command=lambda command, arg, source: self.take_inputs.submit(source, command, arg),
+                                           token=remote_settings['token'])
+                self.remote.start()
+            except Exception as e:
+                print("Couldn't start the remote API:",e)
+                self.remote = None
         self.ribbon_panel = Ribbon(self)
         self.grid_panel = Grid(self)
+        self.take_inputs.start()
+        self.mos = None
+        mos_settings = load_mos_settings()
+        if mos_settings['enabled'] and main_window:
+            from mos_ingest import MOSIngest
+            self.mos = MOSIngest(lambda message, source: wx.CallAfter(self.grid_panel.apply_mos, message, source),
+                                 mos_settings['host'], mos_settings['port'], mos_settings['watch_dir'],
+                                 mos_settings['encoding'], mos_settings['poll'])
+            self.mos.start()
         self.build_menubar()
         self.sizer = wx.BoxSizer(wx.VERTICAL)
         self.sizer.Add(self.ribbon_panel,0,wx.ALL|wx.EXPAND)
@@ -221,23 +532,56 @@ class GUI(wx.Frame):
         self.SetSizerAndFit(self.sizer)
         self.SetInitialSize(self.GetBestSize())
         self.Bind(wx.EVT_SIZE,self.grid_panel.auto_resize_columns)
+        self.ribbon_panel.set_playing(True)
         self.Layout()
+        # Connect and prefetch on the connection thread while the splash is
+        # up. Not before now: the event callbacks need the panels.
+        self.obs_conn.connect(wx.Event)
         self.Show()
-        wx.CallAfter(self.ribbon_panel.on_play,wx.Event)
+        boot.mark("frame")
+
+    def set_super_endpoint(self, endpoint):
+        # The super client is only loaded once there's somewhere to send supers
+        self.super_endpoint = endpoint
+        if self.supers is not None:
+            self.supers.endpoint = endpoint
+        elif endpoint.strip() not in ("", "N/A", "None"):
+            from super_client import SuperClient
+            self.supers = SuperClient(endpoint, obs_conn=self.obs_conn)
+            self.supers.start()
+
+    def on_activate(self, event):
+        # Read by the global hotkey hook, which mustn't call into wx itself
+        self.active = event.GetActive()
+        event.Skip()
+
+    def startup_done(self):
+        if self.splash:
+            self.splash.Close()
+        self.splash = None
+        boot.mark("ready")
+        boot.report()
         
     def on_close(self, event):
         try:
-            self.obs_conn.cl_events.disconnect()
+            self.obs_conn.disconnect()
         except Exception as e:
             print("Couldn't disconnect from OBS:",e)
-        
-        try:
-            self.obs_conn.cl_events.callback.deregister([self.obs_conn.on_input_volume_meters,self.obs_conn.on_input_volume_changed])
-            self.obs_conn.cl.disconnect()
-        except Exception as e:
-            print("Couldn't deregister event listeners:",e)
         finally:
             keyboard.unhook_all()
+            self.fanout.stop()
+            self.dispatcher.stop()
+            self.obs_conn.preroll_worker.stop()
+            if self.supers is not None:
+                self.supers.stop()
+            if self.super_server is not None:
+                self.super_server.stop()
+            self.take_inputs.stop()
+            if self.remote is not None:
+                self.remote.stop()
+            if self.mos is not None:
+                self.mos.stop()
+            self.grid_panel.close_journal()
             self.save_settings()
             self.Destroy()
             
@@ -262,6 +606,20 @@ class GUI(wx.Frame):
                 print("Json saved.")
         except Exception as e:
             print("Couldn't save settings:",e)
+        if os.path.isfile("data/settings/obs_instances.json"):
+            # Keep the primary's entry in step with what Settings changed
+            try:
+                with open("data/settings/obs_instances.json","r") as file:
+                    settings = json.load(file)
+                for instance in settings.get('instances', []):
+                    if instance.get('name') == self.primary_name:
+                        instance.update({"host": self.obs_conn.host,
+                                         "port": self.obs_conn.port,
+                                         "password": self.obs_conn.password})
+                with open("data/settings/obs_instances.json","w") as file:
+                    json.dump(settings,file,indent=2)
+            except Exception as e:
+                print("Couldn't save OBS instances:",e)
             
     def build_menubar(self):
         menubar = wx.MenuBar()
@@ -275,9 +633,20 @@ class GUI(wx.Frame):
         self.Bind(wx.EVT_MENU, self.ribbon_panel.on_save,save)
         settings = file.Append(wx.ID_ANY,"Settings","Change settings.")
         self.Bind(wx.EVT_MENU,self.ribbon_panel.on_settings,settings)
+        export_latency = file.Append(wx.ID_ANY,"Export Take Latency","Export take latency timings to CSV or JSON.")
+        self.Bind(wx.EVT_MENU,self.ribbon_panel.on_export_latency,export_latency)
         _exit = file.Append(wx.ID_ANY,"Quit","Quit this program.")
         self.Bind(wx.EVT_MENU, self.on_close, _exit)
         menubar.Append(file,"File")
+
+        edit = wx.Menu()
+        self.undo_item = edit.Append(wx.ID_UNDO,"Undo\tCtrl+Z","Undo the last rundown edit.")
+        self.Bind(wx.EVT_MENU, self.grid_panel.undo, self.undo_item)
+        self.Bind(wx.EVT_UPDATE_UI, self.on_update_undo, self.undo_item)
+        self.redo_item = edit.Append(wx.ID_REDO,"Redo\tCtrl+Y","Redo the last undone edit.")
+        self.Bind(wx.EVT_MENU, self.grid_panel.redo, self.redo_item)
+        self.Bind(wx.EVT_UPDATE_UI, self.on_update_undo, self.redo_item)
+        menubar.Append(edit,"Edit")
         
         _help = wx.Menu()
         about = _help.Append(wx.ID_ANY,"About","About this program.")
@@ -288,13 +657,26 @@ class GUI(wx.Frame):
         
         self.SetMenuBar(menubar)
         
+    def on_update_undo(self, event):
+        history = self.grid_panel.history
+        if event.GetId() == wx.ID_UNDO:
+            label = history.undo_label()
+            event.SetText(f"Undo {label}\tCtrl+Z" if label else "Undo\tCtrl+Z")
+        else:
+            label = history.redo_label()
+            event.SetText(f"Redo {label}\tCtrl+Y" if label else "Redo\tCtrl+Y")
+        event.Enable(label is not None)
+
     def on_new(self, event):
-        GUI("NROBS",(self.obs_connection[0],self.obs_connection[1],self.obs_connection[2]),self.super_endpoint)
+        GUI("NROBS",(self.obs_connection[0],self.obs_connection[1],self.obs_connection[2]),self.super_endpoint,
+            primary_name=self.primary_name,followers=self.followers)
         
     def on_about(self, event):
+        from about import AboutFrame
         AboutFrame(self)
 
     def on_documentation(self,event):
+        import webbrowser
         cwd = os.getcwd()
         webbrowser.open(f"{cwd}/data/NROBS Documentation.pdf")
 
@@ -306,8 +688,73 @@ class Ribbon(wx.Panel):
         self.is_playing = False
         self.live_mode = False
         self.load_bitmaps()
+        self.label_connection = wx.StaticText(self, label="Disconnected")
+        self.sizer.Add(self.label_connection,0,wx.ALL|wx.ALIGN_CENTER_VERTICAL,5)
+        self.label_latency = wx.StaticText(self, label="Take: --")
+        self.label_latency.SetToolTip("Spacebar to OBS acknowledging the take: last, p50 and p95.")
+        self.sizer.Add(self.label_latency,0,wx.ALL|wx.ALIGN_CENTER_VERTICAL,5)
+        self.label_instances = wx.StaticText(self, label="")
+        self.label_instances.SetToolTip("Last take round trip on each OBS.")
+        self.sizer.Add(self.label_instances,0,wx.ALL|wx.ALIGN_CENTER_VERTICAL,5)
         self.SetSizer(self.sizer)
         self.Layout()
+
+    def show_connection(self, state, rtt=None):
+        if state == CONNECTED:
+            label = f"Connected ({rtt:.0f} ms)" if rtt is not None else "Connected"
+        elif state == CONNECTING:
+            label = "Connecting..."
+        elif state == RECONNECTING:
+            label = "Reconnecting..."
+        else:
+            label = "Disconnected"
+        if self.label_connection.GetLabel() != label:
+            self.label_connection.SetLabel(label)
+            self.Layout()
+        # Refreshed with every heartbeat, so a backlog of OBS events shows up here
+        stats = self.parent.event_bus.stats()
+        self.label_connection.SetToolTip(f"OBS events: {stats['depth']} queued (max {stats['max_depth']}), "
+                                         f"{stats['coalesced']} coalesced, {stats['dropped']} dropped, "
+                                         f"last drain {stats['last_drain_ms']:.1f} ms")
+
+    def show_instances(self):
+        if not self.parent.fanout.instances:
+            return
+        def describe(name, connected, last_ms, error=None):
+            if not connected:
+                return f"{name} down"
+            if error is not None:
+                return f"{name} failed"
+            return f"{name} {last_ms:.0f} ms" if last_ms is not None else f"{name} ok"
+        obs_conn = self.parent.obs_conn
+        parts = [describe(self.parent.primary_name + "*", obs_conn.connected, obs_conn.last_take_ms)]
+        for instance in self.parent.fanout.instances:
+            parts.append(describe(instance.name, instance.connected, instance.last_ms, instance.last_error))
+        label = " | ".join(parts)
+        if self.label_instances.GetLabel() != label:
+            self.label_instances.SetLabel(label)
+            self.Layout()
+
+    def show_latency(self):
+        latency = self.parent.latency
+        last = latency.latest('acked')
+        if last is None:
+            label = "Take: --"
+        else:
+            acked = latency.histogram('acked')
+            label = f"Take: {last:.0f} ms (p50 {acked['p50']:.0f}, p95 {acked['p95']:.0f})"
+            on_air = latency.histogram('transition_ended')
+            if on_air['count']:
+                label += f" | On air p95 {on_air['p95']:.0f} ms"
+        if self.label_latency.GetLabel() != label:
+            self.label_latency.SetLabel(label)
+            self.Layout()
+        lines = ["Spacebar to OBS acknowledging the take: last, p50 and p95."]
+        for source, stats in self.parent.take_inputs.stats().items():
+            dispatch = f", input to dispatch p50 {stats['p50_ms']:.1f} ms" if stats['p50_ms'] is not None else ""
+            lines.append(f"{source}: {stats.get('accepted', 0)} accepted, {stats.get('debounced', 0)} debounced, "
+                         f"{stats.get('in flight', 0)} refused in flight{dispatch}")
+        self.label_latency.SetToolTip("\n".join(lines))
             
     def load_bitmaps(self):
         sys_appearance = wx.SystemSettings.GetAppearance()
@@ -355,31 +802,25 @@ class Ribbon(wx.Panel):
         self.parent.grid_panel.grid.SetFocus()
        
     def on_play(self,event):
-        self.is_playing = not self.is_playing
-        if self.is_playing:
-            try:
-                print("Now Playing...")
-                self.parent.obs_conn.connect(wx.Event)
-                if hasattr(self.parent.obs_conn, "cl"):
-                    self.button_play.SetBitmap(wx.Bitmap(os.path.join(self.directory,"stop.png"),wx.BITMAP_TYPE_PNG))
-                    self.button_play.SetToolTip("Stop")
-            except ConnectionRefusedError:
-                print("Couldn't connect to OBS.")
-                self.button_play.SetBitmap(wx.Bitmap(os.path.join(self.directory,"play.png"),wx.BITMAP_TYPE_PNG))
-                self.button_play.SetToolTip("Play")
+        if not self.is_playing:
+            print("Now Playing...")
+            self.parent.obs_conn.connect(wx.Event)
+            self.parent.fanout.start()
         else:
             print("Stopped.")
-            try:
-                self.parent.obs_conn.cl.disconnect()
-            except Exception as e:
-                print("Couldn't disconnect from OBS:",e)
-            try:
-                self.parent.obs_conn.cl_events.callback.deregister([self.parent.obs_conn.on_input_volume_meters,self.parent.obs_conn.on_input_volume_changed])
-            except Exception as e:
-                print("Couldn't deregister event listeners:",e)
+            self.parent.obs_conn.disconnect()
+            self.parent.fanout.stop()
+        self.set_playing(not self.is_playing)
+        self.parent.grid_panel.grid.SetFocus()
+
+    def set_playing(self, playing):
+        self.is_playing = playing
+        if playing:
+            self.button_play.SetBitmap(wx.Bitmap(os.path.join(self.directory,"stop.png"),wx.BITMAP_TYPE_PNG))
+            self.button_play.SetToolTip("Stop")
+        else:
             self.button_play.SetBitmap(wx.Bitmap(os.path.join(self.directory,"play.png"),wx.BITMAP_TYPE_PNG))
             self.button_play.SetToolTip("Play")
-        self.parent.grid_panel.grid.SetFocus()
         
     def on_settings(self,event):
         SettingsUI(self.parent)
@@ -407,24 +848,149 @@ class Ribbon(wx.Panel):
             except IOError:
                 wx.LogError("Cannot save current data in file '%s'." % pathname)
         self.parent.grid_panel.grid.SetFocus()
+
+    def on_export_latency(self, event):
+        if not os.path.isdir("./latency"):
+            os.makedirs("./latency")
+        with wx.FileDialog(self, "Export take latency", wildcard="CSV files (*.csv)|*.csv|JSON files (*.json)|*.json",
+                           defaultDir="./latency", style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            pathname = fileDialog.GetPath()
+            try:
+                if pathname.lower().endswith(".json"):
+                    self.parent.latency.export_json(pathname)
+                else:
+                    self.parent.latency.export_csv(pathname)
+                print(f"Exported take latency to {pathname}")
+            except IOError:
+                wx.LogError(f"Cannot export take latency to '{pathname}'.")
+        self.parent.grid_panel.grid.SetFocus()
         
     def on_refresh(self,event):
-        self.parent.grid_panel.set_scene_choices()
-        self.parent.grid_panel.set_transition_choices()
+        # One batch on the dispatcher, the lists come back to on_lists_fetched
+        self.parent.dispatcher.submit(self.parent.obs_conn.get_scene_and_transition_lists,
+                                      callback=self.on_lists_fetched)
         self.parent.grid_panel.grid.SetFocus()
+
+    def on_lists_fetched(self, result, error):
+        scenes, transitions = result if result is not None else (None, None)
+        if scenes is not None:
+            self.parent.grid_panel.set_scene_choices(scenes)
+        if transitions is not None:
+            self.parent.grid_panel.set_transition_choices(transitions)
    
     def on_visible(self, event):
         button = event.GetEventObject()
+        scene, items = self.parent.obs_conn.get_visible_items()
+        if items is None:
+            # Not indexed yet, only right after connecting
+            self.parent.dispatcher.submit(self.parent.obs_conn.index_scenes, [], program=True,
+                                          callback=lambda result, error: self.show_visible_menu(button, error))
+            return
+        self.show_visible_menu(button)
+
+    def show_visible_menu(self, button, error=None):
+        scene, items = self.parent.obs_conn.get_visible_items()
+        if items is None:
+            print("Couldn't list the program scene's items:", error)
+            wx.Bell()
+            return
         screen_pos = button.GetScreenPosition()
         button_size = button.GetSize()
         client_pos = self.ScreenToClient(screen_pos)
         menu_x = client_pos.x
         menu_y = client_pos.y + button_size.height
-        items = self.parent.obs_conn.get_visible_items()
-        self.PopupMenu(VisiblityPopupMenu(self, items), menu_x, menu_y)
+        self.PopupMenu(VisiblityPopupMenu(self, scene, items), menu_x, menu_y)
         self.parent.grid_panel.grid.SetFocus()
 
-    
+
+class RundownTable(gridlib.GridTableBase):
+    def __init__(self, store, state, colours):
+        super().__init__()
+        self.store = store
+        self.state = state
+        self.colours = colours
+        self.editors = {}
+        self.attrs = {}
+        self.build_attrs()
+
+    def build_attrs(self):
+        # Tally colour is computed from the rundown state, so there is one
+        # attr per (column, tally) instead of one per cell.
+        self.attrs = {}
+        for col in range(len(LABELS)):
+            editor = self.editors.get(col)
+            for tally, colour in self.colours.items():
+                attr = gridlib.GridCellAttr()
+                attr.SetBackgroundColour(colour)
+                if editor is not None:
+                    editor.IncRef()
+                    attr.SetEditor(editor)
+                self.attrs[(col, tally)] = attr
+
+    def set_editor(self, col, editor):
+        self.editors[col] = editor
+        self.build_attrs()
+
+    def notify(self, message, *args):
+        view = self.GetView()
+        if view is not None:
+            view.ProcessTableMessage(gridlib.GridTableMessage(self, message, *args))
+
+    def resize(self, old_rows):
+        # Tell the view about a row count change made directly on the store
+        new_rows = len(self.store)
+        if new_rows > old_rows:
+            self.notify(gridlib.GRIDTABLE_NOTIFY_ROWS_APPENDED, new_rows - old_rows)
+        elif new_rows < old_rows:
+            self.notify(gridlib.GRIDTABLE_NOTIFY_ROWS_DELETED, new_rows, old_rows - new_rows)
+        self.notify(gridlib.GRIDTABLE_REQUEST_VIEW_GET_VALUES)
+
+    def GetNumberRows(self):
+        return len(self.store)
+
+    def GetNumberCols(self):
+        return len(LABELS)
+
+    def GetColLabelValue(self, col):
+        return LABELS[col]
+
+    def GetRowLabelValue(self, row):
+        return str(row + 1)
+
+    def IsEmptyCell(self, row, col):
+        return self.store.get(row, col) == ""
+
+    def GetValue(self, row, col):
+        return self.store.get(row, col)
+
+    def SetValue(self, row, col, value):
+        self.store.set(row, col, value)
+
+    def GetAttr(self, row, col, kind):
+        attr = self.attrs[(col, self.state.state_of(row))]
+        attr.IncRef()
+        return attr
+
+    def Clear(self):
+        self.store.clear()
+
+    def InsertRows(self, pos=0, numRows=1):
+        pos = self.store.insert(pos, numRows)
+        self.notify(gridlib.GRIDTABLE_NOTIFY_ROWS_INSERTED, pos, numRows)
+        return True
+
+    def AppendRows(self, numRows=1):
+        self.store.append(numRows)
+        self.notify(gridlib.GRIDTABLE_NOTIFY_ROWS_APPENDED, numRows)
+        return True
+
+    def DeleteRows(self, pos=0, numRows=1):
+        self.store.delete(pos, numRows)
+        self.notify(gridlib.GRIDTABLE_NOTIFY_ROWS_DELETED, pos, numRows)
+        return True
+
 class Grid(wx.Panel):
     def __init__(self,parent):
         super().__init__(parent=parent)
@@ -432,10 +998,99 @@ class Grid(wx.Panel):
         self.Bind(wx.EVT_KEY_DOWN, self.on_key_down)
         self.Bind(gridlib.EVT_GRID_LABEL_LEFT_DCLICK,self.on_double_click)
         self.Bind(gridlib.EVT_GRID_LABEL_RIGHT_CLICK,self.on_right_click)
-        self.Bind(gridlib.EVT_GRID_CELL_CHANGED,self.auto_resize_columns)
+        self.Bind(gridlib.EVT_GRID_CELL_CHANGED,self.on_cell_changed)
         self.Bind(gridlib.EVT_GRID_ROW_MOVE,self.on_row_move)
         keyboard.hook_key("space",self.on_spacebar)
+        self.state = RundownState(1)
+        self.stories = StoryIndex(1)
+        self.column_choices = {}
+        self.tally_colours = {PREVIEW: wx.Colour(0, 255, 0),  # Green
+                              PROGRAM: wx.Colour(255, 0, 0),  # Red
+                              None: wx.WHITE}
         self.init_gui()
+        self.tally_machine = TallyStateMachine(self.state, self.scene_of,
+                                               lambda rows: self.parent.event_bus.post("tally", self.on_tally_delta, rows, coalesce=False),
+                                               self.cue_armed, self.cue_of)
+        self.setup_journal()
+
+    def setup_journal(self):
+        # Only the main window autosaves, windows from "New" share the folder
+        self.journal = None
+        if not self.parent.autosave:
+            return
+        settings = load_autosave_settings()
+        self.journal = EditJournal(interval=settings['interval'],
+                                   compact_every=settings['compact_every'])
+        if self.journal.has_recovery():
+            try:
+                store, state = self.journal.recover()
+                existing_rows = len(self.store)
+                self.store.rows = store.rows
+                self.stories.reset(len(self.store))
+                self.history.clear()
+                self.table.resize(existing_rows)
+                self.state.restore(len(self.store), state.preview, state.program)
+                self.publish_snapshot()
+                self.validate_choices(2)
+                self.validate_choices(3)
+                self.arm_preview()
+                self.grid.ForceRefresh()
+            except Exception as e:
+                print("Couldn't recover autosaved rundown:", e)
+        self.journal.start(self.snapshot)
+        self.journal.snapshot()
+
+    def scene_of(self, row):
+        # Called from the websocket thread, the store may shrink underneath it
+        try:
+            return self.store.get(row, 2)
+        except IndexError:
+            return None
+
+    def cue_of(self, row):
+        # (scene, transition, super) for a row, also read from the websocket thread
+        try:
+            values = self.store.row(row)
+        except IndexError:
+            return None
+        return values[2], values[3], values[1]
+
+    def on_tally_delta(self, rows):
+        # OBS moved the tally on its own, repaint just those rows
+        self.refresh_tally(rows)
+        self.arm_preview()
+        self.record_tally('cue')
+
+    def cue_armed(self, name, transition):
+        self.parent.dispatcher.submit(self.parent.obs_conn.cue_preview, name, transition)
+        self.parent.fanout.cue(name, transition)
+
+    def snapshot(self):
+        return self.store.dump(), self.state.preview, self.state.program
+
+    def record(self, op, story_ids=None, **fields):
+        # story_ids are the newsroom IDs of the rows an insert made
+        self.history.capture(op, fields, self.stories.ids, story_ids)
+        self.stories.apply(op, fields)
+        if story_ids is not None:
+            self.stories.assign(fields['pos'], story_ids)
+        if self.journal is not None:
+            self.journal.record(op, **fields)
+        if self.parent.remote is not None:
+            self.parent.remote.publish(op, **fields)
+
+    def publish_snapshot(self):
+        # Whole rundown replaced, remote viewers start over from a snapshot
+        if self.parent.remote is not None:
+            self.parent.remote.reset(*self.snapshot())
+
+    def record_tally(self, op):
+        self.record(op, preview=self.state.preview, program=self.state.program)
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
         
     def on_row_move(self, event):
         # Let wx finish the visual move, then commit it to the data model.
@@ -445,59 +1100,136 @@ class Grid(wx.Panel):
     def _commit_row_reorder_to_model(self):
         g = self.grid
         nrows = g.GetNumberRows()
-        ncols = g.GetNumberCols()
 
-        # 1) Capture the visual -> physical mapping after the drop
-        #    order[v] = physical row index now displayed at visual position v
+        # order[v] = physical row index now displayed at visual position v
         order = [g.GetRowAt(v) for v in range(nrows)]
 
-        # 2) Snapshot row content and any per-cell background colors you care about
-        rows = []
-        bgs  = []
-        for v in range(nrows):
-            phys = order[v]
-            rows.append([g.GetCellValue(phys, c) for c in range(ncols)])
-            bgs.append([g.GetCellBackgroundColour(phys, c) for c in range(ncols)])
-
-        # 3) Normalize row mapping and write data back in the visual order
-        g.Freeze()
-        g.BeginBatch()
+        # Reset visual remapping so physical order is 0..n-1 again, the
+        # store is reordered to match and only the moved rows repainted
+        g.ResetRowPos()
+        self.permute_rows(order)
+        self.arm_preview()
+
+    def permute_rows(self, order, start=0):
+        start, order = moved_range(order, start)
+        if not order:
+            return
+        self.store.permute(order, start)
+        # Tally colours come from the state, so remap its indices too
+        self.refresh_tally(self.state.move_rows(order, start))
+        self.record('move', **move_fields(start, order))
+        last_col = self.grid.GetNumberCols() - 1
+        rect = self.grid.BlockToDeviceRect(gridlib.GridCellCoords(start, 0),
+                                           gridlib.GridCellCoords(start + len(order) - 1, last_col))
+        self.grid.GetGridWindow().RefreshRect(rect)
+
+    def apply_mos(self, message, source):
+        # Newsroom edits land as the smallest set of row edits, the tally
+        # follows the rows it was on and the on-air row is left alone
+        from mos_ingest import plan as plan_mos
+        ops = plan_mos(message, self.stories.ids, self.store.rows, self.state.program)
+        if ops is None:
+            return
+        self.history.begin(f"Newsroom {message['type']}")
+        self.grid.BeginBatch()
         try:
-            # Reset visual remapping so physical order is 0..n-1 again
-            g.ResetRowPos()
-
-            # Overwrite rows so physical row r contains the data that was at visual r
-            for r in range(nrows):
-                for c in range(ncols):
-                    g.SetCellValue(r, c, rows[r][c])
-                    g.SetCellBackgroundColour(r, c, bgs[r][c])
-
-            # Optional: renumber row labels to match indices
-            for r in range(nrows):
-                g.SetRowLabelValue(r, str(r+1))
+            for op in ops:
+                self.apply_edit(op)
         finally:
-            g.EndBatch()
-            g.Thaw()
-            g.ForceRefresh()
+            self.grid.EndBatch()
+            self.history.end()
+        self.arm_preview()
+        self.grid.ForceRefresh()
+        self.parent.obs_conn.request_scene_index(self.store.column(2))
+        elapsed = (time.perf_counter() - message['received']) * 1000
+        print(f"{message['type']} from {source}: {len(ops)} edits in {elapsed:.1f} ms")
 
-        # Rebuild choice editors (since you rely on these)
-        self.set_scene_choices()
-        self.set_transition_choices()
+    def apply_edit(self, op):
+        kind = op[0]
+        if kind == 'delete':
+            _, pos, count = op
+            self.grid.DeleteRows(pos=pos, numRows=count)
+            self.refresh_tally(self.state.delete_rows(pos, count))
+            self.record('delete', pos=pos, count=count)
+        elif kind == 'insert':
+            _, pos, ids = op
+            self.grid.InsertRows(pos=pos, numRows=len(ids))
+            self.refresh_tally(self.state.insert_rows(pos, len(ids)))
+            self.record('insert', pos=pos, count=len(ids), story_ids=ids)
+        elif kind == 'move':
+            self.permute_rows(*op[1:])
+        elif kind == 'set':
+            _, row, col, value = op
+            choices = self.column_choices.get(col)
+            if col >= 2 and value != "" and choices is not None and value not in choices:
+                print(f"{value} isn't in OBS, left row {row + 1} blank")
+                value = ""
+            self.store.set(row, col, value)
+            self.record('set', row=row, col=col, value=value)
+            self.refresh_rows({row})
+
+    def undo(self, event=None):
+        step, edits = self.history.pop_undo()
+        if step is None:
+            wx.Bell()
+            return
+        self.replay(edits, step.before)
+
+    def redo(self, event=None):
+        step, edits = self.history.pop_redo()
+        if step is None:
+            wx.Bell()
+            return
+        self.replay(edits, step.after)
+
+    def replay(self, edits, snapshot):
+        # The same targeted edits as any other change, journalled and sent
+        # to remote viewers, but not recorded as a new step
+        self.history.replaying = True
+        self.grid.BeginBatch()
+        try:
+            for edit in edits:
+                self.apply_edit(edit)
+        finally:
+            self.grid.EndBatch()
+            self.history.replaying = False
+        self.history.done(snapshot)
+        self.arm_preview()
         
     def on_spacebar(self,event):
-        focus = wx.Window.FindFocus()
-        if focus is None and self.parent.ribbon_panel.live_mode == True:
-            self.advance_rundown()
+        # Global hook thread: when NROBS has focus on_key_down has the key
+        if event.event_type != "down":
+            return
+        if self.parent.ribbon_panel.live_mode == True and not self.parent.active:
+            self.parent.take_inputs.submit("hotkey", TAKE)
+
+    def on_input_command(self, command, arg, source, received):
+        if command == TAKE:
+            took = self.advance_rundown(received)
+            self.parent.take_inputs.dispatched(source, received)
+            if not took:
+                # Nothing for OBS to acknowledge
+                self.parent.take_inputs.acknowledged()
+        elif command == BACK:
+            row = (self.state.preview if self.state.preview is not None else len(self.store)) - 1
+            if row >= 0:
+                self.cue_row(row)
+            self.parent.take_inputs.dispatched(source, received)
+        elif command == JUMP:
+            # Button boxes count rows from 1, like the grid's labels
+            if 0 < arg <= len(self.store):
+                self.cue_row(arg - 1)
+            self.parent.take_inputs.dispatched(source, received)
         
     def init_gui(self):
         self.grid = gridlib.Grid(self)
         self.grid.SetInitialSize((500,100))
+        self.store = RowStore(1)
+        self.history = UndoHistory(self.store)
+        self.table = RundownTable(self.store, self.state, self.tally_colours)
+        self.grid.SetTable(self.table, True)
         self.grid.EnableDragRowMove(enable=True)
-        self.grid.CreateGrid(1,4)
-        self.grid.SetColLabelValue(0,"SLUG")
-        self.grid.SetColLabelValue(1,"SUPER")
-        self.grid.SetColLabelValue(2,"SCENE")
-        self.grid.SetColLabelValue(3,"TRANSITION")
+        self.publish_snapshot()
         self.set_scene_choices()
         self.set_transition_choices()
         sizer = wx.FlexGridSizer(1,1,1,1)
@@ -505,18 +1237,11 @@ class Grid(wx.Panel):
         sizer.AddGrowableRow(0,1)
         sizer.Add(self.grid,1,wx.ALL|wx.EXPAND)
         self.SetSizer(sizer)
-        self.highlight_row(0, wx.Colour(0, 255, 0))  # Green
+        self.refresh_tally({0})
         self.grid.SetFocus()
     
     def save_rundown(self, event, filename):
-        rundown = {}
-        for row in range(self.grid.GetNumberRows()):
-            rundown[str(row)] = {
-                'slug': self.grid.GetCellValue(row, 0),
-                'super': self.grid.GetCellValue(row, 1),
-                'scene': self.grid.GetCellValue(row, 2),
-                'transition': self.grid.GetCellValue(row, 3),
-                }
+        rundown = self.store.dump()
         if not os.path.isdir("./saved_rundowns"):
             os.makedirs("./saved_rundowns")
         with open(filename, "w") as file:
@@ -528,24 +1253,22 @@ class Grid(wx.Panel):
             with open(filename, "r") as file:
                 rundown = json.load(file)
 
-            self.grid.ClearGrid()
-            existing_rows = self.grid.GetNumberRows()
-            needed_rows = len(rundown)
-
-            if needed_rows > existing_rows:
-                self.grid.AppendRows(needed_rows - existing_rows)
-            elif needed_rows < existing_rows:
-                self.grid.DeleteRows(0, existing_rows - needed_rows)
-
-            for row_str, data in rundown.items():
-                row = int(row_str)
-                self.grid.SetCellValue(row, 0, data.get('slug', ''))
-                self.grid.SetCellValue(row, 1, data.get('super', ''))
-                self.grid.SetCellValue(row, 2, data.get('scene', ''))
-                self.grid.SetCellValue(row, 3, data.get('transition', ''))
-            self.set_scene_choices()
-            self.set_transition_choices()
+            existing_rows = len(self.store)
+            self.store.load(rundown)
+            self.stories.reset(len(self.store))
+            self.history.clear()
+            self.table.resize(existing_rows)
+            self.state.reset(len(self.store))
+            self.publish_snapshot()
+            self.validate_choices(2)
+            self.validate_choices(3)
+            self.arm_preview()
             self.grid.ForceRefresh()
+            if self.journal is not None:
+                self.journal.snapshot()
+            self.parent.latency.reset(os.path.basename(filename))
+            self.parent.obs_conn.request_scene_index(self.store.column(2))
+            self.parent.ribbon_panel.show_latency()
             print(f"Loaded rundown from {filename}")
         except Exception as e:
             wx.LogError(f"Could not load rundown from file '{filename}': {e}")
@@ -563,70 +1286,95 @@ class Grid(wx.Panel):
         if event:
             event.Skip()
     
-    def highlight_row(self, row, color):
-        for col in range(self.grid.GetNumberCols()):
-            self.grid.SetCellBackgroundColour(row, col, color)
-
-    def clear_all_highlights(self):
-        for row in range(self.grid.GetNumberRows()):
-            for col in range(self.grid.GetNumberCols()):
-                self.grid.SetCellBackgroundColour(row, col, wx.WHITE)    
+    def refresh_tally(self, rows):
+        # Only repaint the rows whose preview/program state actually changed,
+        # the table computes their colour from the state.
+        self.refresh_rows(rows)
+
+    def refresh_rows(self, rows):
+        last_col = self.grid.GetNumberCols() - 1
+        for row in rows:
+            if 0 <= row < len(self.store):
+                rect = self.grid.BlockToDeviceRect(gridlib.GridCellCoords(row, 0),
+                                                   gridlib.GridCellCoords(row, last_col))
+                self.grid.GetGridWindow().RefreshRect(rect)
+
+    def arm_preview(self):
+        row = self.state.preview
+        if row is None:
+            return
+        cue = self.cue_of(row)
+        if cue is not None:
+            self.state.arm(*cue)
+
+    def on_cell_changed(self, event):
+        row, col = event.GetRow(), event.GetCol()
+        self.record('set', row=row, col=col, value=self.store.get(row, col))
+        if col == 2:
+            self.parent.obs_conn.request_scene_index([self.store.get(row, col)])
+        if row == self.state.preview:
+            self.arm_preview()
+        self.auto_resize_columns(event)
      
     def add_row(self):
-        row = self.grid.GetNumberRows()
+        row = len(self.store)
         self.grid.AppendRows(1)
-        self.grid.SetCellValue(row, 0, "")  # SLUG
-        self.grid.SetCellValue(row, 1, "")  # SUPER
-        self.grid.SetCellValue(row, 2, "")  # SCENE
-        self.grid.SetCellValue(row, 3, "")  # TRANSITION
-        self.set_scene_choices()
-        self.set_transition_choices()
-        self.grid.ForceRefresh()
+        self.record('insert', pos=row, count=1)
+        self.refresh_tally(self.state.insert_rows(row))
      
-    def set_scene_choices(self):
+    def set_scene_choices(self, new_scene_choices=None):
         if hasattr(self.parent, "obs_conn"):
-            new_scene_choices = self.parent.obs_conn.get_scene_list()
-            current_selections = {}
-            for row in range(self.grid.GetNumberRows()):
-                current_value = self.grid.GetCellValue(row, 2)
-                current_selections[row] = current_value
-            for row in range(self.grid.GetNumberRows()):
-                editor = wx.grid.GridCellChoiceEditor(choices=new_scene_choices, allowOthers=False)
-                self.grid.SetCellEditor(row, 2, editor)
-                self.grid.SetCellValue(row, 2, "")
-                if current_selections[row] in new_scene_choices:
-                    self.grid.SetCellValue(row, 2, current_selections[row])
-            self.grid.ForceRefresh()
+            self.update_choices(2, self.parent.obs_conn.scene_cache, new_scene_choices)
         
-    def set_transition_choices(self):
+    def set_transition_choices(self, new_transition_choices=None):
         if hasattr(self.parent, "obs_conn"):
-            new_transition_choices = self.parent.obs_conn.get_transition_list()
-            current_selections = {}
-            for row in range(self.grid.GetNumberRows()):
-                current_value = self.grid.GetCellValue(row, 3)
-                current_selections[row] = current_value
-            for row in range(self.grid.GetNumberRows()):
-                editor = wx.grid.GridCellChoiceEditor(choices=new_transition_choices, allowOthers=False)
-                self.grid.SetCellEditor(row, 3, editor)
-                self.grid.SetCellValue(row, 3, "")
-                if current_selections[row] in new_transition_choices:
-                    self.grid.SetCellValue(row, 3, current_selections[row])
+            self.update_choices(3, self.parent.obs_conn.transition_cache, new_transition_choices)
+
+    def update_choices(self, col, cache, new_choices=None):
+        if new_choices is not None:
+            cache.set(new_choices)
+        # Never fetches here, the lists are fetched off the UI thread
+        choices = cache.peek()
+        if choices is None or choices == self.column_choices.get(col):
+            return
+        # One editor per column, shared by every row through the table's
+        # attrs (wx reference counts it), so new rows need no editor.
+        editor = gridlib.GridCellChoiceEditor(choices=choices, allowOthers=False)
+        self.table.set_editor(col, editor)
+        self.column_choices[col] = choices
+        self.validate_choices(col)
+        self.grid.ForceRefresh()
+
+    def validate_choices(self, col):
+        choices = self.column_choices.get(col)
+        if choices is None:
+            return
+        valid = set(choices)
+        changed = False
+        self.history.begin("Clear Missing Scenes" if col == 2 else "Clear Missing Transitions")
+        for row, value in enumerate(self.store.column(col)):
+            if value != "" and value not in valid:
+                self.store.set(row, col, "")
+                self.record('set', row=row, col=col, value="")
+                changed = True
+        self.history.end()
+        if changed:
             self.grid.ForceRefresh()
      
     def on_double_click(self, event):
         row = event.GetRow()
-        try:
-            name = self.grid.GetCellValue(row,2)
-            self.parent.obs_conn.cl.set_current_preview_scene(name)
-        except Exception as e:
-            print(e)
-        for r in range(self.grid.GetNumberRows()):
-            for c in range(self.grid.GetNumberCols()):
-                self.grid.SetCellBackgroundColour(r, c, wx.WHITE)
-        for col in range(self.grid.GetNumberCols()):
-            self.grid.SetCellBackgroundColour(row, col, wx.GREEN)
+        if row < 0:
+            return
+        self.cue_row(row)
 
-        self.grid.ForceRefresh()
+    def cue_row(self, row):
+        name = self.store.get(row,2)
+        if name != "":
+            self.parent.dispatcher.submit(self.parent.obs_conn.set_preview, name, callback=self.on_command_done)
+            self.parent.fanout.cue(name, self.store.get(row,3).strip() or "Cut")
+        self.refresh_tally(self.state.set_preview(row))
+        self.arm_preview()
+        self.record_tally('cue')
         self.grid.ClearSelection()
     
     def on_right_click(self,event):
@@ -634,128 +1382,187 @@ class Grid(wx.Panel):
         x,y = event.GetPosition()
         self.PopupMenu(RowPopupMenu(self, row), x, y)
     
-    def send_super_text(self,text):
-        try:
-            headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-            data = text
-            print(data)
-            requests.post(self.parent.super_endpoint,headers=headers,data=data)
-        except Exception as e:
-            print("There was a problem sending super text:",e)
+    def send_super_text(self,text,take_id=None):
+        print(text)
+        def on_delivered(record):
+            if record['ok']:
+                self.parent.latency.mark(take_id, 'super_delivered')
+        if self.parent.supers is not None:
+            self.parent.supers.send(text, on_delivered=on_delivered)
     
     def on_key_down(self, event):
+        pressed = time.perf_counter()
         code = event.GetKeyCode()
         if event.ControlDown() and code == ord('I'):
             self.add_row()
             return
         if code == wx.WXK_SPACE:
-            try:
-                self.advance_rundown()
-            except AttributeError:
-                print("Couldn't advance the rundown because the OBS instance does not exist.")
-            except Exception as e:
-                print("Unhandled exception advancing rundown:",e)
+            # Through the input service like every other source, for the
+            # debounce and the double-take check
+            self.parent.take_inputs.submit("keyboard", TAKE, received=pressed)
         else:
             event.Skip()
         
-    def advance_rundown(self):
-        red_row = None
-        green_row = None
-        for row in range(self.grid.GetNumberRows()):
-            color = self.grid.GetCellBackgroundColour(row, 0)
-            if color == wx.Colour(0, 255, 0):  # Green
-                green_row = row
-                print(green_row)
-            elif color == wx.Colour(255, 0, 0):  # Red
-                red_row = row
-                print(red_row)
-        name = self.grid.GetCellValue(green_row,2)
-        transition = self.grid.GetCellValue(green_row,3)
+    def advance_rundown(self, pressed=None):
+        # True only if the primary OBS has a take to acknowledge
+        green_row = self.state.preview
+        if green_row is None:
+            return False
+        primary_connected = self.parent.obs_conn.connected
+        if not primary_connected and not self.parent.fanout.any_connected():
+            # Don't move the tally for a take no OBS will ever see
+            print("Take rejected, not connected to OBS.")
+            wx.Bell()
+            return False
+        name = self.store.get(green_row,2)
+        transition = self.store.get(green_row,3)
         if transition.strip() == "":
             transition = "Cut"
-        super_text = self.grid.GetCellValue(green_row,1)
-        if name != "":
-            self.parent.obs_conn.cl.set_current_preview_scene(name)
-            self.parent.obs_conn.cl.set_current_scene_transition(transition)
-        self.clear_all_highlights()
-        if green_row is not None:
-            self.highlight_row(green_row, wx.Colour(255, 0, 0))
-            next_row = green_row + 1
-            if next_row >= self.grid.GetNumberRows():
-                next_row = 0
-        if next_row < self.grid.GetNumberRows():
-            self.highlight_row(next_row, wx.Colour(0, 255, 0))
-        elif red_row is None:
-            self.highlight_row(0, wx.Colour(0, 255, 0))
-        self.grid.ForceRefresh()
+        super_text = self.store.get(green_row,1)
+        # Tally updates right away, OBS and the super endpoint are driven from
+        # their own threads so a slow box can't stall the spacebar. The state
+        # moves first so OBS echoing the take finds it already taken.
+        take_id = self.parent.latency.begin(green_row, name, pressed)
+        with self.state.lock:
+            self.refresh_tally(self.state.take())
+            self.arm_preview()
         if name != "":
-            self.parent.obs_conn.cl.trigger_studio_mode_transition()
+            # Every box gets the take at once, each on its own thread
+            self.parent.fanout.take(name, transition, callback=self.on_follower_done)
+            if primary_connected:
+                self.parent.dispatcher.submit(self.parent.obs_conn.take, name, transition, take_id=take_id, callback=self.on_take_done)
+        self.record_tally('take')
         if super_text.strip() != "":
-            wx.CallAfter(self.send_super_text(super_text))
+            self.send_super_text(super_text, take_id)
+        return name != "" and primary_connected
+
+    def on_command_done(self, result, error):
+        if error is not None:
+            print("OBS command failed:", error)
+
+    def on_take_done(self, result, error):
+        self.parent.take_inputs.acknowledged()
+        self.on_command_done(result, error)
+        self.parent.ribbon_panel.show_latency()
+        self.parent.ribbon_panel.show_instances()
+
+    def on_follower_done(self, result, error):
+        self.parent.ribbon_panel.show_instances()
 
 class AudioPanel(wx.Panel):
-    def __init__(self, parent):
+    def __init__(self, parent, fps=None):
         super().__init__(parent=parent)
         self.parent = parent
         self.sizer = wx.FlexGridSizer(1,0,0,0)
+        self.strips = {}
+        self.fps = fps if fps is not None else load_meter_fps()
+        self.ticks = 0
+        # Every input's meters are drawn on this one canvas
+        self.bridge = MeterBridge(self)
+        self.sizer.Add(self.bridge,0,wx.ALL|wx.EXPAND,5)
         self.build_faders()
         self.SetSizerAndFit(self.sizer)
         self.Layout()
+        self.meter_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_meter_timer, self.meter_timer)
+        self.meter_timer.Start(int(1000 / self.fps))
         
     def build_faders(self):
+        # Reconcile against OBS: only strips that appeared or vanished change
         sys_appearance = wx.SystemSettings.GetAppearance()
         if sys_appearance.IsDark() and platform.system() != "Windows":
             self.directory = "./data/icons/dark"
         else:
             self.directory = "./data/icons/light"
-        self.sizer.Clear(True)
-        self.sizer.Layout()
-        inputs_list = self.parent.obs_conn.get_audio_inputs()
-        print(inputs_list)
-        source_and_level = self.parent.obs_conn.get_audio_levels(inputs_list)
-        for key, value in source_and_level.items():
-            sizer = wx.FlexGridSizer(0,2,1,1)
-            fader = setattr(self, f'{key}_fader', wx.Slider(self, value=int(value['level']), maxValue=0, minValue=-100,style=wx.SL_VERTICAL|wx.SL_MIN_MAX_LABELS|wx.SL_INVERSE|wx.SL_VALUE_LABEL))
-            fader = getattr(self,f'{key}_fader')
-            peak_meter = setattr(self, f'{key}_vu', PM.PeakMeterCtrl(self, 0, style=wx.SIMPLE_BORDER, agwStyle=PM.PM_VERTICAL))
-            peak_meter = getattr(self, f'{key}_vu')
-            peak_meter.SetMeterBands(2, 20)
-            peak_meter.SetRangeValue(66.67,83.3,100)
-            label = wx.StaticText(self,label=key)
-            sizer.AddMany([(fader,1,wx.ALL|wx.EXPAND|wx.CENTRE),
-                           (peak_meter,1,wx.ALL|wx.EXPAND|wx.CENTRE),
-                           (label,1,wx.ALL|wx.EXPAND|wx.CENTRE)])
-            fader.Bind(wx.EVT_SCROLL, lambda evt, name=key, fader=fader: self.parent.obs_conn.adjust_level(evt, name, fader))
-            if value['muted']:
-                bitmap = os.path.join(self.directory,'volume-slash.png')
-                name = "muted"
-            else:
-                bitmap = os.path.join(self.directory,'volume.png')
-                name = "unmuted"
-            button = wx.BitmapButton(self,bitmap=wx.Bitmap(bitmap,wx.BITMAP_TYPE_PNG),name=name)
-            button.Bind(wx.EVT_BUTTON, lambda evt, name=key: self.toggle_mute(evt, name))
-            sizer.Add(button,1,wx.CENTRE)
-            self.sizer.Add(sizer,1,wx.ALL|wx.EXPAND)
+        prefetched = self.parent.obs_conn.pop_prefetched_audio()
+        if prefetched is not None:
+            inputs_list, levels = prefetched
+        else:
+            inputs_list, levels = self.parent.obs_conn.get_audio_inputs(), None
+        for key in [key for key in self.strips if key not in inputs_list]:
+            self.remove_strip(key, layout=False)
+        new_inputs = {key: value for key, value in inputs_list.items() if key not in self.strips}
+        if levels is None:
+            levels = self.parent.obs_conn.get_audio_levels(new_inputs)
+        for key, value in levels.items():
+            if key in new_inputs:
+                self.add_strip(key, value)
+        self.update_bridge()
         self.Layout()
-    
-    def convert_obs_db_to_peakmeter(self, obs_db_level, peakmeter_max=100):
-        obs_db_level = max(-200, min(0, obs_db_level))
-        if obs_db_level <= -60:
-            return 0.0
+
+    def on_levels_fetched(self, result, error):
+        if error is not None:
+            print("Couldn't fetch audio levels:", error)
+            return
+        for key, value in result.items():
+            if key not in self.strips:
+                self.add_strip(key, value)
+        self.update_bridge()
+        self.Layout()
+        self.parent.Layout()
+
+    def add_strip(self, key, value):
+        strip = wx.Panel(self)
+        sizer = wx.FlexGridSizer(0,1,1,1)
+        fader = wx.Slider(strip, value=int(value['level']), maxValue=0, minValue=-100,style=wx.SL_VERTICAL|wx.SL_MIN_MAX_LABELS|wx.SL_INVERSE|wx.SL_VALUE_LABEL)
+        label = wx.StaticText(strip,label=value['name'])
+        sizer.AddMany([(fader,1,wx.ALL|wx.EXPAND|wx.CENTRE),
+                       (label,1,wx.ALL|wx.EXPAND|wx.CENTRE)])
+        fader.Bind(wx.EVT_SCROLL, lambda evt, key=key, fader=fader: self.parent.obs_conn.adjust_level(evt, self.strips[key]['name'], fader))
+        if value['muted']:
+            bitmap = os.path.join(self.directory,'volume-slash.png')
+            name = "muted"
         else:
-            converted_level = ((obs_db_level + 60) / 60) * peakmeter_max
-            return converted_level
+            bitmap = os.path.join(self.directory,'volume.png')
+            name = "unmuted"
+        button = wx.BitmapButton(strip,bitmap=wx.Bitmap(bitmap,wx.BITMAP_TYPE_PNG),name=name)
+        button.Bind(wx.EVT_BUTTON, lambda evt, key=key: self.toggle_mute(evt, self.strips[key]['name']))
+        sizer.Add(button,1,wx.CENTRE)
+        strip.SetSizer(sizer)
+        self.sizer.Add(strip,1,wx.ALL|wx.EXPAND)
+        self.strips[key] = {'panel': strip,
+                            'name': value['name'],
+                            'fader': fader,
+                            'label': label,
+                            'button': button}
+
+    def remove_strip(self, key, layout=True):
+        strip = self.strips.pop(key, None)
+        if strip is None:
+            return
+        self.sizer.Detach(strip['panel'])
+        strip['panel'].Destroy()
+        self.update_bridge()
+        if layout:
+            self.Layout()
+            self.parent.Layout()
+
+    def rename_strip(self, key, name):
+        strip = self.strips.get(key)
+        if strip is None:
+            return
+        strip['name'] = name
+        strip['label'].SetLabel(name)
+        self.update_bridge()
+
+    def update_bridge(self):
+        self.bridge.set_channels(strip['name'] for strip in self.strips.values())
+
+    def set_fader(self, key, dB):
+        strip = self.strips.get(key)
+        if strip is not None:
+            strip['fader'].SetValue(dB)
     
-    def update_vu(self, name, l, r):
-        try:
-            data = [self.convert_obs_db_to_peakmeter(l),self.convert_obs_db_to_peakmeter(r)]
-            peak_meter = getattr(self, f"{name}_vu")
-            peak_meter.SetData(arrayValue=data, offset=0, size=len(data))
-        except AttributeError:
-            print(f"No peak meter exists for {name}")
-        except Exception as e:
-            print(f"Error updating VU for {name}: {e}")
-        
+    def on_meter_timer(self, event):
+        bank = self.parent.obs_conn.meters
+        self.bridge.update(bank.drain())
+        self.bridge.tick()
+        self.ticks += 1
+        if self.ticks % self.fps == 0:
+            stats = bank.stats()
+            self.SetToolTip(f"Meters: {stats['received']} samples, {stats['coalesced']} coalesced, "
+                            f"{stats['dropped']} dropped, {stats['painted']} painted")
+
     def toggle_mute(self, event, name):
         sys_appearance = wx.SystemSettings.GetAppearance()
         if sys_appearance.IsDark() and platform.system() != "Windows":
@@ -824,7 +1631,7 @@ class SettingsUI(wx.Frame):
             self.parent.obs_conn.host = host
             self.parent.obs_conn.port = port
             self.parent.obs_conn.password = password
-            self.parent.super_endpoint = endpoint
+            self.parent.set_super_endpoint(endpoint)
         self.parent.save_settings()
         self.Destroy()
             
@@ -833,9 +1640,10 @@ class SettingsUI(wx.Frame):
         self.Destroy()
 
 class VisiblityPopupMenu(wx.Menu):
-    def __init__(self, parent, items):
+    def __init__(self, parent, scene, items):
         super().__init__()
         self.parent = parent
+        self.scene = scene
         self.build_items(items)
 
     def build_items(self, items):
@@ -844,7 +1652,7 @@ class VisiblityPopupMenu(wx.Menu):
             item.Check(value['enabled'])
             self.Bind(
                 wx.EVT_MENU,
-                lambda evt, k=key, v=value['id'], enabled=not value['enabled']: self.parent.parent.obs_conn.toggle_item(evt, k, v, enabled),
+                lambda evt, v=value['id'], enabled=not value['enabled']: self.parent.parent.obs_conn.toggle_item(evt, self.scene, v, enabled),
                 id=item.GetId()
             )
 
@@ -864,53 +1672,26 @@ class RowPopupMenu(wx.Menu):
         self.Bind(wx.EVT_MENU, self.on_remove, remove)
         
     def on_add_before(self, event):
-        pos = self.row - 1
+        pos = max(self.row - 1, 0)
         self.parent.grid.InsertRows(pos=pos,numRows=1,updateLabels=True)
+        self.parent.state.insert_rows(pos)
+        self.parent.record('insert', pos=pos, count=1)
         wx.CallAfter(self.parent.grid.ForceRefresh)
-        wx.CallAfter(self.parent.grid.set_scene_choices)
-        wx.CallAfter(self.parent.grid.set_transition_choices)
     
     def on_add_after(self, event):
         pos = self.row + 1
         self.parent.grid.InsertRows(pos=pos,numRows=1,updateLabels=True)
+        self.parent.state.insert_rows(pos)
+        self.parent.record('insert', pos=pos, count=1)
         wx.CallAfter(self.parent.grid.ForceRefresh)
-        wx.CallAfter(self.parent.parent.grid_panel.set_scene_choices)
-        wx.CallAfter(self.parent.parent.grid_panel.set_transition_choices)
     
     def on_remove(self, event):
         self.parent.grid.DeleteRows(pos=self.row,numRows=1,updateLabels=True)
+        self.parent.refresh_tally(self.parent.state.delete_rows(self.row))
+        self.parent.record('delete', pos=self.row, count=1)
+        self.parent.arm_preview()
         wx.CallAfter(self.parent.grid.ForceRefresh)
-        wx.CallAfter(self.parent.parent.grid_panel.set_scene_choices)
-        wx.CallAfter(self.parent.parent.grid_panel.set_transition_choices)
 
-class AboutFrame(wx.Frame):
-    def __init__(self, parent):
-        super().__init__(parent=parent)
-        self.parent = parent
-        self.SetTitle('NROBS - About')
-        self.SetIcon(wx.Icon('./data/icons/app.png',wx.BITMAP_TYPE_PNG))
-        self.panel_main = wx.Panel(self)
-        self.sizer_main = wx.FlexGridSizer(6,1,10,10)
-        self.font = wx.Font(12, wx.FONTFAMILY_MODERN, 0, 90, underline = False, faceName ="Arial Bold")
-        self.logo = wx.Image('./data/icons/app.png', wx.BITMAP_TYPE_PNG)
-        self.logo.Rescale(300,300)
-        self.bitmap_logo = wx.StaticBitmap(self.panel_main,bitmap=self.logo.ConvertToBitmap())
-        self.label_program_name = wx.StaticText(self.panel_main, label="NROBS")
-        self.label_program_name.SetFont(self.font)
-        self.label_byline = wx.StaticText(self.panel_main, label="by Tom Smith")
-        self.label_email = hl.HyperLinkCtrl(self.panel_main, label="tom@tomsmith.media",URL="mailto:tom@tomsmith.media")
-        self.hl_icon_attribution = hl.HyperLinkCtrl(self.panel_main,label="Uicons by Flaticon",URL="https://www.flaticon.com/uicons")
-        self.sizer_main.AddMany([(self.bitmap_logo,1,wx.ALL|wx.CENTER|wx.ALIGN_CENTER),
-                                 (self.label_program_name,1,wx.ALL|wx.CENTER|wx.ALIGN_CENTER),
-                                 (self.label_byline,1,wx.ALL|wx.CENTER|wx.ALIGN_CENTER),
-                                 (self.label_email,1,wx.ALL|wx.CENTER|wx.ALIGN_CENTER),
-                                 (self.hl_icon_attribution,1,wx.ALL|wx.CENTER|wx.ALIGN_CENTER)])
-        
-        self.panel_main.SetSizerAndFit(self.sizer_main)
-        self.SetInitialSize(self.GetBestSize())
-        self.Layout()
-        self.Show()
-        
 def load_obs_settings():
     if os.path.isfile("data/settings/obs_settings.json"):
         with open("data/settings/obs_settings.json","r") as file:
@@ -920,6 +1701,91 @@ def load_obs_settings():
     else:
         return None
     
+def load_obs_instances():
+    # {"primary": "Main", "instances": [{"name": "Main", "host": ..., "port": ..., "password": ...}, ...]}
+    # The primary drives tally, audio and supers, the rest follow takes and cues.
+    if not os.path.isfile("data/settings/obs_instances.json"):
+        return None, "OBS", []
+    try:
+        with open("data/settings/obs_instances.json","r") as file:
+            settings = json.load(file)
+        instances = [x for x in settings.get('instances', []) if x.get('host')]
+        for i, instance in enumerate(instances):
+            instance.setdefault('name', f"OBS {i + 1}")
+            instance.setdefault('port', 4455)
+            instance.setdefault('password', "")
+        if not instances:
+            return None, "OBS", []
+        primary = next((x for x in instances if x['name'] == settings.get('primary')), instances[0])
+        followers = [x for x in instances if x is not primary]
+        return (primary['host'], int(primary['port']), primary['password']), primary['name'], followers
+    except Exception as e:
+        print("Couldn't load OBS instances:", e)
+        return None, "OBS", []
+
+def load_meter_fps():
+    if os.path.isfile("data/settings/meter_settings.json"):
+        try:
+            with open("data/settings/meter_settings.json","r") as file:
+                settings = json.load(file)
+                return min(60, max(1, int(settings['fps'])))
+        except Exception as e:
+            print("Couldn't load meter settings:",e)
+    return 20
+    
+def load_autosave_settings():
+    settings = {'interval': 5.0, 'compact_every': 500}
+    if os.path.isfile("data/settings/autosave.json"):
+        try:
+            with open("data/settings/autosave.json","r") as file:
+                settings.update(json.load(file))
+        except Exception as e:
+            print("Couldn't load autosave settings:",e)
+    return settings
+    
+def load_super_server_settings():
+    settings = {'enabled': False, 'host': '0.0.0.0', 'port': 8765}
+    if os.path.isfile("data/settings/super_server.json"):
+        try:
+            with open("data/settings/super_server.json","r") as file:
+                settings.update(json.load(file))
+        except Exception as e:
+            print("Couldn't load super server settings:",e)
+    return settings
+    
+def load_mos_settings():
+    settings = {'enabled': False, 'host': '0.0.0.0', 'port': 10541,
+                'watch_dir': 'data/ingest', 'encoding': 'utf-16-be', 'poll': 1.0}
+    if os.path.isfile("data/settings/mos_ingest.json"):
+        try:
+            with open("data/settings/mos_ingest.json","r") as file:
+                settings.update(json.load(file))
+        except Exception as e:
+            print("Couldn't load MOS ingest settings:",e)
+    return settings
+
+def load_remote_api_settings():
+    settings = {'enabled': False, 'host': '127.0.0.1', 'port': 8766, 'token': ''}
+    if os.path.isfile("data/settings/remote_api.json"):
+        try:
+            with open("data/settings/remote_api.json","r") as file:
+                settings.update(json.load(file))
+        except Exception as e:
+            print("Couldn't load remote API settings:",e)
+    return settings
+
+def load_take_input_settings():
+    settings = {'host': '0.0.0.0', 'udp_port': None, 'http_port': None,
+                'debounce_ms': 150, 'ack_timeout': 2.0,
+                'midi_port': None, 'midi_notes': {'take': 60, 'back': 59}}
+    if os.path.isfile("data/settings/take_inputs.json"):
+        try:
+            with open("data/settings/take_inputs.json","r") as file:
+                settings.update(json.load(file))
+        except Exception as e:
+            print("Couldn't load take input settings:",e)
+    return settings
+
 def load_super_endpoint():
     if os.path.isfile("data/settings/super_endpoint.json"):
         with open("data/settings/super_endpoint.json","r") as file:
@@ -1024,13 +1890,12 @@ class FirstBoot(wx.Frame):
         self.Destroy()
 
 class Splash(SplashScreen):
-    def __init__(self,parent=None):
+    def __init__(self,parent=None,timeout=3000):
         bitmap = wx.Bitmap("./data/icons/splash.png",type=wx.BITMAP_TYPE_PNG)
         splash = wx.adv.SPLASH_CENTRE_ON_SCREEN | wx.adv.SPLASH_TIMEOUT
-        duration = 3000
         super(Splash, self).__init__(bitmap=bitmap,
                                      splashStyle=splash,
-                                     milliseconds=duration,
+                                     milliseconds=timeout,
                                      parent=None,
                                      id=-1,
                                      pos=wx.DefaultPosition,
@@ -1053,7 +1918,11 @@ def main():
     obs_settings = load_obs_settings()
     if obs_settings is not None:
         app=[]; app = wx.App(None)
-        frame = GUI("NROBS",obs_settings,endpoint)
+        boot.mark("app")
+        primary, primary_name, followers = load_obs_instances()
+        if primary is not None:
+            obs_settings = primary
+        frame = GUI("NROBS",obs_settings,endpoint,autosave=True,primary_name=primary_name,followers=followers,main_window=True)
         app.SetTopWindow(frame)
         app.MainLoop()
     else:
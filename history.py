@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Undo/redo history for NROBS rundown edits.
+"""
+
+from collections import deque
+
+from rundown_store import RowStore, move_order
+
+EDIT_OPS = ('set', 'insert', 'delete', 'move')
+LABELS = {'set': "Edit", 'insert': "Add Row", 'delete': "Remove Row", 'move': "Move Rows"}
+
+class Step(object):
+    def __init__(self, label, before):
+        self.label = label
+        self.before = before
+        self.after = before
+        self.forward = []
+        self.inverse = []
+
+class UndoHistory(object):
+    """Undoable steps built from the same ops the edit journal records.
+
+    capture() is called with every op before it reaches the journal and
+    works out its inverse from the snapshot taken after the previous op
+    (the old value of a cell, the rows and story IDs a delete removed).
+    Snapshots are RowStore chunk tuples, so each step costs its ops plus
+    the chunks its edits replaced, not a copy of the rundown. Ops between
+    begin() and end() are one step, anything else is a step of its own.
+    Edits are in the grid's form: ('set', row, col, value),
+    ('insert', pos, story_ids), ('delete', pos, count) and
+    ('move', order, start).
+    """
+    def __init__(self, store, limit=2000):
+        self.store = store
+        self.undo_steps = deque(maxlen=limit)
+        self.redo_steps = []
+        self.last = store.snapshot()
+        self.step = None
+        self.depth = 0
+        self.replaying = False
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps = []
+        self.last = self.store.snapshot()
+        self.step = None
+        self.depth = 0
+
+    def begin(self, label):
+        if self.depth == 0:
+            self.step = Step(label, self.last)
+        self.depth += 1
+
+    def end(self):
+        self.depth = max(0, self.depth - 1)
+        if self.depth == 0 and self.step is not None:
+            step = self.step
+            self.step = None
+            if step.forward:
+                step.after = self.last
+                self.undo_steps.append(step)
+                self.redo_steps = []
+
+    def capture(self, op, fields, story_ids, inserted_ids=None):
+        if op not in EDIT_OPS or self.replaying:
+            return
+        before = RowStore.view(self.last)
+        if op == 'set':
+            row, col = fields['row'], fields['col']
+            forward = [('set', row, col, fields['value'])]
+            inverse = [('set', row, col, before.get(row, col))]
+        elif op == 'insert':
+            pos, count = fields['pos'], fields['count']
+            forward = [('insert', pos, list(inserted_ids or [None] * count))]
+            inverse = [('delete', pos, count)]
+        elif op == 'delete':
+            pos, count = fields['pos'], fields['count']
+            forward = [('delete', pos, count)]
+            inverse = [('insert', pos, story_ids[pos:pos + count])]
+            for offset, values in enumerate(before.slice(pos, pos + count)):
+                inverse.extend(('set', pos + offset, col, value) for col, value in enumerate(values) if value != "")
+        else:
+            start, order = move_order(fields)
+            undo_order = [0] * len(order)
+            for new, old in enumerate(order):
+                undo_order[old - start] = start + new
+            forward = [('move', order, start)]
+            inverse = [('move', undo_order, start)]
+        single = self.step is None
+        if single:
+            self.begin(LABELS[op])
+        self.step.forward.extend(forward)
+        self.step.inverse.append(inverse)
+        self.last = self.store.snapshot()
+        if single:
+            self.end()
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def undo_label(self):
+        return self.undo_steps[-1].label if self.undo_steps else None
+
+    def redo_label(self):
+        return self.redo_steps[-1].label if self.redo_steps else None
+
+    def pop_undo(self):
+        # (step, edits to apply), the caller replays them and calls done()
+        if not self.undo_steps:
+            return None, []
+        step = self.undo_steps.pop()
+        self.redo_steps.append(step)
+        edits = [edit for inverse in reversed(step.inverse) for edit in inverse]
+        return step, edits
+
+    def pop_redo(self):
+        if not self.redo_steps:
+            return None, []
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+        return step, list(step.forward)
+
+    def done(self, snapshot):
+        # Put the step's own snapshot back so later steps keep sharing its
+        # chunks, but only if the replay left exactly the rows it holds
+        if self.matches(snapshot):
+            self.store.restore(snapshot)
+        self.last = self.store.snapshot()
+
+    def matches(self, snapshot):
+        chunks, starts, count = snapshot
+        if count != len(self.store):
+            return False
+        if starts == self.store.starts:
+            return all(a is b or a == b for a, b in zip(chunks, self.store.chunks))
+        return RowStore.view(snapshot).rows == self.store.rows
+
+    def stats(self):
+        chunks = set()
+        for step in list(self.undo_steps) + self.redo_steps:
+            chunks.update(id(chunk) for chunk in step.before[0])
+            chunks.update(id(chunk) for chunk in step.after[0])
+        return {'undo': len(self.undo_steps),
+                'redo': len(self.redo_steps),
+                'chunks': len(chunks),
+                'ops': sum(len(step.forward) for step in list(self.undo_steps) + self.redo_steps)}
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only edit journal and autosave for NROBS rundowns.
+"""
+
+import json
+import os
+import threading
+
+from rundown_store import RowStore, move_order
+from tally import RundownState
+
+class EditJournal(object):
+    """Records rundown edits as JSON lines and flushes them in the background.
+
+    record() is cheap and runs on the UI thread. Every `interval` seconds the
+    writer thread appends the pending ops to the journal. After
+    `compact_every` ops the next record() takes a snapshot instead, which is
+    written in the normal saved-rundown format and the journal restarts.
+    """
+    def __init__(self, directory="data/autosave", interval=5.0, compact_every=500):
+        self.directory = directory
+        self.journal_path = os.path.join(directory, "rundown.journal")
+        self.snapshot_path = os.path.join(directory, "rundown.json")
+        self.interval = interval
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        self.pending = []
+        self.since_snapshot = 0
+        self.snapshot_fn = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.flushes = 0
+        self.bytes_written = 0
+
+    def has_recovery(self):
+        return os.path.isfile(self.journal_path) or os.path.isfile(self.snapshot_path)
+
+    def start(self, snapshot_fn):
+        # snapshot_fn() -> (rundown dict, preview, program), called on the UI thread
+        self.snapshot_fn = snapshot_fn
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="NROBS-journal", daemon=True)
+        self.thread.start()
+
+    def record(self, op, **fields):
+        fields['op'] = op
+        with self.lock:
+            self.since_snapshot += 1
+            if self.since_snapshot >= self.compact_every and self.snapshot_fn is not None:
+                self.pending.append(('snapshot', self.snapshot_fn()))
+                self.since_snapshot = 0
+            else:
+                self.pending.append(('op', fields))
+
+    def snapshot(self):
+        if self.snapshot_fn is None:
+            return
+        with self.lock:
+            self.pending.append(('snapshot', self.snapshot_fn()))
+            self.since_snapshot = 0
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            items = self.pending
+            self.pending = []
+        if not items:
+            return
+        try:
+            lines = []
+            for kind, item in items:
+                if kind == 'op':
+                    lines.append(json.dumps(item, separators=(',', ':')))
+                    continue
+                if lines:
+                    self.append(lines)
+                    lines = []
+                self.write_snapshot(*item)
+            if lines:
+                self.append(lines)
+            self.flushes += 1
+        except Exception as e:
+            print("Couldn't write rundown autosave:", e)
+
+    def append(self, lines):
+        data = "\n".join(lines) + "\n"
+        with open(self.journal_path, "a") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        self.bytes_written += len(data)
+
+    def write_snapshot(self, rundown, preview, program):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(rundown, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # The snapshot covers everything journalled so far, start a new journal
+        # with just the tally so a recovery lands on the same rows.
+        with open(self.journal_path, "w") as file:
+            file.write(json.dumps({'op': 'cue', 'preview': preview, 'program': program}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def close(self, discard=True):
+        # A clean shutdown flushes and, unless asked not to, removes the autosave
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(5)
+            self.thread = None
+        self.flush()
+        if discard:
+            for path in (self.journal_path, self.snapshot_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def recover(self):
+        # Returns (RowStore, RundownState) rebuilt from snapshot + journal
+        store = RowStore(1)
+        if os.path.isfile(self.snapshot_path):
+            with open(self.snapshot_path, "r") as file:
+                store.load(json.load(file))
+        state = RundownState(len(store))
+        replayed = 0
+        if os.path.isfile(self.journal_path):
+            with open(self.journal_path, "r") as file:
+                for line in file:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        # Torn write from the crash, everything before it is good
+                        break
+                    apply_op(op, store, state)
+                    replayed += 1
+        print(f"Recovered rundown with {len(store)} rows ({replayed} journal entries replayed)")
+        return store, state
+
+def apply_op(op, store, state):
+    kind = op['op']
+    if kind == 'set':
+        store.set(op['row'], op['col'], op['value'])
+    elif kind == 'insert':
+        pos = store.insert(op['pos'], op['count'])
+        state.insert_rows(pos, op['count'])
+    elif kind == 'delete':
+        store.delete(op['pos'], op['count'])
+        state.delete_rows(op['pos'], op['count'])
+    elif kind == 'move':
+        start, order = move_order(op)
+        store.permute(order, start)
+        state.move_rows(order, start)
+    elif kind in ('take', 'cue'):
+        with state.lock:
+            state.preview = op['preview']
+            state.program = op['program']
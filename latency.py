@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Take latency instrumentation for NROBS.
+"""
+
+import csv
+import json
+import threading
+import time
+from collections import OrderedDict
+
+STAGES = ("key", "sent", "acked", "transition_started", "transition_ended", "super_delivered")
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[index]
+
+class LatencyRecorder(object):
+    """Timestamps every stage of a take, measured from the key press.
+
+    begin() is called on the key event and returns a take id that the
+    dispatch and super threads mark as their stage completes. OBS events
+    don't carry the take, so mark_latest() stamps the newest take still
+    missing that stage.
+    """
+    def __init__(self, show="", max_takes=5000, event_window=10.0):
+        self.lock = threading.Lock()
+        self.show = show
+        self.max_takes = max_takes
+        self.event_window = event_window
+        self.takes = OrderedDict()
+        self.next_id = 1
+
+    def reset(self, show=""):
+        with self.lock:
+            self.show = show
+            self.takes.clear()
+
+    def begin(self, row, scene, pressed=None):
+        with self.lock:
+            take_id = self.next_id
+            self.next_id += 1
+            self.takes[take_id] = {'id': take_id,
+                                   'row': row,
+                                   'scene': scene,
+                                   'wall': time.time(),
+                                   'stamps': {'key': pressed if pressed is not None else time.perf_counter()}}
+            while len(self.takes) > self.max_takes:
+                self.takes.popitem(last=False)
+            return take_id
+
+    def mark(self, take_id, stage, stamp=None):
+        stamp = stamp if stamp is not None else time.perf_counter()
+        with self.lock:
+            take = self.takes.get(take_id)
+            if take is not None and stage not in take['stamps']:
+                take['stamps'][stage] = stamp
+
+    def mark_latest(self, stage, stamp=None):
+        stamp = stamp if stamp is not None else time.perf_counter()
+        with self.lock:
+            for take in reversed(self.takes.values()):
+                if stamp - take['stamps']['key'] > self.event_window:
+                    return
+                if 'acked' in take['stamps'] or 'sent' in take['stamps']:
+                    if stage not in take['stamps']:
+                        take['stamps'][stage] = stamp
+                    return
+
+    def latest(self, stage):
+        with self.lock:
+            for take in reversed(self.takes.values()):
+                if stage in take['stamps']:
+                    return (take['stamps'][stage] - take['stamps']['key']) * 1000
+        return None
+
+    def durations(self, stage):
+        # Milliseconds from the key press to `stage` for every take that reached it
+        with self.lock:
+            return [(take['stamps'][stage] - take['stamps']['key']) * 1000
+                    for take in self.takes.values() if stage in take['stamps']]
+
+    def histogram(self, stage):
+        values = self.durations(stage)
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for value in values:
+            for i, edge in enumerate(BUCKETS_MS):
+                if value <= edge:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        labels = [f"<={edge}ms" for edge in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {'stage': stage,
+                'count': len(values),
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'buckets': dict(zip(labels, counts))}
+
+    def summary(self):
+        return {stage: self.histogram(stage) for stage in STAGES[1:]}
+
+    def export_json(self, filename):
+        with self.lock:
+            takes = [dict(take, stamps=self.relative(take)) for take in self.takes.values()]
+        with open(filename, "w") as file:
+            json.dump({'show': self.show, 'takes': takes, 'summary': self.summary()}, file, indent=2)
+
+    def export_csv(self, filename):
+        with self.lock:
+            rows = [(take['id'], take['row'], take['scene'], take['wall'], self.relative(take))
+                    for take in self.takes.values()]
+        with open(filename, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["take", "row", "scene", "time"] + [f"{stage}_ms" for stage in STAGES[1:]])
+            for take_id, row, scene, wall, stamps in rows:
+                writer.writerow([take_id, row, scene, wall] + [stamps.get(stage, "") for stage in STAGES[1:]])
+
+    def relative(self, take):
+        key = take['stamps']['key']
+        return {stage: round((stamp - key) * 1000, 3) for stage, stamp in take['stamps'].items() if stage != 'key'}
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Single-canvas meter bridge for NROBS.
+"""
+
+import time
+
+import wx
+
+from meters import MeterBallistics
+
+BAR_WIDTH = 6
+BAR_GAP = 2
+CHANNEL_GAP = 10
+MARGIN = 4
+LABEL_HEIGHT = 16
+# Same zones the PeakMeterCtrl strips used: green, then yellow, then red
+ZONES = (66.67, 83.3, 100.0)
+LIT = ((46, 204, 64), (255, 204, 0), (231, 76, 60))
+UNLIT = ((20, 60, 24), (70, 60, 10), (70, 26, 22))
+
+class MeterBridge(wx.Window):
+    """Stereo meters for every audio input, drawn on one double-buffered window.
+
+    update() takes what MeterBank.drain() returns and tick() runs the
+    ballistics for all channels together, then invalidates just the
+    segments whose state changed. Painting only redraws the channels the
+    update region touches.
+    """
+    def __init__(self, parent, segments=20, capacity=64, height=160):
+        super().__init__(parent, style=wx.BORDER_NONE | wx.FULL_REPAINT_ON_RESIZE)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.segments = segments
+        self.ballistics = MeterBallistics(capacity=capacity, segments=segments)
+        self.names = []
+        self.index = {}
+        self.last_tick = None
+        self.background = wx.Brush(wx.Colour(16, 16, 16))
+        self.lit = [wx.Brush(wx.Colour(*colour)) for colour in LIT]
+        self.unlit = [wx.Brush(wx.Colour(*colour)) for colour in UNLIT]
+        self.pen = wx.TRANSPARENT_PEN
+        self.font = wx.Font(7, wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+        self.zones = [self.zone(segment) for segment in range(1, segments + 1)]
+        self.SetMinSize((self.channel_width() * 2 + MARGIN * 2, height))
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_MOTION, self.on_motion)
+
+    def zone(self, segment):
+        value = segment / self.segments * 100
+        for i, limit in enumerate(ZONES):
+            if value <= limit:
+                return i
+        return len(ZONES) - 1
+
+    def channel_width(self):
+        return BAR_WIDTH * 2 + BAR_GAP + CHANNEL_GAP
+
+    def set_channels(self, names):
+        names = list(names)[:self.ballistics.capacity]
+        if names == self.names:
+            return
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.ballistics.reset()
+        width = max(len(names), 1) * self.channel_width() + MARGIN * 2
+        self.SetMinSize((width, self.GetMinSize().height))
+        self.GetParent().Layout()
+        self.Refresh()
+
+    def update(self, levels):
+        for name, left, right in levels:
+            i = self.index.get(name)
+            if i is not None:
+                self.ballistics.set(i, left, right)
+
+    def tick(self):
+        now = time.perf_counter()
+        dt = 0.0 if self.last_tick is None else now - self.last_tick
+        self.last_tick = now
+        changes = self.ballistics.step(dt, len(self.names))
+        for i, channel, first, last in changes:
+            self.RefreshRect(self.segment_span(i, channel, first, last), eraseBackground=False)
+        return len(changes)
+
+    def geometry(self):
+        height = self.GetClientSize().height - LABEL_HEIGHT - MARGIN * 2
+        return MARGIN, max(height, self.segments) / self.segments
+
+    def bar_x(self, i, channel):
+        return MARGIN + i * self.channel_width() + channel * (BAR_WIDTH + BAR_GAP)
+
+    def segment_rect(self, i, channel, segment, top, segment_height):
+        # Segment 1 sits at the bottom
+        y = top + (self.segments - segment) * segment_height
+        return (self.bar_x(i, channel), int(y), BAR_WIDTH, max(int(segment_height) - 1, 1))
+
+    def segment_span(self, i, channel, first, last):
+        top, segment_height = self.geometry()
+        upper = self.segment_rect(i, channel, last, top, segment_height)
+        lower = self.segment_rect(i, channel, first, top, segment_height)
+        return wx.Rect(upper[0], upper[1], BAR_WIDTH, lower[1] + lower[3] - upper[1])
+
+    def on_paint(self, event):
+        dc = wx.AutoBufferedPaintDC(self)
+        box = self.GetUpdateRegion().GetBox()
+        dc.SetBackground(self.background)
+        dc.SetClippingRegion(box)
+        dc.Clear()
+        if not self.names:
+            return
+        width = self.channel_width()
+        first = max(0, (box.x - MARGIN) // width)
+        last = min(len(self.names) - 1, (box.x + box.width - MARGIN) // width)
+        top, segment_height = self.geometry()
+        rects = []
+        brushes = []
+        for i in range(first, last + 1):
+            for channel in (0, 1):
+                lit = self.ballistics.lit[i][channel]
+                peak = self.ballistics.peak_lit[i][channel]
+                for segment in range(1, self.segments + 1):
+                    zone = self.zones[segment - 1]
+                    rects.append(self.segment_rect(i, channel, segment, top, segment_height))
+                    brushes.append(self.lit[zone] if segment <= lit or segment == peak else self.unlit[zone])
+        dc.DrawRectangleList(rects, self.pen, brushes)
+        label_y = self.GetClientSize().height - LABEL_HEIGHT
+        if box.y + box.height >= label_y:
+            dc.SetFont(self.font)
+            dc.SetTextForeground(wx.Colour(200, 200, 200))
+            for i in range(first, last + 1):
+                label = self.names[i]
+                while len(label) > 1 and dc.GetTextExtent(label)[0] > width - 2:
+                    label = label[:-1]
+                dc.DrawText(label, MARGIN + i * width, label_y)
+
+    def on_motion(self, event):
+        i = (event.GetX() - MARGIN) // self.channel_width()
+        name = self.names[i] if 0 <= i < len(self.names) else ""
+        if self.GetToolTipText() != name:
+            self.SetToolTip(name)
+        event.Skip()
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Coalescing VU meter levels for NROBS.
+"""
+
+import threading
+from math import log10
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VU, POSTFADER, PREFADER = 0, 1, 2
+
+class MeterBank(object):
+    """Latest post-fader level per input, written by the websocket thread.
+
+    push() only stores the newest sample for each input; drain() converts
+    every pending channel to meter scale in one pass and hands back just
+    the meters whose value moved, so the UI can repaint at its own rate.
+    """
+    def __init__(self, capacity=64, floor_db=-60.0, scale=100.0, threshold=0.5):
+        self.lock = threading.Lock()
+        self.capacity = capacity
+        self.floor_db = floor_db
+        self.scale = scale
+        self.threshold = threshold
+        self.slots = {}
+        self.names = []
+        self.free = []
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.painted = 0
+        if np is not None:
+            self.levels = np.zeros((capacity, 2))
+            self.drawn = np.full((capacity, 2), -1.0)
+            self.dirty = np.zeros(capacity, dtype=bool)
+        else:
+            self.levels = [[0.0, 0.0] for _ in range(capacity)]
+            self.drawn = [[-1.0, -1.0] for _ in range(capacity)]
+            self.dirty = [False] * capacity
+
+    def slot(self, name):
+        index = self.slots.get(name)
+        if index is None and self.free:
+            index = self.free.pop()
+            self.slots[name] = index
+            self.names[index] = name
+        elif index is None and len(self.names) < self.capacity:
+            index = len(self.names)
+            self.slots[name] = index
+            self.names.append(name)
+        return index
+
+    def release(self, name):
+        # Removed or renamed input, its slot goes to the next new name
+        with self.lock:
+            index = self.slots.pop(name, None)
+            if index is None:
+                return
+            self.names[index] = None
+            self.levels[index][0] = self.levels[index][1] = 0.0
+            self.drawn[index][0] = self.drawn[index][1] = -1.0
+            self.dirty[index] = False
+            self.free.append(index)
+
+    def push(self, inputs):
+        with self.lock:
+            for device in inputs:
+                channels = device.get("inputLevelsMul")
+                if not channels:
+                    continue
+                self.received += 1
+                index = self.slot(device["inputName"])
+                if index is None:
+                    self.dropped += 1
+                    continue
+                left = channels[0][POSTFADER]
+                right = channels[1][POSTFADER] if len(channels) > 1 else left
+                if self.dirty[index]:
+                    self.coalesced += 1
+                self.levels[index][0] = left
+                self.levels[index][1] = right
+                self.dirty[index] = True
+
+    def to_meter(self, mul):
+        db = 20 * log10(mul) if mul > 0 else -200.0
+        if db <= self.floor_db:
+            return 0.0
+        return (min(db, 0.0) - self.floor_db) / -self.floor_db * self.scale
+
+    def drain(self):
+        # Returns [(name, left, right), ...] in meter scale (0..scale).
+        if np is None:
+            return self._drain_scalar()
+        with self.lock:
+            pending = np.flatnonzero(self.dirty)
+            if pending.size == 0:
+                return []
+            mul = self.levels[pending].copy()
+            self.dirty[pending] = False
+        with np.errstate(divide="ignore"):
+            db = 20 * np.log10(mul)
+        values = (np.clip(db, self.floor_db, 0.0) - self.floor_db) / -self.floor_db * self.scale
+        moved = np.abs(values - self.drawn[pending]).max(axis=1) >= self.threshold
+        changed = pending[moved]
+        self.drawn[changed] = values[moved]
+        self.painted += int(changed.size)
+        names = self.names
+        return [(names[i], float(l), float(r)) for i, (l, r) in zip(changed, values[moved]) if names[i] is not None]
+
+    def _drain_scalar(self):
+        with self.lock:
+            pending = [i for i, flag in enumerate(self.dirty) if flag]
+            mul = [tuple(self.levels[i]) for i in pending]
+            for i in pending:
+                self.dirty[i] = False
+        output = []
+        for i, (left, right) in zip(pending, mul):
+            l, r = self.to_meter(left), self.to_meter(right)
+            drawn = self.drawn[i]
+            if max(abs(l - drawn[0]), abs(r - drawn[1])) >= self.threshold:
+                self.drawn[i] = [l, r]
+                if self.names[i] is not None:
+                    output.append((self.names[i], l, r))
+        self.painted += len(output)
+        return output
+
+    def stats(self):
+        with self.lock:
+            return {'received': self.received,
+                    'coalesced': self.coalesced,
+                    'dropped': self.dropped,
+                    'painted': self.painted}
+
+class MeterBallistics(object):
+    """Fall-off and peak hold for every meter channel in one pass.
+
+    set() takes the newest level per channel (meter scale), step(dt) moves
+    every bar towards it and returns the segment ranges that need
+    repainting as [(index, channel, first, last), ...]. Segments count
+    from 1 at the bottom, 0 means the bar is dark.
+    """
+    def __init__(self, capacity=64, segments=20, scale=100.0, fall_per_s=80.0, hold_s=1.5, peak_fall_per_s=40.0):
+        self.capacity = capacity
+        self.segments = segments
+        self.scale = scale
+        self.fall_per_s = fall_per_s
+        self.hold_s = hold_s
+        self.peak_fall_per_s = peak_fall_per_s
+        self.reset()
+
+    def reset(self):
+        if np is not None:
+            shape = (self.capacity, 2)
+            self.target = np.zeros(shape)
+            self.level = np.zeros(shape)
+            self.peak = np.zeros(shape)
+            self.held = np.zeros(shape)
+            self.lit = np.zeros(shape, dtype=int)
+            self.peak_lit = np.zeros(shape, dtype=int)
+            self.drawn_lit = np.full(shape, -1, dtype=int)
+            self.drawn_peak = np.full(shape, -1, dtype=int)
+        else:
+            def grid(value):
+                return [[value, value] for _ in range(self.capacity)]
+            self.target, self.level, self.peak, self.held = grid(0.0), grid(0.0), grid(0.0), grid(0.0)
+            self.lit, self.peak_lit = grid(0), grid(0)
+            self.drawn_lit, self.drawn_peak = grid(-1), grid(-1)
+
+    def set(self, index, left, right):
+        self.target[index][0] = left
+        self.target[index][1] = right
+
+    def clear(self, index):
+        self.set(index, 0.0, 0.0)
+
+    def segment(self, value):
+        return min(self.segments, max(0, int(-(-value * self.segments // self.scale))))
+
+    def step(self, dt, count=None):
+        count = self.capacity if count is None else min(count, self.capacity)
+        if np is None:
+            return self._step_scalar(dt, count)
+        target, level, peak, held = self.target[:count], self.level[:count], self.peak[:count], self.held[:count]
+        # Instant attack, linear fall
+        np.maximum(target, level - self.fall_per_s * dt, out=level)
+        rising = level >= peak
+        peak[rising] = level[rising]
+        held[rising] = self.hold_s
+        held[~rising] -= dt
+        falling = ~rising & (held <= 0)
+        peak[falling] = np.maximum(level[falling], peak[falling] - self.peak_fall_per_s * dt)
+        lit = np.clip(np.ceil(level * self.segments / self.scale), 0, self.segments).astype(int)
+        peak_lit = np.clip(np.ceil(peak * self.segments / self.scale), 0, self.segments).astype(int)
+        drawn_lit, drawn_peak = self.drawn_lit[:count], self.drawn_peak[:count]
+        lit_moved = lit != drawn_lit
+        peak_moved = peak_lit != drawn_peak
+        changes = []
+        for index, channel in zip(*np.nonzero(lit_moved | peak_moved)):
+            old_lit, new_lit = int(drawn_lit[index, channel]), int(lit[index, channel])
+            old_peak, new_peak = int(drawn_peak[index, channel]), int(peak_lit[index, channel])
+            changes.extend(self._ranges(int(index), int(channel), old_lit, new_lit, old_peak, new_peak))
+        self.lit[:count] = lit
+        self.peak_lit[:count] = peak_lit
+        drawn_lit[...] = lit
+        drawn_peak[...] = peak_lit
+        return changes
+
+    def _step_scalar(self, dt, count):
+        changes = []
+        for index in range(count):
+            for channel in (0, 1):
+                level = max(self.target[index][channel], self.level[index][channel] - self.fall_per_s * dt)
+                self.level[index][channel] = level
+                if level >= self.peak[index][channel]:
+                    self.peak[index][channel] = level
+                    self.held[index][channel] = self.hold_s
+                else:
+                    self.held[index][channel] -= dt
+                    if self.held[index][channel] <= 0:
+                        self.peak[index][channel] = max(level, self.peak[index][channel] - self.peak_fall_per_s * dt)
+                lit = self.segment(level)
+                peak_lit = self.segment(self.peak[index][channel])
+                old_lit, old_peak = self.drawn_lit[index][channel], self.drawn_peak[index][channel]
+                if lit != old_lit or peak_lit != old_peak:
+                    changes.extend(self._ranges(index, channel, old_lit, lit, old_peak, peak_lit))
+                self.lit[index][channel] = self.drawn_lit[index][channel] = lit
+                self.peak_lit[index][channel] = self.drawn_peak[index][channel] = peak_lit
+        return changes
+
+    def _ranges(self, index, channel, old_lit, new_lit, old_peak, new_peak):
+        if old_lit < 0:
+            # Never drawn, the whole bar
+            return [(index, channel, 1, self.segments)]
+        ranges = []
+        if old_lit != new_lit:
+            ranges.append((index, channel, min(old_lit, new_lit) + 1, max(old_lit, new_lit)))
+        if old_peak != new_peak:
+            for segment in (old_peak, new_peak):
+                if segment > 0:
+                    ranges.append((index, channel, segment, segment))
+        return ranges
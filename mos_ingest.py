@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+MOS running order ingest for NROBS: a TCP listener and a drop folder.
+
+Handles roCreate, roReplace, roStoryInsert, roStoryAppend, roStoryReplace,
+roStoryMove, roStoryMoveMultiple and roStoryDelete. A story becomes one row:
+storySlug is the SLUG and the first <super>, <scene> and <transition>
+anywhere inside the story (usually in mosExternalMetadata/mosPayload) fill
+the other columns.
+"""
+
+import codecs
+import os
+import re
+import socketserver
+import threading
+import time
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from rundown_store import EMPTY_ROW
+
+STORY_FIELDS = ("storySlug", "super", "scene", "transition")
+HEADER_FIELDS = ("mosID", "ncsID", "messageID")
+DECLARATION = re.compile(r"<\?xml[^>]*\?>")
+DROP_EXTENSIONS = (".xml", ".mos")
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+def story_row(element):
+    fields = {}
+    for child in element.iter():
+        tag = local_name(child.tag)
+        if tag not in fields and (tag == "storyID" or tag in STORY_FIELDS):
+            fields[tag] = (child.text or "").strip()
+    return fields.get("storyID", ""), tuple(fields.get(tag, "") for tag in STORY_FIELDS)
+
+class MOSParser(object):
+    """Incremental parser for a stream of back-to-back <mos> messages.
+
+    feed() takes whatever arrived on the socket and returns the messages it
+    completed. Each story is turned into a row as soon as its closing tag
+    is read and the element is cleared, so a large roCreate never sits in
+    memory as a tree. Messages come back as dicts: type, ro_id, story_ids
+    (the storyID elements directly under the message, e.g. the target of
+    an insert) and stories [(story_id, row), ...].
+    """
+    def __init__(self, encoding="utf-16-be"):
+        self.encoding = encoding
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.parser = ElementTree.XMLPullParser(events=("start", "end"))
+        self.parser.feed("<stream>")
+        self.root = None
+        self.depth = 0
+        self.pending = ""
+        self.reset_message()
+
+    def reset_message(self):
+        self.header = {}
+        self.message = None
+
+    def feed(self, data):
+        text = self.pending + (self.decoder.decode(data) if isinstance(data, bytes) else data)
+        # Every message may carry its own <?xml?> declaration, which can't
+        # appear mid-stream; hold back a tag that might be one until it's whole
+        cut = text.rfind("<")
+        tail = text[cut:] if cut != -1 and ">" not in text[cut:] else ""
+        if tail.startswith("<?") or "<?xml".startswith(tail or "-"):
+            self.pending = tail
+            text = text[:cut]
+        else:
+            self.pending = ""
+        if "<?xml" in text:
+            text = DECLARATION.sub("", text)
+        self.parser.feed(text)
+        messages = []
+        for event, element in self.parser.read_events():
+            if event == "start":
+                self.depth += 1
+                if self.depth == 1:
+                    self.root = element
+                elif self.depth == 3 and local_name(element.tag) not in HEADER_FIELDS:
+                    self.message = {'type': local_name(element.tag), 'ro_id': None, 'story_ids': [], 'stories': []}
+                continue
+            tag = local_name(element.tag)
+            if self.depth == 4 and self.message is not None:
+                if tag == "story":
+                    self.message['stories'].append(story_row(element))
+                    element.clear()
+                elif tag == "storyID":
+                    self.message['story_ids'].append((element.text or "").strip())
+                elif tag == "roID":
+                    self.message['ro_id'] = (element.text or "").strip()
+            elif self.depth == 3 and tag in HEADER_FIELDS:
+                self.header[tag] = (element.text or "").strip()
+            elif self.depth == 2:
+                if self.message is not None:
+                    self.message.update(self.header)
+                    messages.append(self.message)
+                self.reset_message()
+                self.root.clear()
+            self.depth -= 1
+        return messages
+
+def detect_encoding(head):
+    if head.startswith(codecs.BOM_UTF16_BE) or head.startswith(codecs.BOM_UTF16_LE):
+        return "utf-16"
+    if head.startswith(b"\x00<"):
+        return "utf-16-be"
+    if head.startswith(b"<\x00"):
+        return "utf-16-le"
+    return "utf-8-sig"
+
+def ack(message, encoding, status="OK"):
+    header = "".join(f"<{tag}>{escape(message.get(tag, ''))}</{tag}>" for tag in HEADER_FIELDS)
+    body = f"<mos>{header}<roAck><roID>{escape(message.get('ro_id') or '')}</roID><roStatus>{status}</roStatus></roAck></mos>"
+    return body.encode(encoding)
+
+class MOSIngest(object):
+    """Receives running order messages and hands them to on_message(message, source).
+
+    The TCP listener answers every running order message with a roAck.
+    Files dropped into watch_dir are read once their size has settled,
+    then moved to watch_dir/processed (or watch_dir/failed).
+    """
+    def __init__(self, on_message, host="0.0.0.0", port=None, watch_dir=None, encoding="utf-16-be", poll=1.0):
+        self.on_message = on_message
+        self.host = host
+        self.port = port
+        self.watch_dir = watch_dir
+        self.encoding = encoding
+        self.poll = poll
+        self.server = None
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.sizes = {}
+        self.received = 0
+
+    def start(self):
+        if self.port:
+            try:
+                handler = type("BoundMOSRequestHandler", (MOSRequestHandler,), {'server_ref': self})
+                self.server = socketserver.ThreadingTCPServer((self.host, self.port), handler)
+                self.server.daemon_threads = True
+                self.spawn(self.server.serve_forever, "NROBS-mos-tcp")
+                print(f"MOS ingest listening on {self.host}:{self.port}")
+            except Exception as e:
+                print("Couldn't start the MOS listener:", e)
+                self.server = None
+        if self.watch_dir:
+            for folder in (self.watch_dir, os.path.join(self.watch_dir, "processed"), os.path.join(self.watch_dir, "failed")):
+                if not os.path.isdir(folder):
+                    os.makedirs(folder)
+            self.spawn(self.watch, "NROBS-mos-watch")
+            print(f"MOS ingest watching {self.watch_dir}")
+
+    def spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def deliver(self, message, source):
+        self.received += 1
+        message['received'] = time.perf_counter()
+        try:
+            self.on_message(message, source)
+        except Exception as e:
+            print(f"Couldn't hand over {message['type']} from {source}:", e)
+
+    def watch(self):
+        while not self.stop_event.wait(self.poll):
+            try:
+                entries = [entry for entry in os.scandir(self.watch_dir)
+                           if entry.is_file() and entry.name.lower().endswith(DROP_EXTENSIONS)]
+            except OSError as e:
+                print("Couldn't scan the MOS drop folder:", e)
+                continue
+            for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+                size = entry.stat().st_size
+                # Wait one poll with the size unchanged, the file may still be copying
+                if self.sizes.get(entry.path) != size:
+                    self.sizes[entry.path] = size
+                    continue
+                del self.sizes[entry.path]
+                self.ingest_file(entry.path)
+
+    def ingest_file(self, path):
+        folder = "processed"
+        try:
+            with open(path, "rb") as file:
+                head = file.read(4)
+                parser = MOSParser(detect_encoding(head))
+                messages = parser.feed(head)
+                for chunk in iter(lambda: file.read(65536), b""):
+                    messages.extend(parser.feed(chunk))
+            for message in messages:
+                self.deliver(message, f"file:{os.path.basename(path)}")
+        except Exception as e:
+            print(f"Couldn't ingest {path}:", e)
+            folder = "failed"
+        try:
+            os.replace(path, os.path.join(self.watch_dir, folder, os.path.basename(path)))
+        except OSError as e:
+            print(f"Couldn't move {path} out of the drop folder:", e)
+
+class MOSRequestHandler(socketserver.BaseRequestHandler):
+    server_ref = None
+
+    def handle(self):
+        source = f"mos:{self.client_address[0]}"
+        parser = MOSParser(self.server_ref.encoding)
+        while not self.server_ref.stop_event.is_set():
+            try:
+                data = self.request.recv(65536)
+            except OSError:
+                break
+            if not data:
+                break
+            try:
+                messages = parser.feed(data)
+            except ElementTree.ParseError as e:
+                print(f"Couldn't parse MOS from {source}:", e)
+                break
+            for message in messages:
+                if message['type'].startswith("ro"):
+                    self.request.sendall(ack(message, self.server_ref.encoding))
+                self.server_ref.deliver(message, source)
+
+def unique_stories(stories):
+    seen = set()
+    output = []
+    for story_id, row in stories:
+        if story_id and story_id not in seen:
+            seen.add(story_id)
+            output.append((story_id, row))
+    return output
+
+def runs(rows):
+    # Contiguous (pos, count) runs, bottom up so earlier positions still hold
+    output = []
+    for row in sorted(set(rows), reverse=True):
+        if output and output[-1][0] == row + 1:
+            output[-1] = (row, output[-1][1] + 1)
+        else:
+            output.append((row, 1))
+    return output
+
+def set_ops(row, before, after):
+    return [('set', row, col, value) for col, value in enumerate(after) if value != before[col]]
+
+def insert_ops(pos, stories):
+    ops = [('insert', pos, [story_id for story_id, _ in stories])]
+    for offset, (_, row) in enumerate(stories):
+        ops.extend(set_ops(pos + offset, EMPTY_ROW, row))
+    return ops
+
+def move_ops(moved_ids, target, positions, count):
+    moved = [positions[story_id] for story_id in moved_ids if story_id in positions]
+    if not moved or target in moved_ids:
+        return []
+    moving = set(moved)
+    remaining = [row for row in range(count) if row not in moving]
+    at = remaining.index(positions[target]) if target in positions else len(remaining)
+    order = remaining[:at] + moved + remaining[at:]
+    if order == list(range(count)):
+        return []
+    return [('move', order)]
+
+def plan_running_order(stories, ids, rows, program):
+    # roCreate/roReplace: keep the rows whose story is still there, delete
+    # the rest, append the new stories and permute into the new order. The
+    # on-air row is never deleted or rewritten.
+    ops = []
+    ids = list(ids)
+    origin = list(range(len(ids)))
+    wanted = {story_id for story_id, _ in stories}
+    for pos, count in runs([row for row, story_id in enumerate(ids) if story_id not in wanted and row != program]):
+        ops.append(('delete', pos, count))
+        del ids[pos:pos + count]
+        del origin[pos:pos + count]
+        if program is not None and program > pos:
+            program -= count
+    positions = {story_id: row for row, story_id in enumerate(ids) if story_id is not None}
+    new = [(story_id, row) for story_id, row in stories if story_id not in positions]
+    if new:
+        ops.append(('insert', len(ids), [story_id for story_id, _ in new]))
+        for story_id, _ in new:
+            positions[story_id] = len(ids)
+            ids.append(story_id)
+            origin.append(None)
+    order = [positions[story_id] for story_id, _ in stories]
+    if program is not None and ids[program] not in wanted:
+        # The on-air row left the running order, it stays where it was until it's off air
+        order.insert(min(program, len(order)), program)
+    if order != list(range(len(order))):
+        ops.append(('move', order))
+    final = {old: new for new, old in enumerate(order)}
+    for story_id, row in stories:
+        current = positions[story_id]
+        if current == program:
+            if origin[current] is not None and rows[origin[current]] != row:
+                print(f"Held the newsroom's changes to {story_id}, it's on air")
+            continue
+        before = rows[origin[current]] if origin[current] is not None else EMPTY_ROW
+        ops.extend(set_ops(final[current], before, row))
+    return ops
+
+def plan(message, ids, rows, program):
+    """Turns a running order message into grid edits against the rows now loaded.
+
+    Returns a list of ('delete', pos, count), ('insert', pos, story_ids),
+    ('move', order) and ('set', row, col, value), to be applied in order.
+    """
+    kind = message['type']
+    stories = unique_stories(message['stories'])
+    targets = message['story_ids']
+    if kind in ("roCreate", "roReplace"):
+        return plan_running_order(stories, ids, rows, program)
+    positions = {story_id: row for row, story_id in enumerate(ids) if story_id is not None}
+    stories = [(story_id, row) for story_id, row in stories if story_id not in positions or kind == "roStoryReplace"]
+    if kind == "roStoryAppend":
+        return insert_ops(len(ids), stories)
+    if kind == "roStoryInsert":
+        target = targets[0] if targets else ""
+        return insert_ops(positions.get(target, len(ids)), stories)
+    if kind == "roStoryReplace":
+        target = targets[0] if targets else ""
+        pos = positions.get(target)
+        if pos is None:
+            print(f"Couldn't replace {target}, it isn't in the rundown")
+            return []
+        if pos == program:
+            print(f"Held the newsroom's replacement of {target}, it's on air")
+            return []
+        if len(stories) == 1 and stories[0][0] == target:
+            return set_ops(pos, rows[pos], stories[0][1])
+        stories = [(story_id, row) for story_id, row in stories if story_id == target or story_id not in positions]
+        return [('delete', pos, 1)] + insert_ops(pos, stories)
+    if kind == "roStoryDelete":
+        doomed = [positions[story_id] for story_id in targets if story_id in positions]
+        if program in doomed:
+            print(f"Kept {ids[program]}, it's on air")
+            doomed.remove(program)
+        return [('delete', pos, count) for pos, count in runs(doomed)]
+    if kind == "roStoryMove":
+        target = targets[1] if len(targets) > 1 else ""
+        return move_ops(targets[:1], target, positions, len(ids))
+    if kind == "roStoryMoveMultiple":
+        return move_ops(targets[:-1], targets[-1] if targets else "", positions, len(ids))
+    return None
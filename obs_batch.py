@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+obs-websocket v5 request batches for NROBS.
+"""
+
+import json
+import time
+from uuid import uuid4
+
+from obsws_python.error import OBSSDKRequestError
+
+SERIAL_REALTIME, SERIAL_FRAME, PARALLEL = 0, 1, 2
+
+def send_batch(client, lock, requests, halt_on_failure=False, execution_type=SERIAL_REALTIME):
+    # Sends [(requestType, requestData), ...] as one RequestBatch (op 8) on
+    # an obsws_python client's socket and returns (results, elapsed_ms).
+    # The lock is the one every other request on that socket is sent under.
+    payload = {"op": 8,
+               "d": {"requestId": str(uuid4()),
+                     "haltOnFailure": halt_on_failure,
+                     "executionType": execution_type,
+                     "requests": []}}
+    for request_type, request_data in requests:
+        request = {"requestType": request_type}
+        if request_data:
+            request["requestData"] = request_data
+        payload["d"]["requests"].append(request)
+    with lock:
+        ws = client.base_client.ws
+        start = time.perf_counter()
+        ws.send(json.dumps(payload))
+        response = json.loads(ws.recv())
+        elapsed = (time.perf_counter() - start) * 1000
+    results = response["d"]["results"]
+    for result in results:
+        status = result["requestStatus"]
+        if not status["result"]:
+            if halt_on_failure:
+                raise OBSSDKRequestError(result["requestType"], status["code"], status.get("comment"))
+            print(f"{result['requestType']} failed:", status.get("comment"))
+    return results, elapsed
+
+def take_requests(name, transition):
+    return [("SetCurrentPreviewScene", {"sceneName": name}),
+            ("SetCurrentSceneTransition", {"transitionName": transition}),
+            ("TriggerStudioModeTransition", None)]
+
+def cue_requests(name, transition):
+    return [("SetCurrentPreviewScene", {"sceneName": name}),
+            ("SetCurrentSceneTransition", {"transitionName": transition})]
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-roll of the armed row's media sources for NROBS.
+"""
+
+import threading
+import time
+
+MEDIA_KINDS = ("ffmpeg_source", "vlc_source")
+RESTART = "OBS_WEBSOCKET_MEDIA_INPUT_ACTION_RESTART"
+PAUSE = "OBS_WEBSOCKET_MEDIA_INPUT_ACTION_PAUSE"
+PLAY = "OBS_WEBSOCKET_MEDIA_INPUT_ACTION_PLAY"
+READY_STATES = ("OBS_MEDIA_STATE_PAUSED", "OBS_MEDIA_STATE_STOPPED")
+
+class PreRoll(object):
+    """Cues the media inputs of the scene in preview so they aren't cold on air.
+
+    cue_scene() runs on its own worker after the preview is set: every
+    media input in the scene that isn't on air is restarted (which opens the
+    decoder), then paused and put back to frame zero. Inputs in the program
+    scene or otherwise active are left alone, so a shared background loop
+    never freezes on air. take_requests() gives the play actions to add to
+    the take batch for inputs that were paused.
+    """
+    def __init__(self, obs_conn, settle_ms=50):
+        self.obs_conn = obs_conn
+        self.settle_ms = settle_ms
+        self.lock = threading.Lock()
+        self.scene_media = {}
+        self.readiness = {}
+        self.durations = {}
+
+    def invalidate(self, scene=None):
+        with self.lock:
+            if scene is None:
+                self.scene_media.clear()
+            else:
+                self.scene_media.pop(scene, None)
+
+    def media_in_scene(self, scene):
+        with self.lock:
+            if scene in self.scene_media:
+                return self.scene_media[scene]
+        results = self.obs_conn.batch([("GetSceneItemList", {"sceneName": scene})],
+                                      halt_on_failure=True, label="pre-roll lookup")
+        items = results[0]["responseData"]["sceneItems"]
+        media = [x['sourceName'] for x in items if x.get('inputKind') in MEDIA_KINDS]
+        with self.lock:
+            self.scene_media[scene] = media
+        return media
+
+    def cue_scene(self, scene, program=None):
+        # Nothing to cue when the scene is already on air
+        if scene == program:
+            return {}
+        on_air = set(self.media_in_scene(program)) if program else set()
+        media = [name for name in self.media_in_scene(scene) if name not in on_air]
+        if not media:
+            return {}
+        # A background loop can also be on air through a nested scene
+        results = self.obs_conn.batch([("GetSourceActive", {"sourceName": name}) for name in media],
+                                      label="pre-roll active")
+        media = [name for name, result in zip(media, results)
+                 if result["requestStatus"]["result"] and not result["responseData"]["videoActive"]]
+        if not media:
+            return {}
+        with self.lock:
+            for name in media:
+                self.readiness[name] = 'cueing'
+        self.obs_conn.batch([("TriggerMediaInputAction", {"inputName": name, "mediaAction": RESTART})
+                             for name in media], label="pre-roll restart")
+        # Restart is handled on OBS's media thread, give it a moment before
+        # pausing. No OBS request is held while waiting, so a take goes straight out.
+        time.sleep(self.settle_ms / 1000)
+        with self.lock:
+            # Held until the pause is acknowledged, so a take either plays the
+            # paused media or finds it taken and leaves it running
+            media = [name for name in media if self.readiness.get(name) == 'cueing']
+            if not media:
+                return {}
+            requests = []
+            for name in media:
+                requests.append(("TriggerMediaInputAction", {"inputName": name, "mediaAction": PAUSE}))
+                requests.append(("SetMediaInputCursor", {"inputName": name, "mediaCursor": 0}))
+            for name in media:
+                requests.append(("GetMediaInputStatus", {"inputName": name}))
+            results = self.obs_conn.batch(requests, label="pre-roll")
+            statuses = results[-len(media):]
+            for name, status in zip(media, statuses):
+                if not status["requestStatus"]["result"]:
+                    self.readiness[name] = 'failed'
+                    continue
+                data = status["responseData"]
+                if data.get("mediaDuration") is not None:
+                    self.durations[name] = data["mediaDuration"]
+                self.readiness[name] = 'ready' if data.get("mediaState") in READY_STATES else 'paused'
+            return {name: self.readiness[name] for name in media}
+
+    def take_requests(self, scene):
+        with self.lock:
+            media = self.scene_media.get(scene, [])
+            paused = [name for name in media if self.readiness.get(name) in ('ready', 'paused')]
+            for name in media:
+                if self.readiness.get(name) == 'cueing':
+                    # Restarted but not paused yet, it's playing, leave it be
+                    self.readiness[name] = 'played'
+            for name in paused:
+                self.readiness[name] = 'played'
+        return [("TriggerMediaInputAction", {"inputName": name, "mediaAction": PLAY}) for name in paused]
+
+    def duration(self, name):
+        with self.lock:
+            return self.durations.get(name)
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Remote control and live view API for NROBS.
+
+    GET  /                   rundown viewer (remote/index.html)
+    GET  /api/rundown        full snapshot: {"v", "rows", "preview", "program"}
+    GET  /api/events         server-sent events, a snapshot then deltas
+    GET  /api/stats          connected clients
+    POST /api/take           take the preview row
+    POST /api/back           cue the row before the preview row
+    POST /api/jump?row=N     cue row N (counted from 1, like the grid)
+
+When a token is set every /api/ request has to carry it, as an
+X-NROBS-Token header or ?token=.
+
+Deltas are the same ops the edit journal records (set, insert, delete,
+move, take, cue) with "v" and the resulting preview/program rows added.
+"""
+
+import ipaddress
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from journal import apply_op
+from rundown_store import COLUMNS, RowStore
+from tally import RundownState
+
+REMOTE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "remote")
+COMMAND_PATHS = {"/api/take": "take", "/api/back": "back", "/api/jump": "jump", "/api/preview": "jump"}
+
+class Viewer(object):
+    def __init__(self, address, maxsize=256):
+        self.address = address
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.connected = time.time()
+        self.sent = 0
+        self.resyncs = 0
+        self.stale = False
+
+    def offer(self, message):
+        # A viewer that can't keep up gets one fresh snapshot instead of the backlog
+        if self.stale:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.stale = True
+            self.resyncs += 1
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put_nowait(None)
+
+class RemoteServer(object):
+    """Keeps a copy of the rundown and tally and streams changes to viewers.
+
+    The grid calls reset() when a whole rundown is loaded and publish() with
+    every op it journals. Each change is encoded once and the same bytes go
+    to every viewer, and the last `backlog` deltas are kept so a viewer that
+    reconnects with Last-Event-ID only gets what it missed. Commands are
+    passed to on_command(command, arg, source), which returns the take input
+    result ("accepted", "debounced", "in flight" or "invalid"). It listens
+    on 127.0.0.1 by default and won't start on any other address without a
+    token.
+    """
+    def __init__(self, host="127.0.0.1", port=8766, on_command=None, token="", keepalive=15.0, backlog=1024):
+        self.host = host
+        self.port = port
+        self.on_command = on_command
+        self.token = token
+        self.keepalive = keepalive
+        self.lock = threading.Lock()
+        self.store = RowStore(0)
+        self.state = RundownState(0)
+        self.version = 0
+        self.log = deque(maxlen=backlog)
+        self.snapshot_cache = None
+        self.viewers = set()
+        self.published = 0
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        # Anyone who can reach the port can take to air, so only this machine
+        # gets in without a token
+        if not self.token and not is_loopback(self.host):
+            raise ValueError(f"a token is required to listen on {self.host}")
+        handler = type("BoundRemoteRequestHandler", (RemoteRequestHandler,), {'server_ref': self})
+        self.httpd = ThreadingHTTPServer((self.host, self.port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="NROBS-remote-api", daemon=True)
+        self.thread.start()
+        print(f"Remote API listening on {self.host}:{self.port}")
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def reset(self, rundown, preview, program):
+        with self.lock:
+            self.store.load(rundown)
+            self.state.restore(len(self.store), preview, program)
+            self.version += 1
+            self.log.clear()
+            self.snapshot_cache = None
+            message = self.encode_snapshot()
+            viewers = list(self.viewers)
+        for viewer in viewers:
+            viewer.offer(message)
+
+    def publish(self, op, **fields):
+        with self.lock:
+            apply_op(dict(fields, op=op), self.store, self.state)
+            self.version += 1
+            self.snapshot_cache = None
+            delta = dict(fields, op=op, v=self.version,
+                         preview=self.state.preview, program=self.state.program)
+            message = encode_event("delta", self.version, delta)
+            self.log.append((self.version, message))
+            self.published += 1
+            viewers = list(self.viewers)
+        for viewer in viewers:
+            viewer.offer(message)
+        return len(viewers)
+
+    def snapshot(self):
+        # Called with the lock held
+        return {'v': self.version,
+                'columns': COLUMNS,
+                'rows': self.store.rows,
+                'preview': self.state.preview,
+                'program': self.state.program}
+
+    def encode_snapshot(self):
+        # Called with the lock held, shared by every viewer until the next change
+        if self.snapshot_cache is None:
+            self.snapshot_cache = encode_event("snapshot", self.version, self.snapshot())
+        return self.snapshot_cache
+
+    def snapshot_json(self):
+        with self.lock:
+            return json.dumps(self.snapshot(), separators=(',', ':')).encode("utf-8")
+
+    def subscribe(self, address, last_id=None):
+        # Returns the viewer and what it needs first: the deltas since
+        # last_id if they are all still in the log, otherwise a snapshot.
+        viewer = Viewer(address)
+        with self.lock:
+            self.viewers.add(viewer)
+            if last_id is not None and last_id == self.version:
+                return viewer, []
+            if last_id is not None and self.log and self.log[0][0] <= last_id + 1 and last_id < self.version:
+                return viewer, [message for version, message in self.log if version > last_id]
+            return viewer, [self.encode_snapshot()]
+
+    def resync(self, viewer):
+        with self.lock:
+            viewer.stale = False
+            return self.encode_snapshot()
+
+    def unsubscribe(self, viewer):
+        with self.lock:
+            self.viewers.discard(viewer)
+
+    def command(self, command, arg, source):
+        if self.on_command is None:
+            return "invalid"
+        return self.on_command(command, arg, source)
+
+    def stats(self):
+        with self.lock:
+            viewers = list(self.viewers)
+            version = self.version
+        return {'v': version,
+                'published': self.published,
+                'viewers': [{'address': viewer.address,
+                             'connected': viewer.connected,
+                             'sent': viewer.sent,
+                             'queued': viewer.queue.qsize(),
+                             'resyncs': viewer.resyncs} for viewer in viewers]}
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def encode_event(event, version, data):
+    body = json.dumps(data, separators=(',', ':'))
+    return f"id: {version}\nevent: {event}\ndata: {body}\n\n".encode("utf-8")
+
+class RemoteRequestHandler(BaseHTTPRequestHandler):
+    server_ref = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def authorised(self, url):
+        token = self.headers.get("X-NROBS-Token") or parse_qs(url.query).get("token", [""])[0]
+        if self.server_ref.token and token != self.server_ref.token:
+            self.send_body(403, b"Forbidden")
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path
+        if path.startswith("/api/") and not self.authorised(url):
+            return
+        if path == "/api/events":
+            self.stream_events()
+        elif path == "/api/rundown":
+            self.send_body(200, self.server_ref.snapshot_json(), "application/json")
+        elif path == "/api/stats":
+            self.send_body(200, json.dumps(self.server_ref.stats()).encode("utf-8"), "application/json")
+        else:
+            self.send_static(path)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        command = COMMAND_PATHS.get(url.path)
+        if command is None:
+            self.send_body(404, b"Not found")
+            return
+        if not self.authorised(url):
+            return
+        query = parse_qs(url.query)
+        arg = None
+        if command == "jump":
+            try:
+                arg = int(query.get("row", [""])[0])
+            except ValueError:
+                self.send_body(400, b"invalid")
+                return
+        result = self.server_ref.command(command, arg, f"remote:{self.client_address[0]}")
+        code = {"accepted": 202, "debounced": 429, "in flight": 409}.get(result, 400)
+        self.send_body(code, str(result).encode("utf-8"))
+
+    def send_body(self, code, body, content_type="text/plain; charset=utf-8"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_static(self, path):
+        name = "index.html" if path in ("", "/") else path.lstrip("/")
+        full_path = os.path.normpath(os.path.join(REMOTE_DIR, name))
+        if not full_path.startswith(REMOTE_DIR) or not os.path.isfile(full_path):
+            self.send_body(404, b"Not found")
+            return
+        with open(full_path, "rb") as file:
+            body = file.read()
+        content_type = "text/html; charset=utf-8" if full_path.endswith(".html") else "application/octet-stream"
+        self.send_body(200, body, content_type)
+
+    def stream_events(self):
+        try:
+            last_id = int(self.headers.get("Last-Event-ID", ""))
+        except ValueError:
+            last_id = None
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "keep-alive")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.close_connection = True
+        viewer, backlog = self.server_ref.subscribe(f"{self.client_address[0]}:{self.client_address[1]}", last_id)
+        try:
+            for message in backlog:
+                self.wfile.write(message)
+            self.wfile.flush()
+            while True:
+                try:
+                    message = viewer.queue.get(timeout=self.server_ref.keepalive)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    continue
+                if message is None:
+                    message = self.server_ref.resync(viewer)
+                self.wfile.write(message)
+                self.wfile.flush()
+                viewer.sent += 1
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            self.server_ref.unsubscribe(viewer)
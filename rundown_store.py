@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Compact row storage behind the NROBS rundown grid.
+"""
+
+import sys
+from bisect import bisect_right
+from itertools import accumulate, chain
+
+COLUMNS = ("slug", "super", "scene", "transition")
+LABELS = ("SLUG", "SUPER", "SCENE", "TRANSITION")
+EMPTY_ROW = ("", "", "", "")
+CHUNK = 64
+
+def chunked(rows):
+    # Even pieces of at most CHUNK rows, so none is under CHUNK // 2 unless
+    # there are fewer rows than that
+    pieces = -(-len(rows) // CHUNK)
+    if not pieces:
+        return ()
+    bounds = [len(rows) * i // pieces for i in range(pieces + 1)]
+    return tuple(tuple(rows[bounds[i]:bounds[i + 1]]) for i in range(pieces))
+
+class RowStore(object):
+    """Rundown rows as immutable 4-tuples of strings, held in immutable chunks.
+
+    Scene and transition names repeat on most rows, so they are interned
+    and every row shares the same string objects. An edit replaces only the
+    chunk it touches, so snapshot() is free and two snapshots share every
+    chunk the edits between them didn't touch.
+    """
+    def __init__(self, count=0):
+        self.rows = [EMPTY_ROW] * count
+
+    @property
+    def rows(self):
+        return list(chain.from_iterable(self.chunks))
+
+    @rows.setter
+    def rows(self, rows):
+        self.chunks = chunked(list(rows))
+        self.reindex()
+
+    def reindex(self):
+        # starts[i] is the first row of chunk i
+        self.starts = [0]
+        self.starts.extend(accumulate(len(chunk) for chunk in self.chunks))
+        self.count = self.starts.pop()
+
+    def snapshot(self):
+        return self.chunks, self.starts, self.count
+
+    def restore(self, snapshot):
+        self.chunks, self.starts, self.count = snapshot
+
+    @classmethod
+    def view(cls, snapshot):
+        store = cls.__new__(cls)
+        store.restore(snapshot)
+        return store
+
+    def __len__(self):
+        return self.count
+
+    def locate(self, row):
+        if not 0 <= row < self.count:
+            raise IndexError(row)
+        i = bisect_right(self.starts, row) - 1
+        return i, row - self.starts[i]
+
+    def get(self, row, col):
+        i, offset = self.locate(row)
+        return self.chunks[i][offset][col]
+
+    def row(self, row):
+        i, offset = self.locate(row)
+        return self.chunks[i][offset]
+
+    def slice(self, start, stop):
+        return [self.row(row) for row in range(start, stop)]
+
+    def set(self, row, col, value):
+        if col >= 2:
+            value = sys.intern(value)
+        i, offset = self.locate(row)
+        chunk = list(self.chunks[i])
+        values = list(chunk[offset])
+        values[col] = value
+        chunk[offset] = tuple(values)
+        self.chunks = self.chunks[:i] + (tuple(chunk),) + self.chunks[i + 1:]
+
+    def splice(self, start, stop, rows):
+        # Replaces rows start to stop - 1 with rows, rebuilding only the
+        # chunks that range covers
+        if not self.chunks:
+            self.rows = rows
+            return
+        first = bisect_right(self.starts, start) - 1 if start < self.count else len(self.chunks) - 1
+        last = bisect_right(self.starts, stop - 1) - 1 if stop > start else first
+        base = self.starts[first]
+        affected = list(chain.from_iterable(self.chunks[first:last + 1]))
+        affected[start - base:stop - base] = rows
+        if len(affected) < CHUNK // 2:
+            # Fold a short run into a neighbour so edits in one place don't
+            # leave a trail of tiny chunks
+            if last + 1 < len(self.chunks):
+                last += 1
+                affected.extend(self.chunks[last])
+            elif first > 0:
+                first -= 1
+                affected[:0] = self.chunks[first]
+        self.chunks = self.chunks[:first] + chunked(affected) + self.chunks[last + 1:]
+        self.reindex()
+
+    def insert(self, pos, count=1):
+        pos = max(0, min(pos, self.count))
+        self.splice(pos, pos, [EMPTY_ROW] * count)
+        return pos
+
+    def append(self, count=1):
+        return self.insert(self.count, count)
+
+    def delete(self, pos, count=1):
+        pos = max(0, min(pos, self.count))
+        self.splice(pos, min(pos + count, self.count), [])
+
+    def permute(self, order, start=0):
+        # order[v] is the old row that ends up at position start + v, only
+        # rows start to start + len(order) - 1 are touched
+        self.splice(start, start + len(order), [self.row(old) for old in order])
+
+    def clear(self):
+        self.rows = [EMPTY_ROW] * self.count
+
+    def column(self, col):
+        return [values[col] for values in chain.from_iterable(self.chunks)]
+
+    def load(self, rundown):
+        # rundown is the saved format: {"0": {"slug": ..., ...}, "1": ...}
+        rows = []
+        for _, data in sorted(rundown.items(), key=lambda item: int(item[0])):
+            rows.append((data.get('slug', ''),
+                         data.get('super', ''),
+                         sys.intern(data.get('scene', '')),
+                         sys.intern(data.get('transition', ''))))
+        self.rows = rows
+
+    def dump(self):
+        return {str(row): dict(zip(COLUMNS, values)) for row, values in enumerate(chain.from_iterable(self.chunks))}
+
+def moved_range(order, start=0):
+    # Trims a permutation of rows start onwards to the rows that actually
+    # moved: (start, order)
+    first = 0
+    end = len(order)
+    while first < end and order[first] == start + first:
+        first += 1
+    while end > first and order[end - 1] == start + end - 1:
+        end -= 1
+    return start + first, list(order[first:end])
+
+def move_fields(start, order):
+    # Journal fields for a move. A drag moves one block of rows, which is
+    # stored as pos/count/to instead of the whole permutation.
+    size = len(order)
+    for split in range(1, size):
+        if order[0] == start + split and order[size - split] == start:
+            rotated = list(range(start + split, start + size)) + list(range(start, start + split))
+            if order == rotated:
+                if split <= size - split:
+                    return {'pos': start, 'count': split, 'to': start + size - split}
+                return {'pos': start + split, 'count': size - split, 'to': start}
+            break
+    return {'start': start, 'order': order}
+
+def move_order(fields):
+    # (start, order) back from any move op, including full-order ones from
+    # older journals
+    if 'order' in fields:
+        return fields.get('start', 0), fields['order']
+    pos, count, to = fields['pos'], fields['count'], fields['to']
+    if to > pos:
+        return pos, list(range(pos + count, to + count)) + list(range(pos, pos + count))
+    return to, list(range(pos, pos + count)) + list(range(to, pos))
+
+class StoryIndex(object):
+    """The newsroom story ID of every rundown row, None for rows made in NROBS.
+
+    Kept in line with the grid by apply(), which takes the same ops the
+    edit journal records.
+    """
+    def __init__(self, count=0):
+        self.ids = [None] * count
+
+    def reset(self, count):
+        self.ids = [None] * count
+
+    def assign(self, pos, ids):
+        self.ids[pos:pos + len(ids)] = ids
+
+    def apply(self, op, fields):
+        if op == 'insert':
+            self.ids[fields['pos']:fields['pos']] = [None] * fields['count']
+        elif op == 'delete':
+            del self.ids[fields['pos']:fields['pos'] + fields['count']]
+        elif op == 'move':
+            start, order = move_order(fields)
+            self.ids[start:start + len(order)] = [self.ids[old] for old in order]
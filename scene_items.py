@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Event-maintained scene item index for NROBS.
+"""
+
+import threading
+
+def event(method):
+    # Scene item events arrive on obsws_python's event thread, which dies on
+    # an uncaught error. One that doesn't fit the index (an item we never
+    # saw) means the scene is out of date, so it's dropped and indexed
+    # again the next time it's needed.
+    def handler(self, scene, *args):
+        try:
+            with self.lock:
+                self.events += 1
+                method(self, scene, *args)
+        except Exception as e:
+            print(f"Scene item index out of step for {scene}, dropping it:", repr(e))
+            with self.lock:
+                self.scenes.pop(scene, None)
+    handler.__name__ = method.__name__
+    return handler
+
+class SceneItemIndex(object):
+    """Scene items of the rundown's scenes, kept current from OBS events.
+
+    Scenes are listed with requests()/load() in one batch, after that
+    SceneItemCreated, SceneItemRemoved, SceneItemEnableStateChanged and
+    SceneItemListReindexed keep them right without asking OBS again.
+    program is the current program scene, from
+    CurrentProgramSceneChanged. Events are applied on the websocket thread,
+    items() is read from the UI thread.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.scenes = {}
+        self.program = None
+        self.events = 0
+
+    def clear(self):
+        with self.lock:
+            self.scenes = {}
+            self.program = None
+
+    def has(self, scene):
+        with self.lock:
+            return scene in self.scenes
+
+    def missing(self, scenes):
+        with self.lock:
+            return [scene for scene in dict.fromkeys(scenes) if scene and scene not in self.scenes]
+
+    def requests(self, scenes, program=False):
+        requests = [("GetCurrentProgramScene", None)] if program else []
+        return requests + [("GetSceneItemList", {"sceneName": scene}) for scene in scenes]
+
+    def load(self, scenes, results, program=False):
+        # results are the batch results for requests(scenes, program)
+        with self.lock:
+            if program:
+                status = results[0]["requestStatus"]
+                if status["result"]:
+                    self.program = results[0]["responseData"]["sceneName"]
+                results = results[1:]
+            for scene, result in zip(scenes, results):
+                if not result["requestStatus"]["result"]:
+                    continue
+                self.scenes[scene] = {item["sceneItemId"]: {'source': item["sourceName"],
+                                                            'enabled': item["sceneItemEnabled"],
+                                                            'index': item["sceneItemIndex"]}
+                                      for item in result["responseData"]["sceneItems"]}
+
+    def items(self, scene):
+        # {source name: {'id', 'enabled'}} bottom to top, None if not indexed
+        with self.lock:
+            items = self.scenes.get(scene)
+            if items is None:
+                return None
+            ordered = sorted(items.items(), key=lambda item: item[1]['index'])
+            return {data['source']: {'id': item_id, 'enabled': data['enabled']} for item_id, data in ordered}
+
+    @event
+    def created(self, scene, item_id, source, index):
+        items = self.scenes.get(scene)
+        if items is None:
+            return
+        for data in items.values():
+            if data['index'] >= index:
+                data['index'] += 1
+        # New items are visible, OBS sends EnableStateChanged if that's not so
+        items[item_id] = {'source': source, 'enabled': True, 'index': index}
+
+    @event
+    def removed(self, scene, item_id):
+        items = self.scenes.get(scene)
+        if items is not None:
+            del items[item_id]
+
+    @event
+    def enabled_changed(self, scene, item_id, enabled):
+        items = self.scenes.get(scene)
+        if items is not None:
+            items[item_id]['enabled'] = enabled
+
+    @event
+    def reindexed(self, scene, order):
+        # order is SceneItemListReindexed's [{sceneItemId, sceneItemIndex}, ...]
+        items = self.scenes.get(scene)
+        if items is None:
+            return
+        for entry in order:
+            items[entry["sceneItemId"]]['index'] = entry["sceneItemIndex"]
+
+    def program_changed(self, scene):
+        with self.lock:
+            self.program = scene
+
+    def scene_renamed(self, old, new):
+        with self.lock:
+            if old in self.scenes:
+                self.scenes[new] = self.scenes.pop(old)
+            if self.program == old:
+                self.program = new
+
+    def scene_removed(self, scene):
+        with self.lock:
+            self.scenes.pop(scene, None)
+
+    def source_renamed(self, old, new):
+        with self.lock:
+            for items in self.scenes.values():
+                for data in items.values():
+                    if data['source'] == old:
+                        data['source'] = new
+
+    def stats(self):
+        with self.lock:
+            return {'scenes': len(self.scenes),
+                    'items': sum(len(items) for items in self.scenes.values()),
+                    'events': self.events,
+                    'program': self.program}
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Startup phase timing for NROBS.
+"""
+
+import json
+import os
+import threading
+import time
+
+class StartupTimer(object):
+    """Marks each startup phase against the moment gui.py started importing.
+
+    Phases are marked from the UI and connection threads. report() prints
+    the breakdown once, when the app is ready, and keeps the last boot in
+    data/logs/startup.json so cold starts can be compared between PCs.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.phases = []
+        self.reported = False
+
+    def mark(self, phase):
+        with self.lock:
+            if not self.reported and phase not in (name for name, _ in self.phases):
+                self.phases.append((phase, time.perf_counter()))
+
+    def elapsed(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def summary(self):
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        rows = []
+        previous = self.start
+        for name, stamp in phases:
+            rows.append({'phase': name,
+                         'ms': round((stamp - previous) * 1000, 1),
+                         'total_ms': round((stamp - self.start) * 1000, 1)})
+            previous = stamp
+        return rows
+
+    def report(self, filename="data/logs/startup.json"):
+        with self.lock:
+            if self.reported:
+                return
+            self.reported = True
+        rows = self.summary()
+        print("Startup:")
+        for row in rows:
+            print(f"  {row['phase']:<12} {row['ms']:>8.1f} ms  ({row['total_ms']:.1f} ms)")
+        try:
+            directory = os.path.dirname(filename)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(filename, "w") as file:
+                json.dump({'time': time.time(), 'phases': rows}, file, indent=2)
+        except Exception as e:
+            print("Couldn't save startup timings:", e)
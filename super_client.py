@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Super (lower third) delivery for NROBS.
+"""
+
+import threading
+import time
+from collections import deque
+
+OBS_TEXT_PREFIX = "obs:"
+OBS_BROWSER_PREFIX = "obs-browser:"
+CLEAR = "*"
+
+class SuperClient(object):
+    """Delivers supers from its own thread so retries never hold up a take.
+
+    Only the newest super matters on air, so anything still waiting when a
+    new one is sent is dropped as superseded. The endpoint decides the mode:
+    an http(s) URL is POSTed to over a kept-alive session, "obs:<input>"
+    writes the text into an OBS text source and "obs-browser:" emits an
+    event to every browser source through the websocket.
+    """
+    def __init__(self, endpoint, obs_conn=None, timeout=(1.0, 2.0), retries=3, backoff=0.1, queue_size=4):
+        self.endpoint = endpoint
+        self.obs_conn = obs_conn
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = deque(maxlen=queue_size)
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.session = None
+        self.deliveries = deque(maxlen=500)
+        self.superseded = 0
+        self.failures = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="NROBS-supers", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(2)
+            self.thread = None
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def enabled(self):
+        endpoint = (self.endpoint or "").strip()
+        return endpoint not in ("", "N/A", "None")
+
+    def send(self, text, on_delivered=None):
+        if not self.enabled():
+            return
+        with self.condition:
+            self.superseded += len(self.queue)
+            self.queue.clear()
+            self.queue.append((text, time.perf_counter(), on_delivered))
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.queue:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                text, queued, on_delivered = self.queue.popleft()
+            self.deliver(text, queued, on_delivered)
+
+    def is_superseded(self):
+        with self.condition:
+            return bool(self.queue)
+
+    def deliver(self, text, queued, on_delivered=None):
+        error = None
+        for attempt in range(1, self.retries + 1):
+            start = time.perf_counter()
+            try:
+                self.transmit(text)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                if attempt == self.retries or self.is_superseded():
+                    break
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        now = time.perf_counter()
+        record = {'text': text,
+                  'ok': error is None,
+                  'attempts': attempt,
+                  'latency_ms': (now - start) * 1000,
+                  'total_ms': (now - queued) * 1000,
+                  'time': time.time()}
+        self.deliveries.append(record)
+        if error is not None:
+            self.failures += 1
+            print("There was a problem sending super text:", error)
+        else:
+            print(f"Super delivered in {record['total_ms']:.1f} ms ({attempt} attempt(s))")
+        if on_delivered is not None:
+            try:
+                on_delivered(record)
+            except Exception as e:
+                print("Super delivery callback failed:", e)
+
+    def transmit(self, text):
+        endpoint = self.endpoint.strip()
+        if endpoint.startswith(OBS_BROWSER_PREFIX):
+            self.obs_conn.batch([("CallVendorRequest", {"vendorName": "obs-browser",
+                                                        "requestType": "emit_event",
+                                                        "requestData": {"event_name": "nrobs-super",
+                                                                        "event_data": {"text": text}}})],
+                                halt_on_failure=True, label="super")
+        elif endpoint.startswith(OBS_TEXT_PREFIX):
+            source = endpoint[len(OBS_TEXT_PREFIX):].strip()
+            self.obs_conn.batch([("SetInputSettings", {"inputName": source,
+                                                       "inputSettings": {"text": "" if text == CLEAR else text},
+                                                       "overlay": True})],
+                                halt_on_failure=True, label="super")
+        else:
+            if self.session is None:
+                # Only the URL mode needs requests, keep it off the startup path
+                import requests
+                from requests.adapters import HTTPAdapter
+                self.session = requests.Session()
+                self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+                self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+            response = self.session.post(endpoint, headers=headers, data=text.encode("utf-8"), timeout=self.timeout)
+            response.raise_for_status()
+
+    def stats(self):
+        latencies = sorted(record['total_ms'] for record in self.deliveries if record['ok'])
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))]
+        return {'delivered': len(latencies),
+                'failures': self.failures,
+                'superseded': self.superseded,
+                'p50_ms': percentile(50),
+                'p95_ms': percentile(95)}
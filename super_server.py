@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Push-based super server for NROBS, replacing supers/super.php.
+
+Accepts the same POST that send_super.php did and pushes the text to every
+connected supers/index.html over server-sent events as soon as it arrives.
+Nothing is written to disk.
+
+    python super_server.py --port 8765
+
+then point the Super Endpoint at http://<host>:8765/send_super.php and the
+OBS browser sources at http://<host>:8765/
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUPERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "supers")
+EVENT_PATHS = ("/super.php", "/events")
+SEND_PATHS = ("/send_super.php", "/send_super", "/")
+
+class Subscriber(object):
+    def __init__(self, address):
+        self.address = address
+        self.queue = queue.Queue(maxsize=32)
+        self.connected = time.time()
+        self.sent = 0
+        self.skipped = 0
+        self.latencies = deque(maxlen=200)
+
+    def offer(self, message):
+        # A stuck client only ever needs the newest super
+        while True:
+            try:
+                self.queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.skipped += 1
+                except queue.Empty:
+                    pass
+
+class SuperServer(object):
+    def __init__(self, host="0.0.0.0", port=8765, keepalive=15.0):
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.current = ""
+        self.sequence = 0
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        handler = type("BoundSuperRequestHandler", (SuperRequestHandler,), {'server_ref': self})
+        self.httpd = ThreadingHTTPServer((self.host, self.port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="NROBS-super-server", daemon=True)
+        self.thread.start()
+        print(f"Super server listening on {self.host}:{self.port}")
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def publish(self, text):
+        with self.lock:
+            self.sequence += 1
+            self.current = text
+            message = (self.sequence, text, time.perf_counter())
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(message)
+        return len(subscribers)
+
+    def subscribe(self, address):
+        subscriber = Subscriber(address)
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if self.current.strip() != "":
+                subscriber.offer((self.sequence, self.current, time.perf_counter()))
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def stats(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        clients = []
+        for subscriber in subscribers:
+            latencies = sorted(subscriber.latencies)
+            clients.append({'address': subscriber.address,
+                            'connected': subscriber.connected,
+                            'sent': subscriber.sent,
+                            'skipped': subscriber.skipped,
+                            'last_ms': subscriber.latencies[-1] if latencies else None,
+                            'p50_ms': latencies[len(latencies) // 2] if latencies else None,
+                            'max_ms': latencies[-1] if latencies else None})
+        return {'sequence': self.sequence, 'current': self.current, 'clients': clients}
+
+class SuperRequestHandler(BaseHTTPRequestHandler):
+    server_ref = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path in EVENT_PATHS:
+            self.stream_events()
+        elif path == "/stats":
+            self.send_body(200, json.dumps(self.server_ref.stats()).encode("utf-8"), "application/json")
+        else:
+            self.send_static(path)
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        if path not in SEND_PATHS:
+            self.send_body(404, b"Not found")
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        text = self.rfile.read(length).decode("utf-8", errors="replace")
+        self.server_ref.publish(text)
+        self.send_body(200, b"Updated")
+
+    def send_body(self, code, body, content_type="text/plain; charset=utf-8"):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_static(self, path):
+        name = "index.html" if path in ("", "/") else path.lstrip("/")
+        full_path = os.path.normpath(os.path.join(SUPERS_DIR, name))
+        if not full_path.startswith(SUPERS_DIR) or not os.path.isfile(full_path):
+            self.send_body(404, b"Not found")
+            return
+        with open(full_path, "rb") as file:
+            body = file.read()
+        content_type = "text/html; charset=utf-8" if full_path.endswith(".html") else "application/octet-stream"
+        self.send_body(200, body, content_type)
+
+    def stream_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "keep-alive")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.close_connection = True
+        subscriber = self.server_ref.subscribe(f"{self.client_address[0]}:{self.client_address[1]}")
+        try:
+            while True:
+                try:
+                    sequence, text, published = subscriber.queue.get(timeout=self.server_ref.keepalive)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    continue
+                lines = "".join(f"data: {line}\n" for line in text.splitlines() or [""])
+                self.wfile.write(f"id: {sequence}\n{lines}\n".encode("utf-8"))
+                self.wfile.flush()
+                subscriber.sent += 1
+                subscriber.latencies.append((time.perf_counter() - published) * 1000)
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            self.server_ref.unsubscribe(subscriber)
+
+def main():
+    parser = argparse.ArgumentParser(description="NROBS super server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = SuperServer(args.host, args.port)
+    server.start()
+    try:
+        while True:
+            time.sleep(10)
+            for client in server.stats()['clients']:
+                print(f"{client['address']}: {client['sent']} sent, last {client['last_ms']} ms")
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Take/back/jump input service for NROBS: hotkeys, button boxes over UDP or
+HTTP, and MIDI.
+
+UDP: send "take", "back" or "jump 12" as a datagram.
+HTTP: GET or POST /take, /back or /jump?row=12.
+"""
+
+import queue
+import socket
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from urllib.parse import parse_qs, urlparse
+
+from latency import percentile
+
+TAKE = "take"
+BACK = "back"
+JUMP = "jump"
+COMMANDS = (TAKE, BACK, JUMP)
+
+ACCEPTED = "accepted"
+DEBOUNCED = "debounced"
+IN_FLIGHT = "in flight"
+INVALID = "invalid"
+
+class TakeInputServer(object):
+    """Collects commands from every source and forwards them on one thread.
+
+    submit() decides straight away: a repeat of the same command from the
+    same source inside debounce_ms is dropped, and a take is refused while
+    the previous one hasn't been acknowledged (acknowledged() is called
+    once OBS confirms, ack_timeout is the backstop). Accepted commands are
+    handed to on_command(command, arg, source, received) from the service
+    thread, and dispatched() records input-to-dispatch latency per source.
+    """
+    def __init__(self, on_command, host="0.0.0.0", udp_port=None, http_port=None,
+                 debounce_ms=150, ack_timeout=2.0, midi_port=None, midi_notes=None):
+        self.on_command = on_command
+        self.host = host
+        self.udp_port = udp_port
+        self.http_port = http_port
+        self.debounce = debounce_ms / 1000
+        self.ack_timeout = ack_timeout
+        self.midi_port = midi_port
+        self.midi_notes = midi_notes or {TAKE: 60, BACK: 59}
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.last_seen = {}
+        self.take_pending_since = None
+        self.counts = defaultdict(Counter)
+        self.latencies = defaultdict(lambda: deque(maxlen=500))
+        self.running = False
+        self.threads = []
+        self.udp_socket = None
+        self.httpd = None
+        self.midi_input = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.spawn(self.run, "NROBS-take-inputs")
+        if self.udp_port:
+            try:
+                self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.udp_socket.bind((self.host, self.udp_port))
+                self.spawn(self.serve_udp, "NROBS-take-udp")
+                print(f"Take input listening on UDP {self.host}:{self.udp_port}")
+            except Exception as e:
+                print("Couldn't start the UDP take input:", e)
+                self.udp_socket = None
+        if self.http_port:
+            try:
+                # http.server is only imported when the HTTP input is turned on
+                from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+                handler = type("BoundTakeRequestHandler", (TakeRequestHandler, BaseHTTPRequestHandler), {'server_ref': self})
+                self.httpd = ThreadingHTTPServer((self.host, self.http_port), handler)
+                self.httpd.daemon_threads = True
+                self.spawn(self.httpd.serve_forever, "NROBS-take-http")
+                print(f"Take input listening on HTTP {self.host}:{self.http_port}")
+            except Exception as e:
+                print("Couldn't start the HTTP take input:", e)
+                self.httpd = None
+        if self.midi_port:
+            self.open_midi()
+
+    def spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        self.queue.put(None)
+        if self.udp_socket is not None:
+            self.udp_socket.close()
+            self.udp_socket = None
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        if self.midi_input is not None:
+            self.midi_input.close()
+            self.midi_input = None
+
+    def open_midi(self):
+        try:
+            import mido
+        except ImportError:
+            print("MIDI take input needs mido (pip install mido python-rtmidi)")
+            return
+        notes = {note: command for command, note in self.midi_notes.items()}
+        def on_message(message):
+            if message.type == "note_on" and message.velocity > 0 and message.note in notes:
+                self.submit("midi", notes[message.note])
+        try:
+            self.midi_input = mido.open_input(self.midi_port, callback=on_message)
+            print(f"Take input listening on MIDI {self.midi_port}")
+        except Exception as e:
+            print("Couldn't open the MIDI take input:", e)
+
+    def submit(self, source, command, arg=None, received=None):
+        received = received if received is not None else time.perf_counter()
+        if command not in COMMANDS or (command == JUMP and arg is None):
+            self.counts[source][INVALID] += 1
+            return INVALID
+        with self.lock:
+            last = self.last_seen.get((source, command))
+            if last is not None and received - last < self.debounce:
+                self.counts[source][DEBOUNCED] += 1
+                return DEBOUNCED
+            self.last_seen[(source, command)] = received
+            if command == TAKE:
+                since = self.take_pending_since
+                if since is not None and received - since < self.ack_timeout:
+                    self.counts[source][IN_FLIGHT] += 1
+                    return IN_FLIGHT
+                self.take_pending_since = received
+            self.counts[source][ACCEPTED] += 1
+        self.queue.put((command, arg, source, received))
+        return ACCEPTED
+
+    def acknowledged(self):
+        with self.lock:
+            self.take_pending_since = None
+
+    def dispatched(self, source, received):
+        self.latencies[source].append((time.perf_counter() - received) * 1000)
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            command, arg, source, received = job
+            try:
+                self.on_command(command, arg, source, received)
+            except Exception as e:
+                print(f"Couldn't forward {command} from {source}:", e)
+                if command == TAKE:
+                    self.acknowledged()
+
+    def serve_udp(self):
+        sock = self.udp_socket
+        while self.running and sock is not None:
+            try:
+                data, address = sock.recvfrom(512)
+            except OSError:
+                break
+            received = time.perf_counter()
+            command, arg = parse_command(data.decode("utf-8", errors="replace"))
+            self.submit(f"udp:{address[0]}", command, arg, received)
+
+    def stats(self):
+        output = {}
+        for source in list(self.counts):
+            latencies = list(self.latencies[source])
+            output[source] = dict(self.counts[source],
+                                  p50_ms=percentile(latencies, 50),
+                                  p95_ms=percentile(latencies, 95),
+                                  max_ms=max(latencies) if latencies else None)
+        return output
+
+def parse_command(text):
+    parts = text.strip().lower().split()
+    if not parts:
+        return None, None
+    command = parts[0]
+    arg = None
+    if command == JUMP and len(parts) > 1:
+        try:
+            arg = int(parts[1])
+        except ValueError:
+            arg = None
+    return command, arg
+
+class TakeRequestHandler(object):
+    server_ref = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_command()
+
+    def do_POST(self):
+        self.handle_command()
+
+    def handle_command(self):
+        received = time.perf_counter()
+        url = urlparse(self.path)
+        command = url.path.strip("/").lower()
+        arg = None
+        if command == JUMP:
+            try:
+                arg = int(parse_qs(url.query).get("row", [""])[0])
+            except ValueError:
+                arg = None
+        result = self.server_ref.submit(f"http:{self.client_address[0]}", command, arg, received)
+        code = {ACCEPTED: 202, DEBOUNCED: 429, IN_FLIGHT: 409}.get(result, 400)
+        body = result.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
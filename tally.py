@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Rundown tally state for NROBS.
+"""
+
+import threading
+import time
+from collections import deque
+
+PREVIEW = "preview"
+PROGRAM = "program"
+
+class RundownState(object):
+    """Owns the preview (green) and program (red) rows and the take history.
+
+    Every mutator returns the set of rows whose tally changed so the grid
+    only has to repaint those rows.
+    """
+    def __init__(self, row_count=1, history_size=500):
+        self.lock = threading.RLock()
+        self.row_count = row_count
+        self.preview = 0 if row_count > 0 else None
+        self.program = None
+        self.armed = None
+        self.history = deque(maxlen=history_size)
+
+    def state_of(self, row):
+        with self.lock:
+            if row == self.preview:
+                return PREVIEW
+            if row == self.program:
+                return PROGRAM
+            return None
+
+    def _changed(self, before):
+        after = (self.preview, self.program)
+        return {row for row in before + after if row is not None}
+
+    def arm(self, scene, transition, super_text):
+        # Cue for the preview row, so the event thread never reads the grid.
+        with self.lock:
+            self.armed = {'scene': scene,
+                          'transition': transition if transition.strip() != "" else "Cut",
+                          'super': super_text}
+
+    def take(self):
+        with self.lock:
+            before = (self.preview, self.program)
+            if self.row_count == 0:
+                return set()
+            if self.preview is None:
+                self.preview = 0
+                return self._changed(before)
+            self.program = self.preview
+            self.preview = self.preview + 1
+            if self.preview >= self.row_count:
+                self.preview = 0
+            self.history.append((time.time(), self.program))
+            self.armed = None
+            return self._changed(before)
+
+    def set_preview(self, row, clear_program=True):
+        with self.lock:
+            before = (self.preview, self.program)
+            self.preview = row
+            if clear_program:
+                self.program = None
+            self.armed = None
+            return self._changed(before)
+
+    def reset(self, row_count):
+        with self.lock:
+            before = (self.preview, self.program)
+            self.row_count = row_count
+            self.preview = 0 if row_count > 0 else None
+            self.program = None
+            self.armed = None
+            return {row for row in self._changed(before) if row < row_count}
+
+    def restore(self, row_count, preview, program):
+        with self.lock:
+            self.row_count = row_count
+            self.preview = preview if preview is not None and preview < row_count else None
+            self.program = program if program is not None and program < row_count else None
+            self.armed = None
+
+    def _shift(self, row, pos, count):
+        if row is None or row < pos:
+            return row
+        return row + count
+
+    def insert_rows(self, pos, count=1):
+        with self.lock:
+            before = (self.preview, self.program)
+            self.row_count += count
+            self.preview = self._shift(self.preview, pos, count)
+            self.program = self._shift(self.program, pos, count)
+            if self.preview is None and self.row_count > 0:
+                self.preview = 0
+            return {row for row in self._changed(before) if row < self.row_count}
+
+    def delete_rows(self, pos, count=1):
+        with self.lock:
+            before = (self.preview, self.program)
+            self.row_count = max(0, self.row_count - count)
+
+            def remap(row):
+                if row is None or row < pos:
+                    return row
+                if row < pos + count:
+                    return None
+                return row - count
+
+            preview = self.preview
+            self.preview = remap(self.preview)
+            self.program = remap(self.program)
+            if self.preview is None and preview is not None and self.row_count > 0:
+                # The armed row was removed, arm whatever slid into its place.
+                self.preview = min(pos, self.row_count - 1)
+                self.armed = None
+            return {row for row in self._changed(before) if row < self.row_count}
+
+    def move_rows(self, order, start=0):
+        # order[v] is the old row now displayed at position start + v.
+        with self.lock:
+            before = (self.preview, self.program)
+            new_index = {old: new for new, old in enumerate(order, start)}
+            self.preview = new_index.get(self.preview, self.preview)
+            self.program = new_index.get(self.program, self.program)
+            return self._changed(before)
+
+IDLE = "idle"
+TRANSITIONING = "transitioning"
+
+class TallyStateMachine(object):
+    """Keeps RundownState in line with what OBS reports.
+
+    Driven from the websocket thread by CurrentProgramSceneChanged,
+    CurrentPreviewSceneChanged, SceneTransitionStarted and
+    SceneTransitionEnded. Changes we caused ourselves are expected and
+    ignored; anything else (a take or preview change made in OBS) moves the
+    markers to the matching rundown row. on_delta(rows) is called with the
+    rows that need repainting and on_cue(scene, transition) when the armed
+    row should be put back in preview after a transition. cue_of(row)
+    returns a row's (scene, transition, super) so the next row is armed in
+    the same locked section as a take made in OBS.
+    """
+    def __init__(self, state, scene_of, on_delta, on_cue, cue_of=None, settle=0.3):
+        self.state = state
+        self.scene_of = scene_of
+        self.cue_of = cue_of
+        self.on_delta = on_delta
+        self.on_cue = on_cue
+        self.settle = settle
+        self.lock = threading.Lock()
+        self.phase = IDLE
+        self.settle_until = 0.0
+        self.expected = []
+        self.obs_program = None
+        self.obs_preview = None
+
+    def expect_preview(self, *scenes):
+        # Scenes we're about to put in preview, in order. OBS only sends an
+        # event when the preview actually changes.
+        with self.lock:
+            current = self.obs_preview
+            for scene in scenes:
+                if scene != current:
+                    self.expected.append(scene)
+                    current = scene
+            del self.expected[:-8]
+
+    def find_row(self, scene, start):
+        count = self.state.row_count
+        for offset in range(count):
+            row = (start + offset) % count
+            if self.scene_of(row) == scene:
+                return row
+        return None
+
+    def arm(self, row):
+        # Called with the state lock held
+        cue = self.cue_of(row) if self.cue_of is not None and row is not None else None
+        if cue is not None:
+            self.state.arm(*cue)
+
+    def program_changed(self, scene):
+        with self.lock:
+            self.obs_program = scene
+        with self.state.lock:
+            program = self.state.program
+            preview = self.state.preview
+            if program is not None and self.scene_of(program) == scene:
+                return
+            if preview is not None and self.scene_of(preview) == scene:
+                # Somebody took the armed row from OBS itself
+                changed = self.state.take()
+                self.arm(self.state.preview)
+            else:
+                start = program + 1 if program is not None else 0
+                row = self.find_row(scene, start)
+                before = {program}
+                self.state.program = row
+                changed = {r for r in before | {row} if r is not None}
+        if changed:
+            self.on_delta(changed)
+
+    def preview_changed(self, scene):
+        with self.lock:
+            self.obs_preview = scene
+            if scene in self.expected:
+                self.expected.remove(scene)
+                return
+            if self.phase == TRANSITIONING or time.monotonic() < self.settle_until:
+                return
+        with self.state.lock:
+            preview = self.state.preview
+            if preview is not None and self.scene_of(preview) == scene:
+                return
+            program = self.state.program
+            start = program + 1 if program is not None else 0
+            row = self.find_row(scene, start)
+            if row is None:
+                return
+            changed = self.state.set_preview(row, clear_program=False)
+            self.arm(row)
+        self.on_delta(changed)
+
+    def transition_started(self):
+        with self.lock:
+            self.phase = TRANSITIONING
+
+    def transition_ended(self):
+        with self.lock:
+            self.phase = IDLE
+            self.settle_until = time.monotonic() + self.settle
+        armed = self.state.armed
+        if armed is not None and armed['scene'].strip() != "":
+            self.on_cue(armed['scene'], armed['transition'])
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for NROBS against the local mock obs-websocket server.
+
+    python tests/benchmarks.py
+    python tests/benchmarks.py --only take,meters --latency 2 --json results.json
+
+meters only needs obsws_python. take, faders and rundown drive the real wx
+frame, so they're skipped when wxPython isn't installed.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from statistics import mean
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, TESTS_DIR)
+
+import obsws_python as obs
+
+from mock_obs import MockOBS
+from dispatch import CommandDispatcher
+from latency import LatencyRecorder, percentile
+from meters import MeterBank
+
+def timings(values):
+    return {'count': len(values),
+            'mean_ms': mean(values) if values else None,
+            'p50_ms': percentile(values, 50),
+            'p95_ms': percentile(values, 95),
+            'p99_ms': percentile(values, 99),
+            'max_ms': max(values) if values else None}
+
+def bench_take_latency(mock, takes=200, transition="Cut"):
+    # The app's own take path: OBS.take on a CommandDispatcher worker, timed
+    # by the frame's LatencyRecorder and transition event handlers
+    app, frame, gui = wx_gui(mock)
+    frame.latency = LatencyRecorder("benchmark")
+    dispatcher = CommandDispatcher()
+    acked = threading.Event()
+    ended = threading.Event()
+    errors = []
+    def on_take_done(result, error):
+        if error is not None:
+            errors.append(error)
+        acked.set()
+    def on_scene_transition_ended(data):
+        ended.set()
+    try:
+        frame.obs_conn.open_clients()
+        frame.obs_conn.cl_events.callback.register(on_scene_transition_ended)
+        dispatcher.start()
+        scenes = list(mock.scenes)
+        for i in range(takes):
+            name = scenes[i % len(scenes)]
+            acked.clear()
+            ended.clear()
+            take_id = frame.latency.begin(i, name)
+            dispatcher.submit(frame.obs_conn.take, name, transition, take_id=take_id, callback=on_take_done)
+            if not acked.wait(5) or not ended.wait(5):
+                print(f"Take {i} never saw SceneTransitionEnded")
+    finally:
+        dispatcher.stop()
+        frame.obs_conn.close_clients()
+        frame.Destroy()
+    summary = frame.latency.summary()
+    results = {stage: {k: v for k, v in summary[stage].items() if k != 'buckets'}
+               for stage in ('sent', 'acked', 'transition_started', 'transition_ended')}
+    results['errors'] = len(errors)
+    return results
+
+def bench_meter_throughput(mock, seconds=5.0, hz=60.0, fps=20):
+    bank = MeterBank()
+    received = []
+    def on_input_volume_meters(data):
+        received.append(time.perf_counter())
+        bank.push(data.inputs)
+    mock.meter_hz = hz
+    events = obs.EventClient(host=mock.host, port=mock.port, password=mock.password, subs=obs.Subs.INPUTVOLUMEMETERS)
+    events.callback.register(on_input_volume_meters)
+    drains = []
+    try:
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            time.sleep(1 / fps)
+            t = time.perf_counter()
+            bank.drain()
+            drains.append((time.perf_counter() - t) * 1000)
+    finally:
+        events.disconnect()
+    elapsed = time.perf_counter() - start
+    return {'events_per_s': len(received) / elapsed,
+            'inputs': sum(1 for x in mock.inputs.values() if x['audio']),
+            'drain': timings(drains),
+            'bank': bank.stats()}
+
+def wx_gui(mock):
+    # The real frame, pointed at the mock. Its background connection is
+    # stopped so each benchmark opens the clients it measures itself.
+    import wx
+    os.chdir(ROOT_DIR)
+    import gui
+    app = wx.App(False)
+    frame = gui.GUI("NROBS", (mock.host, mock.port, mock.password), "N/A")
+    frame.obs_conn.disconnect()
+    return app, frame, gui
+
+def bench_build_faders(mock, repeats=5):
+    app, frame, gui = wx_gui(mock)
+    try:
+        frame.obs_conn.open_clients()
+        start = time.perf_counter()
+        panel = gui.AudioPanel(frame)
+        first = (time.perf_counter() - start) * 1000
+        rebuilds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            panel.build_faders()
+            rebuilds.append((time.perf_counter() - start) * 1000)
+        return {'strips': len(panel.strips),
+                'first_build_ms': first,
+                'reconcile': timings(rebuilds)}
+    finally:
+        frame.obs_conn.close_clients()
+        frame.Destroy()
+
+def bench_load_rundown(mock, rows=10000, repeats=3):
+    rundown = {str(i): {'slug': f"Story {i}",
+                        'super': f"Super for story {i}" if i % 3 == 0 else "",
+                        'scene': mock.scenes[i % len(mock.scenes)],
+                        'transition': mock.transitions[i % len(mock.transitions)]}
+               for i in range(rows)}
+    filename = os.path.join(tempfile.mkdtemp(), "benchmark_rundown.json")
+    with open(filename, "w") as file:
+        json.dump(rundown, file)
+    app, frame, gui = wx_gui(mock)
+    try:
+        frame.obs_conn.open_clients()
+        loads = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            frame.grid_panel.load_rundown(filename)
+            loads.append((time.perf_counter() - start) * 1000)
+        return {'rows': len(frame.grid_panel.store), 'load': timings(loads)}
+    finally:
+        frame.obs_conn.close_clients()
+        frame.Destroy()
+        os.remove(filename)
+
+BENCHMARKS = ("take", "meters", "faders", "rundown")
+
+def main():
+    parser = argparse.ArgumentParser(description="NROBS benchmarks against a mock OBS")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="comma separated: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--latency", type=float, default=0.0, help="ms the mock adds to every request")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--takes", type=int, default=200)
+    parser.add_argument("--transition", default="Cut")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--meter-hz", type=float, default=60.0)
+    parser.add_argument("--inputs", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    results = {}
+    mock = MockOBS(port=0, latency_ms=args.latency, jitter_ms=args.jitter, meter_hz=0,
+                   audio_inputs=args.inputs).start()
+    try:
+        for name in selected:
+            print(f"Running {name}...")
+            try:
+                if name == "take":
+                    results[name] = bench_take_latency(mock, args.takes, args.transition)
+                elif name == "meters":
+                    results[name] = bench_meter_throughput(mock, args.seconds, args.meter_hz)
+                    mock.meter_hz = 0
+                elif name == "faders":
+                    results[name] = bench_build_faders(mock)
+                elif name == "rundown":
+                    results[name] = bench_load_rundown(mock, args.rows)
+                else:
+                    print(f"Unknown benchmark {name}")
+                    continue
+            except ImportError as e:
+                print(f"Skipped {name}:", e)
+                continue
+            print(json.dumps(results[name], indent=2))
+    finally:
+        mock.stop()
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
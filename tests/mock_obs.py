@@ -0,0 +1,822 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for an obs-websocket v5 server.
+
+Speaks just enough of the protocol (Hello/Identify, requests, request
+batches and events) for NROBS and obsws_python to run against it without
+OBS. Every request can be slowed down by an injected latency and the audio
+inputs send InputVolumeMeters at a configurable rate.
+
+    python tests/mock_obs.py --port 4455 --latency 5 --meter-hz 20 --inputs 8
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import socketserver
+import struct
+import threading
+import time
+from collections import Counter
+from uuid import uuid4
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# eventSubscriptions bits, see obsws_python.Subs
+GENERAL, SCENES, INPUTS, TRANSITIONS, SCENEITEMS, MEDIAINPUTS, VENDORS = 1, 4, 8, 16, 128, 256, 512
+INPUTVOLUMEMETERS = 1 << 16
+
+SUCCESS = 100
+UNKNOWN_REQUEST_TYPE = 204
+MISSING_REQUEST_FIELD = 300
+RESOURCE_NOT_FOUND = 600
+RESOURCE_ALREADY_EXISTS = 601
+
+MEDIA_PLAYING = "OBS_MEDIA_STATE_PLAYING"
+MEDIA_PAUSED = "OBS_MEDIA_STATE_PAUSED"
+MEDIA_STOPPED = "OBS_MEDIA_STATE_STOPPED"
+
+class MockRequestError(Exception):
+    def __init__(self, code, comment):
+        super().__init__(comment)
+        self.code = code
+        self.comment = comment
+
+class MockConnection(object):
+    def __init__(self, handler):
+        self.handler = handler
+        self.write_lock = threading.Lock()
+        self.subs = 0
+        self.identified = False
+        self.challenge = None
+        self.salt = None
+
+    def send_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header.append(length)
+        elif length < 1 << 16:
+            header.append(126)
+            header += struct.pack("!H", length)
+        else:
+            header.append(127)
+            header += struct.pack("!Q", length)
+        with self.write_lock:
+            self.handler.wfile.write(bytes(header) + payload)
+            self.handler.wfile.flush()
+
+    def send_json(self, op, d):
+        self.send_frame(0x1, json.dumps({"op": op, "d": d}).encode("utf-8"))
+
+    def close(self, code=1000, reason=""):
+        try:
+            self.send_frame(0x8, struct.pack("!H", code) + reason.encode("utf-8"))
+        except OSError:
+            pass
+
+    def read_frame(self):
+        # Returns (opcode, payload) for one complete message, joining fragments
+        message = b""
+        message_opcode = None
+        while True:
+            head = self.handler.rfile.read(2)
+            if len(head) < 2:
+                return None, None
+            fin = head[0] & 0x80
+            opcode = head[0] & 0x0F
+            length = head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self.handler.rfile.read(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self.handler.rfile.read(8))[0]
+            mask = self.handler.rfile.read(4) if head[1] & 0x80 else None
+            payload = self.handler.rfile.read(length)
+            if mask:
+                key = (mask * (length // 4 + 1))[:length]
+                payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+            if opcode >= 0x8:
+                # Control frames can arrive between fragments
+                if opcode == 0x9:
+                    self.send_frame(0xA, payload)
+                    continue
+                if opcode == 0xA:
+                    continue
+                return opcode, payload
+            if opcode != 0x0:
+                message_opcode = opcode
+            message += payload
+            if fin:
+                return message_opcode, message
+
+class MockOBSHandler(socketserver.StreamRequestHandler):
+    server_ref = None
+
+    def handle(self):
+        if not self.handshake():
+            return
+        connection = MockConnection(self)
+        mock = self.server_ref
+        mock.hello(connection)
+        try:
+            while True:
+                opcode, payload = connection.read_frame()
+                if opcode is None or opcode == 0x8:
+                    break
+                if opcode != 0x1:
+                    continue
+                message = json.loads(payload.decode("utf-8"))
+                if not mock.on_message(connection, message):
+                    break
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            mock.drop(connection)
+
+    def handshake(self):
+        request_line = self.rfile.readline()
+        if not request_line:
+            return False
+        headers = {}
+        while True:
+            line = self.rfile.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if key is None:
+            self.wfile.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode("ascii")).digest()).decode("ascii")
+        response = ("HTTP/1.1 101 Switching Protocols\r\n"
+                    "Upgrade: websocket\r\n"
+                    "Connection: Upgrade\r\n"
+                    f"Sec-WebSocket-Accept: {accept}\r\n\r\n")
+        self.wfile.write(response.encode("ascii"))
+        self.wfile.flush()
+        return True
+
+class MockOBS(object):
+    """In-memory OBS: scenes, transitions, inputs, scene items and media state.
+
+    latency_ms (plus up to jitter_ms) is slept before every request or batch
+    is answered. The create_*/remove_*/rename_* methods change the state from
+    Python and emit the same lifecycle events OBS would.
+    """
+    def __init__(self, host="127.0.0.1", port=4455, password="", latency_ms=0.0, jitter_ms=0.0,
+                 meter_hz=20.0, scenes=10, audio_inputs=8, media_inputs=2, transition_ms=None):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.meter_hz = meter_hz
+        self.transition_ms = transition_ms if transition_ms is not None else {"Cut": 0, "Fade": 300, "Stinger": 600}
+        self.lock = threading.RLock()
+        self.connections = set()
+        self.request_counts = Counter()
+        self.events_sent = Counter()
+        self.httpd = None
+        self.thread = None
+        self.meter_thread = None
+        self.running = False
+        self.next_item_id = 1
+        self.scenes = []
+        self.scene_items = {}
+        self.inputs = {}
+        self.transitions = list(self.transition_ms)
+        self.transition = self.transitions[0]
+        self.studio_mode = True
+        self.special_inputs = {"desktop1": None, "desktop2": None, "mic1": None,
+                               "mic2": None, "mic3": None, "mic4": None}
+        for i in range(1, scenes + 1):
+            self.create_scene(f"Scene {i}", emit=False)
+        for i in range(1, audio_inputs + 1):
+            self.create_input(f"Mic {i}", "wasapi_input_capture", emit=False)
+        for i in range(1, media_inputs + 1):
+            self.create_input(f"Clip {i}", "ffmpeg_source", scene=self.scenes[(i - 1) % len(self.scenes)], emit=False)
+        if audio_inputs:
+            self.special_inputs["mic1"] = "Mic 1"
+        self.program = self.scenes[0] if self.scenes else None
+        self.preview = self.scenes[1] if len(self.scenes) > 1 else self.program
+
+    def start(self):
+        handler = type("BoundMockOBSHandler", (MockOBSHandler,), {'server_ref': self})
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.httpd = socketserver.ThreadingTCPServer((self.host, self.port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.running = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-obs", daemon=True)
+        self.thread.start()
+        self.meter_thread = threading.Thread(target=self.run_meters, name="mock-obs-meters", daemon=True)
+        self.meter_thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close(1001, "Server stopping")
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # Protocol
+
+    def hello(self, connection):
+        d = {"obsWebSocketVersion": "5.5.0", "rpcVersion": 1}
+        if self.password:
+            connection.challenge = base64.b64encode(os.urandom(32)).decode("ascii")
+            connection.salt = base64.b64encode(os.urandom(32)).decode("ascii")
+            d["authentication"] = {"challenge": connection.challenge, "salt": connection.salt}
+        connection.send_json(0, d)
+
+    def expected_auth(self, connection):
+        secret = base64.b64encode(hashlib.sha256((self.password + connection.salt).encode()).digest())
+        return base64.b64encode(hashlib.sha256(secret + connection.challenge.encode()).digest()).decode()
+
+    def on_message(self, connection, message):
+        op = message.get("op")
+        d = message.get("d", {})
+        if op == 1:
+            if self.password and d.get("authentication") != self.expected_auth(connection):
+                connection.close(4009, "Authentication failed.")
+                return False
+            connection.subs = d.get("eventSubscriptions", GENERAL | SCENES | INPUTS | TRANSITIONS)
+            connection.identified = True
+            with self.lock:
+                self.connections.add(connection)
+            connection.send_json(2, {"negotiatedRpcVersion": 1})
+        elif op == 3:
+            connection.subs = d.get("eventSubscriptions", connection.subs)
+        elif op == 6:
+            self.inject_latency()
+            result = self.execute(d.get("requestType"), d.get("requestData") or {})
+            result["requestId"] = d.get("requestId")
+            connection.send_json(7, result)
+        elif op == 8:
+            self.inject_latency()
+            results = []
+            frame_mode = d.get("executionType", 0) == 1
+            for request in d.get("requests", []):
+                result = self.execute(request.get("requestType"), request.get("requestData") or {}, frame_mode)
+                if "requestId" in request:
+                    result["requestId"] = request["requestId"]
+                results.append(result)
+                if d.get("haltOnFailure") and not result["requestStatus"]["result"]:
+                    break
+            connection.send_json(9, {"requestId": d.get("requestId"), "results": results})
+        return True
+
+    def drop(self, connection):
+        with self.lock:
+            self.connections.discard(connection)
+
+    def inject_latency(self):
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def execute(self, request_type, data, frame_mode=False):
+        self.request_counts[request_type] += 1
+        handler = getattr(self, "request_" + str(request_type), None)
+        try:
+            if handler is None:
+                raise MockRequestError(UNKNOWN_REQUEST_TYPE, f"Your request type is not valid: {request_type}")
+            if request_type == "Sleep":
+                response = handler(data, frame_mode)
+            else:
+                with self.lock:
+                    response = handler(data)
+            status = {"result": True, "code": SUCCESS}
+        except MockRequestError as e:
+            response = None
+            status = {"result": False, "code": e.code, "comment": e.comment}
+        result = {"requestType": request_type, "requestStatus": status}
+        if response is not None:
+            result["responseData"] = response
+        return result
+
+    def emit(self, event_type, intent, data=None):
+        event = {"eventType": event_type, "eventIntent": intent}
+        if data is not None:
+            event["eventData"] = data
+        payload = json.dumps({"op": 5, "d": event}).encode("utf-8")
+        with self.lock:
+            connections = [c for c in self.connections if c.identified and c.subs & intent]
+            self.events_sent[event_type] += len(connections)
+        for connection in connections:
+            try:
+                connection.send_frame(0x1, payload)
+            except OSError:
+                self.drop(connection)
+
+    def run_meters(self):
+        started = time.perf_counter()
+        due = started
+        while self.running:
+            hz = self.meter_hz
+            if not hz:
+                time.sleep(0.1)
+                due = time.perf_counter()
+                continue
+            # Scheduled against the clock so the rate holds however long a send takes
+            due += 1 / hz
+            time.sleep(max(0.0, due - time.perf_counter()))
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                inputs = [x for x in self.inputs.values() if x["audio"]]
+                levels = []
+                for i, x in enumerate(inputs):
+                    if x["muted"]:
+                        left = right = 0.0
+                    else:
+                        gain = 10 ** (x["volumeDb"] / 20)
+                        left = gain * (0.3 + 0.25 * math.sin(elapsed * 3 + i))
+                        right = gain * (0.3 + 0.25 * math.cos(elapsed * 2 + i))
+                    levels.append({"inputName": x["inputName"],
+                                   "inputUuid": x["inputUuid"],
+                                   "inputLevelsMul": [[left, left * 1.2, left * 1.2],
+                                                      [right, right * 1.2, right * 1.2]]})
+            self.emit("InputVolumeMeters", INPUTVOLUMEMETERS, {"inputs": levels})
+
+    # State changes made from Python, each emits what OBS would
+
+    def scene_info(self, name):
+        return {"sceneName": name, "sceneUuid": self.scene_items[name]["uuid"]}
+
+    def create_scene(self, name, emit=True):
+        with self.lock:
+            if name in self.scene_items:
+                raise MockRequestError(RESOURCE_ALREADY_EXISTS, f"A scene already exists by that scene name: {name}")
+            self.scenes.append(name)
+            self.scene_items[name] = {"uuid": str(uuid4()), "items": []}
+            info = dict(self.scene_info(name), isGroup=False)
+        if emit:
+            self.emit("SceneCreated", SCENES, info)
+            self.emit_scene_list()
+        return info
+
+    def remove_scene(self, name):
+        with self.lock:
+            scene = self.get_scene(name)
+            info = dict(self.scene_info(name), isGroup=False)
+            self.scenes.remove(name)
+            del self.scene_items[name]
+            if self.program == name:
+                self.program = self.scenes[0] if self.scenes else None
+            if self.preview == name:
+                self.preview = self.program
+        self.emit("SceneRemoved", SCENES, info)
+        self.emit_scene_list()
+        return scene
+
+    def rename_scene(self, name, new_name):
+        with self.lock:
+            self.get_scene(name)
+            index = self.scenes.index(name)
+            self.scenes[index] = new_name
+            self.scene_items[new_name] = self.scene_items.pop(name)
+            uuid = self.scene_items[new_name]["uuid"]
+            if self.program == name:
+                self.program = new_name
+            if self.preview == name:
+                self.preview = new_name
+        self.emit("SceneNameChanged", SCENES, {"sceneUuid": uuid, "oldSceneName": name, "sceneName": new_name})
+        self.emit_scene_list()
+
+    def emit_scene_list(self):
+        with self.lock:
+            scenes = self.scene_list()
+        self.emit("SceneListChanged", SCENES, {"scenes": scenes})
+
+    def scene_list(self):
+        # OBS lists the bottom scene first
+        count = len(self.scenes)
+        return [dict(self.scene_info(name), sceneIndex=count - 1 - i)
+                for i, name in reversed(list(enumerate(self.scenes)))]
+
+    def create_input(self, name, kind, scene=None, settings=None, emit=True):
+        with self.lock:
+            if name in self.inputs:
+                raise MockRequestError(RESOURCE_ALREADY_EXISTS, f"An input already exists by that input name: {name}")
+            audio = kind in ("wasapi_input_capture", "wasapi_output_capture", "ffmpeg_source",
+                             "vlc_source", "pulse_input_capture", "coreaudio_input_capture")
+            self.inputs[name] = {"inputName": name,
+                                 "inputUuid": str(uuid4()),
+                                 "inputKind": kind,
+                                 "unversionedInputKind": kind,
+                                 "audio": audio,
+                                 "volumeDb": 0.0,
+                                 "muted": False,
+                                 "settings": dict(settings or {}),
+                                 "mediaState": MEDIA_STOPPED,
+                                 "mediaCursor": 0,
+                                 "mediaDuration": 30000 if kind in ("ffmpeg_source", "vlc_source") else None}
+            info = self.input_info(name)
+        if emit:
+            self.emit("InputCreated", INPUTS, dict(info, inputSettings=self.inputs[name]["settings"],
+                                                   defaultInputSettings={}))
+        item = self.add_scene_item(scene, name, emit=emit) if scene is not None else None
+        return info, item
+
+    def remove_input(self, name):
+        with self.lock:
+            info = self.input_info(name)
+            del self.inputs[name]
+            removed = []
+            for scene, data in self.scene_items.items():
+                for item in [x for x in data["items"] if x["sourceName"] == name]:
+                    data["items"].remove(item)
+                    removed.append((scene, item))
+            for key, value in self.special_inputs.items():
+                if value == name:
+                    self.special_inputs[key] = None
+        for scene, item in removed:
+            self.emit("SceneItemRemoved", SCENEITEMS, {"sceneName": scene,
+                                                       "sceneUuid": self.scene_items[scene]["uuid"],
+                                                       "sourceName": name,
+                                                       "sourceUuid": info["inputUuid"],
+                                                       "sceneItemId": item["sceneItemId"]})
+        self.emit("InputRemoved", INPUTS, {"inputName": name, "inputUuid": info["inputUuid"]})
+
+    def rename_input(self, name, new_name):
+        with self.lock:
+            if new_name in self.inputs:
+                raise MockRequestError(RESOURCE_ALREADY_EXISTS, f"An input already exists by that input name: {new_name}")
+            data = self.get_input(name)
+            data["inputName"] = new_name
+            self.inputs[new_name] = self.inputs.pop(name)
+            for scene in self.scene_items.values():
+                for item in scene["items"]:
+                    if item["sourceName"] == name:
+                        item["sourceName"] = new_name
+            for key, value in self.special_inputs.items():
+                if value == name:
+                    self.special_inputs[key] = new_name
+        self.emit("InputNameChanged", INPUTS, {"inputUuid": data["inputUuid"], "oldInputName": name, "inputName": new_name})
+
+    def input_info(self, name):
+        data = self.get_input(name)
+        return {"inputName": name,
+                "inputUuid": data["inputUuid"],
+                "inputKind": data["inputKind"],
+                "unversionedInputKind": data["unversionedInputKind"]}
+
+    def add_scene_item(self, scene, source, enabled=True, emit=True):
+        with self.lock:
+            data = self.get_scene(scene)
+            source_data = self.get_input(source)
+            item = {"sceneItemId": self.next_item_id,
+                    "sceneItemIndex": len(data["items"]),
+                    "sceneItemEnabled": enabled,
+                    "sceneItemLocked": False,
+                    "sourceName": source,
+                    "sourceUuid": source_data["inputUuid"],
+                    "sourceType": "OBS_SOURCE_TYPE_INPUT",
+                    "inputKind": source_data["inputKind"],
+                    "isGroup": None}
+            self.next_item_id += 1
+            data["items"].append(item)
+        if emit:
+            self.emit("SceneItemCreated", SCENEITEMS, {"sceneName": scene,
+                                                       "sceneUuid": data["uuid"],
+                                                       "sourceName": source,
+                                                       "sourceUuid": item["sourceUuid"],
+                                                       "sceneItemId": item["sceneItemId"],
+                                                       "sceneItemIndex": item["sceneItemIndex"]})
+        return item
+
+    def remove_scene_item(self, scene, item_id):
+        with self.lock:
+            data = self.get_scene(scene)
+            item = self.get_scene_item(scene, item_id)
+            data["items"].remove(item)
+        self.emit("SceneItemRemoved", SCENEITEMS, {"sceneName": scene,
+                                                   "sceneUuid": data["uuid"],
+                                                   "sourceName": item["sourceName"],
+                                                   "sourceUuid": item["sourceUuid"],
+                                                   "sceneItemId": item_id})
+
+    def get_scene(self, name):
+        if name not in self.scene_items:
+            raise MockRequestError(RESOURCE_NOT_FOUND, f"No source was found by the name of `{name}`.")
+        return self.scene_items[name]
+
+    def get_input(self, name):
+        if name not in self.inputs:
+            raise MockRequestError(RESOURCE_NOT_FOUND, f"No source was found by the name of `{name}`.")
+        return self.inputs[name]
+
+    def get_scene_item(self, scene, item_id):
+        for item in self.get_scene(scene)["items"]:
+            if item["sceneItemId"] == item_id:
+                return item
+        raise MockRequestError(RESOURCE_NOT_FOUND, f"No scene items were found in scene `{scene}` with the ID `{item_id}`.")
+
+    def field(self, data, name):
+        if name not in data:
+            raise MockRequestError(MISSING_REQUEST_FIELD, f"Your request is missing the `{name}` field.")
+        return data[name]
+
+    def input_name(self, data):
+        if "inputName" in data:
+            return data["inputName"]
+        uuid = self.field(data, "inputUuid")
+        for name, value in self.inputs.items():
+            if value["inputUuid"] == uuid:
+                return name
+        raise MockRequestError(RESOURCE_NOT_FOUND, f"No source was found by the UUID of `{uuid}`.")
+
+    # Requests, named after their requestType
+
+    def request_GetVersion(self, data):
+        return {"obsVersion": "30.2.0",
+                "obsWebSocketVersion": "5.5.0",
+                "rpcVersion": 1,
+                "availableRequests": sorted(name[len("request_"):] for name in dir(self) if name.startswith("request_")),
+                "supportedImageFormats": ["png", "jpg"],
+                "platform": "mock",
+                "platformDescription": "NROBS mock obs-websocket"}
+
+    def request_Sleep(self, data, frame_mode=False):
+        if frame_mode:
+            time.sleep(self.field(data, "sleepFrames") / 60)
+        else:
+            time.sleep(self.field(data, "sleepMillis") / 1000)
+        return None
+
+    def request_GetSceneList(self, data):
+        return {"currentProgramSceneName": self.program,
+                "currentProgramSceneUuid": self.scene_items[self.program]["uuid"] if self.program else None,
+                "currentPreviewSceneName": self.preview,
+                "currentPreviewSceneUuid": self.scene_items[self.preview]["uuid"] if self.preview else None,
+                "scenes": self.scene_list()}
+
+    def request_GetCurrentProgramScene(self, data):
+        info = self.scene_info(self.program)
+        return {"sceneName": info["sceneName"], "sceneUuid": info["sceneUuid"],
+                "currentProgramSceneName": info["sceneName"], "currentProgramSceneUuid": info["sceneUuid"]}
+
+    def request_GetCurrentPreviewScene(self, data):
+        info = self.scene_info(self.preview)
+        return {"sceneName": info["sceneName"], "sceneUuid": info["sceneUuid"],
+                "currentPreviewSceneName": info["sceneName"], "currentPreviewSceneUuid": info["sceneUuid"]}
+
+    def request_SetCurrentPreviewScene(self, data):
+        name = self.field(data, "sceneName")
+        self.get_scene(name)
+        if name != self.preview:
+            self.preview = name
+            self.emit("CurrentPreviewSceneChanged", SCENES, self.scene_info(name))
+        return None
+
+    def request_SetCurrentProgramScene(self, data):
+        name = self.field(data, "sceneName")
+        self.get_scene(name)
+        if name != self.program:
+            self.program = name
+            self.emit("CurrentProgramSceneChanged", SCENES, self.scene_info(name))
+        return None
+
+    def request_CreateScene(self, data):
+        info = self.create_scene(self.field(data, "sceneName"))
+        return {"sceneUuid": info["sceneUuid"]}
+
+    def request_RemoveScene(self, data):
+        self.remove_scene(self.field(data, "sceneName"))
+        return None
+
+    def request_SetSceneName(self, data):
+        self.rename_scene(self.field(data, "sceneName"), self.field(data, "newSceneName"))
+        return None
+
+    def request_GetSceneTransitionList(self, data):
+        return {"currentSceneTransitionName": self.transition,
+                "currentSceneTransitionUuid": None,
+                "currentSceneTransitionKind": "cut_transition" if self.transition == "Cut" else "fade_transition",
+                "transitions": [{"transitionName": name,
+                                 "transitionUuid": None,
+                                 "transitionKind": "cut_transition" if name == "Cut" else "fade_transition",
+                                 "transitionFixed": name == "Cut",
+                                 "transitionConfigurable": name != "Cut"}
+                                for name in self.transitions]}
+
+    def request_GetCurrentSceneTransition(self, data):
+        return {"transitionName": self.transition,
+                "transitionUuid": None,
+                "transitionDuration": self.transition_ms[self.transition],
+                "transitionFixed": self.transition == "Cut"}
+
+    def request_SetCurrentSceneTransition(self, data):
+        name = self.field(data, "transitionName")
+        if name not in self.transition_ms:
+            raise MockRequestError(RESOURCE_NOT_FOUND, f"No transition was found by the name of `{name}`.")
+        if name != self.transition:
+            self.transition = name
+            self.emit("CurrentSceneTransitionChanged", TRANSITIONS, {"transitionName": name, "transitionUuid": None})
+        return None
+
+    def request_GetStudioModeEnabled(self, data):
+        return {"studioModeEnabled": self.studio_mode}
+
+    def request_SetStudioModeEnabled(self, data):
+        self.studio_mode = bool(self.field(data, "studioModeEnabled"))
+        return None
+
+    def request_TriggerStudioModeTransition(self, data):
+        # OBS swaps program and preview as the transition starts and reports
+        # the end once it has run for its duration
+        transition = self.transition
+        old_program, new_program = self.program, self.preview
+        self.emit("SceneTransitionStarted", TRANSITIONS, {"transitionName": transition, "transitionUuid": None})
+        self.program, self.preview = new_program, old_program
+        if new_program != old_program:
+            self.emit("CurrentProgramSceneChanged", SCENES, self.scene_info(new_program))
+            self.emit("CurrentPreviewSceneChanged", SCENES, self.scene_info(old_program))
+        for item in self.scene_items[new_program]["items"]:
+            media = self.inputs.get(item["sourceName"])
+            if media is not None and media["mediaDuration"] is not None and media["mediaState"] == MEDIA_STOPPED:
+                media["mediaState"] = MEDIA_PLAYING
+        ended = lambda: self.emit("SceneTransitionEnded", TRANSITIONS, {"transitionName": transition, "transitionUuid": None})
+        duration = self.transition_ms.get(transition, 0)
+        if duration:
+            threading.Timer(duration / 1000, ended).start()
+        else:
+            ended()
+        return None
+
+    def request_GetSceneItemList(self, data):
+        return {"sceneItems": [dict(item) for item in self.get_scene(self.field(data, "sceneName"))["items"]]}
+
+    def request_GetSceneItemEnabled(self, data):
+        item = self.get_scene_item(self.field(data, "sceneName"), self.field(data, "sceneItemId"))
+        return {"sceneItemEnabled": item["sceneItemEnabled"]}
+
+    def request_SetSceneItemEnabled(self, data):
+        scene = self.field(data, "sceneName")
+        item = self.get_scene_item(scene, self.field(data, "sceneItemId"))
+        enabled = bool(self.field(data, "sceneItemEnabled"))
+        if enabled != item["sceneItemEnabled"]:
+            item["sceneItemEnabled"] = enabled
+            self.emit("SceneItemEnableStateChanged", SCENEITEMS, {"sceneName": scene,
+                                                                  "sceneUuid": self.scene_items[scene]["uuid"],
+                                                                  "sceneItemId": item["sceneItemId"],
+                                                                  "sceneItemEnabled": enabled})
+        return None
+
+    def request_GetInputList(self, data):
+        kind = data.get("inputKind")
+        return {"inputs": [self.input_info(name) for name, value in self.inputs.items()
+                           if kind is None or value["inputKind"] == kind]}
+
+    def request_GetSpecialInputs(self, data):
+        return dict(self.special_inputs)
+
+    def request_CreateInput(self, data):
+        info, item = self.create_input(self.field(data, "inputName"), self.field(data, "inputKind"),
+                                       data.get("sceneName"), data.get("inputSettings"))
+        return {"inputUuid": info["inputUuid"], "sceneItemId": item["sceneItemId"] if item else None}
+
+    def request_RemoveInput(self, data):
+        self.remove_input(self.input_name(data))
+        return None
+
+    def request_SetInputName(self, data):
+        self.rename_input(self.input_name(data), self.field(data, "newInputName"))
+        return None
+
+    def request_GetInputSettings(self, data):
+        value = self.get_input(self.input_name(data))
+        return {"inputSettings": dict(value["settings"]), "inputKind": value["inputKind"]}
+
+    def request_SetInputSettings(self, data):
+        value = self.get_input(self.input_name(data))
+        settings = self.field(data, "inputSettings")
+        if data.get("overlay", True):
+            value["settings"].update(settings)
+        else:
+            value["settings"] = dict(settings)
+        self.emit("InputSettingsChanged", INPUTS, {"inputName": value["inputName"],
+                                                   "inputUuid": value["inputUuid"],
+                                                   "inputSettings": dict(value["settings"])})
+        return None
+
+    def request_GetInputVolume(self, data):
+        value = self.get_input(self.input_name(data))
+        return {"inputVolumeDb": value["volumeDb"], "inputVolumeMul": 10 ** (value["volumeDb"] / 20)}
+
+    def request_SetInputVolume(self, data):
+        value = self.get_input(self.input_name(data))
+        if "inputVolumeDb" in data:
+            value["volumeDb"] = float(data["inputVolumeDb"])
+        else:
+            mul = float(self.field(data, "inputVolumeMul"))
+            value["volumeDb"] = 20 * math.log10(mul) if mul > 0 else -100.0
+        self.emit("InputVolumeChanged", INPUTS, {"inputName": value["inputName"],
+                                                 "inputUuid": value["inputUuid"],
+                                                 "inputVolumeDb": value["volumeDb"],
+                                                 "inputVolumeMul": 10 ** (value["volumeDb"] / 20)})
+        return None
+
+    def request_GetInputMute(self, data):
+        return {"inputMuted": self.get_input(self.input_name(data))["muted"]}
+
+    def set_mute(self, value, muted):
+        value["muted"] = muted
+        self.emit("InputMuteStateChanged", INPUTS, {"inputName": value["inputName"],
+                                                    "inputUuid": value["inputUuid"],
+                                                    "inputMuted": muted})
+
+    def request_SetInputMute(self, data):
+        self.set_mute(self.get_input(self.input_name(data)), bool(self.field(data, "inputMuted")))
+        return None
+
+    def request_ToggleInputMute(self, data):
+        value = self.get_input(self.input_name(data))
+        self.set_mute(value, not value["muted"])
+        return {"inputMuted": value["muted"]}
+
+    def request_GetMediaInputStatus(self, data):
+        value = self.get_input(self.input_name(data))
+        return {"mediaState": value["mediaState"],
+                "mediaDuration": value["mediaDuration"],
+                "mediaCursor": value["mediaCursor"]}
+
+    def request_GetSourceActive(self, data):
+        name = self.field(data, "sourceName")
+        def shown_in(scene):
+            return any(item["sourceName"] == name and item["sceneItemEnabled"]
+                       for item in self.get_scene(scene)["items"]) if scene else False
+        return {"videoActive": shown_in(self.program), "videoShowing": shown_in(self.program) or shown_in(self.preview)}
+
+    def request_SetMediaInputCursor(self, data):
+        self.get_input(self.input_name(data))["mediaCursor"] = self.field(data, "mediaCursor")
+        return None
+
+    def request_TriggerMediaInputAction(self, data):
+        value = self.get_input(self.input_name(data))
+        action = self.field(data, "mediaAction")
+        states = {"OBS_WEBSOCKET_MEDIA_INPUT_ACTION_PLAY": MEDIA_PLAYING,
+                  "OBS_WEBSOCKET_MEDIA_INPUT_ACTION_RESTART": MEDIA_PLAYING,
+                  "OBS_WEBSOCKET_MEDIA_INPUT_ACTION_PAUSE": MEDIA_PAUSED,
+                  "OBS_WEBSOCKET_MEDIA_INPUT_ACTION_STOP": MEDIA_STOPPED}
+        if action in states:
+            value["mediaState"] = states[action]
+            if action == "OBS_WEBSOCKET_MEDIA_INPUT_ACTION_RESTART":
+                value["mediaCursor"] = 0
+        self.emit("MediaInputActionTriggered", MEDIAINPUTS, {"inputName": value["inputName"],
+                                                             "inputUuid": value["inputUuid"],
+                                                             "mediaAction": action})
+        return None
+
+    def request_CallVendorRequest(self, data):
+        vendor = self.field(data, "vendorName")
+        request_type = self.field(data, "requestType")
+        self.emit("VendorEvent", VENDORS, {"vendorName": vendor,
+                                           "eventType": request_type,
+                                           "eventData": data.get("requestData", {})})
+        return {"vendorName": vendor, "requestType": request_type, "responseData": {}}
+
+    def request_BroadcastCustomEvent(self, data):
+        self.emit("CustomEvent", GENERAL, self.field(data, "eventData"))
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock obs-websocket v5 server for NROBS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4455)
+    parser.add_argument("--password", default="")
+    parser.add_argument("--latency", type=float, default=0.0, help="ms added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many ms more, at random")
+    parser.add_argument("--meter-hz", type=float, default=20.0)
+    parser.add_argument("--scenes", type=int, default=10)
+    parser.add_argument("--inputs", type=int, default=8)
+    parser.add_argument("--media", type=int, default=2)
+    args = parser.parse_args()
+    mock = MockOBS(args.host, args.port, args.password, args.latency, args.jitter,
+                   args.meter_hz, args.scenes, args.inputs, args.media).start()
+    print(f"Mock OBS listening on {mock.host}:{mock.port}")
+    try:
+        while True:
+            time.sleep(10)
+            print("Requests:", dict(mock.request_counts))
+    except KeyboardInterrupt:
+        mock.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for the rundown logic that doesn't need wx or OBS.
+
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from history import UndoHistory
+from journal import apply_op
+from mos_ingest import plan
+from rundown_store import RowStore, StoryIndex
+from tally import RundownState, TallyStateMachine
+
+def story(story_id, scene="Scene 1"):
+    return story_id, (f"Slug {story_id}", "", scene, "Cut")
+
+def message(kind, stories=(), story_ids=()):
+    return {'type': kind, 'ro_id': "RO", 'story_ids': list(story_ids), 'stories': list(stories)}
+
+class RundownStateTests(unittest.TestCase):
+    def state(self, rows=6, preview=2, program=1):
+        state = RundownState(rows)
+        state.restore(rows, preview, program)
+        return state
+
+    def test_take_advances_and_wraps(self):
+        state = self.state(3, preview=2, program=1)
+        self.assertEqual(state.take(), {1, 2, 0})
+        self.assertEqual((state.preview, state.program), (0, 2))
+
+    def test_insert_above_shifts_both_rows(self):
+        state = self.state()
+        state.insert_rows(0, 2)
+        self.assertEqual((state.preview, state.program, state.row_count), (4, 3, 8))
+
+    def test_insert_below_leaves_rows(self):
+        state = self.state()
+        state.insert_rows(5)
+        self.assertEqual((state.preview, state.program), (2, 1))
+
+    def test_delete_above_shifts_both_rows(self):
+        state = self.state(preview=4, program=3)
+        state.delete_rows(0, 2)
+        self.assertEqual((state.preview, state.program, state.row_count), (2, 1, 4))
+
+    def test_delete_program_row_clears_it(self):
+        state = self.state()
+        state.delete_rows(1)
+        self.assertEqual((state.preview, state.program), (1, None))
+
+    def test_delete_preview_row_arms_the_next(self):
+        state = self.state()
+        state.arm("Scene", "Cut", "")
+        state.delete_rows(2)
+        self.assertEqual((state.preview, state.program, state.armed), (2, 1, None))
+
+    def test_delete_preview_last_row_arms_the_new_last(self):
+        state = self.state(preview=5, program=1)
+        state.delete_rows(5)
+        self.assertEqual(state.preview, 4)
+
+    def test_move_follows_the_rows(self):
+        state = self.state()
+        # Row 1 dragged below row 3: rows 2 and 3 move up
+        state.move_rows([2, 3, 1], start=1)
+        self.assertEqual((state.preview, state.program), (1, 3))
+
+class TallyStateMachineTests(unittest.TestCase):
+    ROWS = [("Scene 1", "Cut", ""), ("Scene 2", "Fade", "Super"), ("Scene 3", "", "")]
+
+    def setUp(self):
+        self.state = RundownState(len(self.ROWS))
+        self.state.restore(len(self.ROWS), 1, 0)
+        self.deltas = []
+        self.cues = []
+        self.machine = TallyStateMachine(self.state, lambda row: self.ROWS[row][0],
+                                         self.deltas.append,
+                                         lambda scene, transition: self.cues.append((scene, transition)),
+                                         lambda row: self.ROWS[row], settle=0)
+
+    def test_take_in_obs_moves_tally_and_arms_next_row(self):
+        self.machine.program_changed("Scene 2")
+        self.assertEqual((self.state.preview, self.state.program), (2, 1))
+        self.assertEqual(self.state.armed['scene'], "Scene 3")
+        self.machine.transition_ended()
+        self.assertEqual(self.cues, [("Scene 3", "Cut")])
+
+    def test_echo_of_our_own_take_is_ignored(self):
+        self.state.take()
+        self.machine.program_changed("Scene 2")
+        self.assertEqual((self.state.preview, self.state.program), (2, 1))
+        self.assertEqual(self.deltas, [])
+
+    def test_program_change_to_another_row_moves_program_only(self):
+        self.machine.program_changed("Scene 3")
+        self.assertEqual((self.state.preview, self.state.program), (1, 2))
+
+    def test_expected_preview_change_is_ignored(self):
+        self.machine.expect_preview("Scene 3")
+        self.machine.preview_changed("Scene 3")
+        self.assertEqual(self.state.preview, 1)
+
+    def test_preview_change_in_obs_moves_preview_and_arms_it(self):
+        self.machine.preview_changed("Scene 3")
+        self.assertEqual(self.state.preview, 2)
+        self.assertEqual(self.state.armed['scene'], "Scene 3")
+
+class MOSPlanTests(unittest.TestCase):
+    """Plans applied the way the grid applies them, through the journal's ops."""
+    def setUp(self):
+        self.store = RowStore(0)
+        self.state = RundownState(0)
+        self.stories = StoryIndex(0)
+        self.apply(message("roCreate", [story("A"), story("B"), story("C"), story("D")]))
+
+    def apply(self, msg):
+        ops = plan(msg, self.stories.ids, self.store.rows, self.state.program)
+        for op in ops:
+            kind = op[0]
+            if kind == 'set':
+                fields = {'row': op[1], 'col': op[2], 'value': op[3]}
+            elif kind == 'insert':
+                fields = {'pos': op[1], 'count': len(op[2])}
+            elif kind == 'delete':
+                fields = {'pos': op[1], 'count': op[2]}
+            else:
+                fields = {'start': 0, 'order': op[1]}
+            apply_op(dict(fields, op=kind), self.store, self.state)
+            self.stories.apply(kind, fields)
+            if kind == 'insert':
+                self.stories.assign(op[1], op[2])
+        return ops
+
+    def slugs(self):
+        return [row[0] for row in self.store.rows]
+
+    def go_on_air(self, story_id):
+        row = self.stories.ids.index(story_id)
+        self.state.restore(len(self.store), row + 1, row)
+
+    def test_create_fills_rows_and_story_ids(self):
+        self.assertEqual(self.slugs(), ["Slug A", "Slug B", "Slug C", "Slug D"])
+        self.assertEqual(self.stories.ids, ["A", "B", "C", "D"])
+        self.assertEqual(self.store.row(0), story("A")[1])
+
+    def test_insert_before_target(self):
+        self.apply(message("roStoryInsert", [story("X")], ["C"]))
+        self.assertEqual(self.stories.ids, ["A", "B", "X", "C", "D"])
+        self.assertEqual(self.store.row(2), story("X")[1])
+
+    def test_insert_above_on_air_row_keeps_tally_on_it(self):
+        self.go_on_air("B")
+        self.apply(message("roStoryInsert", [story("X")], ["A"]))
+        self.assertEqual(self.stories.ids[self.state.program], "B")
+        self.assertEqual(self.stories.ids[self.state.preview], "C")
+
+    def test_delete_keeps_on_air_row(self):
+        self.go_on_air("B")
+        self.apply(message("roStoryDelete", story_ids=["A", "B", "C"]))
+        self.assertEqual(self.stories.ids, ["B", "D"])
+        self.assertEqual(self.state.program, 0)
+
+    def test_move_is_one_op(self):
+        ops = self.apply(message("roStoryMove", story_ids=["D", "B"]))
+        self.assertEqual(len(ops), 1)
+        self.assertEqual(self.stories.ids, ["A", "D", "B", "C"])
+        self.assertEqual(self.slugs(), ["Slug A", "Slug D", "Slug B", "Slug C"])
+
+    def test_move_follows_on_air_row(self):
+        self.go_on_air("C")
+        self.apply(message("roStoryMoveMultiple", story_ids=["C", "D", "A"]))
+        self.assertEqual(self.stories.ids, ["C", "D", "A", "B"])
+        self.assertEqual(self.stories.ids[self.state.program], "C")
+
+    def test_replace_of_on_air_story_is_held(self):
+        self.go_on_air("B")
+        self.assertEqual(self.apply(message("roStoryReplace", [story("B", "Scene 9")], ["B"])), [])
+        self.assertEqual(self.store.row(1), story("B")[1])
+
+    def test_running_order_replace_keeps_on_air_row_in_place(self):
+        self.go_on_air("B")
+        self.apply(message("roReplace", [story("D"), story("A", "Scene 2"), story("E")]))
+        self.assertEqual(self.stories.ids[self.state.program], "B")
+        self.assertEqual(set(self.stories.ids), {"A", "B", "D", "E"})
+        self.assertEqual(self.store.row(self.stories.ids.index("A")), story("A", "Scene 2")[1])
+        self.assertEqual(self.store.row(self.state.program), story("B")[1])
+
+    def test_unchanged_running_order_is_no_edits(self):
+        self.assertEqual(self.apply(message("roReplace", [story("A"), story("B"), story("C"), story("D")])), [])
+
+class UndoHistoryTests(unittest.TestCase):
+    """Edits go through the store then capture(), the same order Grid.record uses."""
+    def setUp(self):
+        self.store = RowStore(0)
+        self.store.rows = [(f"Slug {i}", "", f"Scene {i % 5}", "Cut") for i in range(300)]
+        self.stories = StoryIndex(len(self.store))
+        self.history = UndoHistory(self.store)
+
+    def edit(self, op, **fields):
+        if op == 'set':
+            self.store.set(fields['row'], fields['col'], fields['value'])
+        elif op == 'insert':
+            self.store.insert(fields['pos'], fields['count'])
+        elif op == 'delete':
+            self.store.delete(fields['pos'], fields['count'])
+        elif op == 'move':
+            self.store.permute(fields['order'], fields.get('start', 0))
+        self.history.capture(op, fields, self.stories.ids)
+        self.stories.apply(op, fields)
+
+    def replay(self, edits, snapshot):
+        self.history.replaying = True
+        for edit in edits:
+            kind = edit[0]
+            if kind == 'set':
+                self.store.set(*edit[1:])
+            elif kind == 'insert':
+                self.store.insert(edit[1], len(edit[2]))
+                self.stories.apply('insert', {'pos': edit[1], 'count': len(edit[2])})
+                self.stories.assign(edit[1], edit[2])
+            elif kind == 'delete':
+                self.store.delete(edit[1], edit[2])
+                self.stories.apply('delete', {'pos': edit[1], 'count': edit[2]})
+            else:
+                self.store.permute(edit[1], edit[2])
+                self.stories.apply('move', {'order': edit[1], 'start': edit[2]})
+        self.history.replaying = False
+        self.history.done(snapshot)
+
+    def undo(self):
+        step, edits = self.history.pop_undo()
+        self.replay(edits, step.before)
+
+    def redo(self):
+        step, edits = self.history.pop_redo()
+        self.replay(edits, step.after)
+
+    def test_round_trip(self):
+        states = [self.store.rows]
+        self.edit('set', row=10, col=0, value="Changed")
+        states.append(self.store.rows)
+        self.edit('insert', pos=5, count=3)
+        states.append(self.store.rows)
+        self.history.begin("Paste")
+        self.edit('set', row=5, col=2, value="Scene 9")
+        self.edit('set', row=6, col=1, value="Super")
+        self.history.end()
+        states.append(self.store.rows)
+        self.edit('delete', pos=100, count=70)
+        states.append(self.store.rows)
+        self.edit('move', order=[12, 13, 10, 11], start=10)
+        states.append(self.store.rows)
+        self.assertEqual(self.history.stats()['undo'], 5)
+        for expected in reversed(states[:-1]):
+            self.undo()
+            self.assertEqual(self.store.rows, expected)
+        self.assertFalse(self.history.can_undo())
+        for expected in states[1:]:
+            self.redo()
+            self.assertEqual(self.store.rows, expected)
+        self.assertFalse(self.history.can_redo())
+
+    def test_undo_restores_deleted_rows_and_story_ids(self):
+        self.stories.assign(20, ["S1", "S2"])
+        before = self.store.rows
+        self.edit('delete', pos=20, count=2)
+        self.undo()
+        self.assertEqual(self.store.rows, before)
+        self.assertEqual(self.stories.ids[20:22], ["S1", "S2"])
+
+    def test_steps_share_untouched_chunks(self):
+        self.edit('set', row=0, col=0, value="Changed")
+        step = self.history.undo_steps[-1]
+        shared = set(map(id, step.before[0])) & set(map(id, step.after[0]))
+        self.assertEqual(len(shared), len(step.before[0]) - 1)
+        self.undo()
+        self.assertIs(self.store.chunks, step.before[0])
+
+    def test_diverged_replay_keeps_the_store(self):
+        snapshot = self.store.snapshot()
+        self.store.set(3, 0, "Diverged")
+        self.history.done(snapshot)
+        self.assertEqual(self.store.get(3, 0), "Diverged")
+
+    def test_new_edit_clears_redo(self):
+        self.edit('set', row=1, col=0, value="One")
+        self.undo()
+        self.edit('set', row=2, col=0, value="Two")
+        self.assertFalse(self.history.can_redo())
+
+if __name__ == "__main__":
+    unittest.main()